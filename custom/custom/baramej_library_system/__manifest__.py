@@ -34,12 +34,19 @@
         # Views
         'views/library_member_type_views.xml',
         'views/library_book_views.xml',
+        'views/library_book_copy_views.xml',
+        'views/library_circulation_views.xml',
         'views/library_member_views.xml',
+        'views/library_fine_views.xml',
         'views/library_borrow_views.xml',
+        'views/library_loan_history_views.xml',
         'views/library_event_views.xml',
         'views/library_reservation_views.xml',
         'views/library_barcode_views.xml',
         'views/library_dashboard_views.xml',
+        'views/library_catalog_import_views.xml',
+        'views/library_calendar_views.xml',
+        'views/library_stocktake_views.xml',
         'views/menus.xml',
         'data/library_actions.xml',
     ],
@@ -48,6 +55,7 @@
     ],
     'assets': {
         'web.assets_backend': [
+            'baramej_library_system/static/src/js/scan_queue.js',
             'baramej_library_system/static/src/js/barcode_scanner.js',
         ],
     },
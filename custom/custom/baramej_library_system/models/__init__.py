@@ -1,13 +1,24 @@
+from . import library_barcode_mixin
 from . import library_member_type
 from . import library_book
 from . import library_borrow
+from . import library_book_copy
 from . import library_member
+from . import library_fine
+from . import library_loan_event
+from . import library_loan_archive
+from . import library_loan_report
+from . import library_circulation
 from . import library_category
 from . import library_review
 from . import library_location
+from . import library_calendar
 from . import library_publisher
 from . import library_staff
 from . import library_event
 from . import library_reservation
 from . import library_author
 from . import library_barcode_scan
+from . import library_scan_log
+from . import library_stocktake
+from . import library_catalog_import
@@ -7,3 +7,10 @@ class LibraryAuthor(models.Model):
     name = fields.Char(string='Name', required=True)
     biography = fields.Text(string='Biography')
     book_ids = fields.One2many('library.book', 'author_id', string='Books')
+
+    def write(self, vals):
+        """Refresh the catalog search vector of the books of renamed authors."""
+        result = super(LibraryAuthor, self).write(vals)
+        if 'name' in vals:
+            self.env['library.book']._update_search_vectors('author_id', self.ids)
+        return result
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import time
+from collections import Counter, defaultdict
+
+from odoo import models, api, tools
+
+# Per-process lookup statistics, keyed by model name
+_BARCODE_STATS = defaultdict(Counter)
+
+
+class LibraryBarcodeMixin(models.AbstractModel):
+    """Cached barcode resolution for scanning desks.
+
+    Single lookups go through a registry cache keyed by barcode. Creating,
+    deleting or archiving a barcoded record, or changing a barcode, clears
+    the registry caches, which is signaled to every worker of the database.
+    Since this also drops the other ormcaches (member policies, calendars),
+    writes that leave barcodes untouched never clear them.
+    """
+    _name = 'library.barcode.mixin'
+    _description = 'Library Barcode Lookup'
+
+    # Fields that decide which record a barcode resolves to
+    _barcode_cache_fields = ('barcode', 'active')
+
+    @api.model
+    def search_by_barcode(self, barcode):
+        """Search record by barcode for scanning operations."""
+        self.check_access_rights('read')
+        started = time.perf_counter()
+        record_id = self._barcode_lookup(barcode)
+        stats = _BARCODE_STATS[self._name]
+        stats['lookups'] += 1
+        stats['lookup_time'] += time.perf_counter() - started
+        return self._filter_scannable(self.browse(record_id or []))
+
+    @api.model
+    @tools.ormcache('barcode')
+    def _barcode_lookup(self, barcode):
+        """Return the id of the record holding ``barcode``, or False."""
+        _BARCODE_STATS[self._name]['misses'] += 1
+        self.flush(self._barcode_query_fields())
+        self.env.cr.execute(
+            f'SELECT id FROM "{self._table}" WHERE barcode = %s{self._barcode_active_clause()}',
+            [barcode]
+        )
+        row = self.env.cr.fetchone()
+        return row[0] if row else False
+
+    @api.model
+    def _resolve_barcodes(self, barcodes):
+        """Resolve many barcodes with one query, returning ``{barcode: record}``.
+
+        Unknown barcodes are left out of the result.
+        """
+        self.check_access_rights('read')
+        barcodes = list({barcode for barcode in barcodes if barcode})
+        if not barcodes:
+            return {}
+        self.flush(self._barcode_query_fields())
+        self.env.cr.execute(
+            f'SELECT barcode, id FROM "{self._table}" WHERE barcode = ANY(%s){self._barcode_active_clause()}',
+            [barcodes]
+        )
+        ids_by_barcode = dict(self.env.cr.fetchall())
+        readable = set(self._filter_scannable(self.browse(list(ids_by_barcode.values()))).ids)
+        return {
+            barcode: self.browse(record_id)
+            for barcode, record_id in ids_by_barcode.items()
+            if record_id in readable
+        }
+
+    @api.model
+    def get_barcode_cache_stats(self):
+        """Return lookup, hit and miss counters of this worker's barcode cache."""
+        stats = _BARCODE_STATS[self._name]
+        lookups, misses = stats['lookups'], stats['misses']
+        return {
+            'lookups': lookups,
+            'hits': max(lookups - misses, 0),
+            'misses': misses,
+            'hit_ratio': (lookups - misses) / lookups if lookups else 0.0,
+            'avg_lookup_ms': stats['lookup_time'] * 1000 / lookups if lookups else 0.0,
+        }
+
+    def _barcode_query_fields(self):
+        return [fname for fname in self._barcode_cache_fields if fname in self._fields]
+
+    def _barcode_active_clause(self):
+        return ' AND active IS TRUE' if 'active' in self._fields else ''
+
+    def _filter_scannable(self, records):
+        """Drop the records the current user is not allowed to read."""
+        if not self.env.su:
+            records = records._filter_access_rules('read')
+        return records
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(LibraryBarcodeMixin, self).create(vals_list)
+        if any(vals.get('barcode') for vals in vals_list):
+            self.clear_caches()
+        return records
+
+    def write(self, vals):
+        changes_barcode = 'barcode' in vals and any(record.barcode != vals['barcode'] for record in self)
+        archives_barcode = (
+            'active' in vals and 'active' in self._fields
+            and any(record.barcode and record.active != bool(vals['active']) for record in self)
+        )
+        result = super(LibraryBarcodeMixin, self).write(vals)
+        if changes_barcode or archives_barcode:
+            self.clear_caches()
+        return result
+
+    def unlink(self):
+        has_barcodes = any(self.mapped('barcode'))
+        result = super(LibraryBarcodeMixin, self).unlink()
+        if has_barcodes:
+            self.clear_caches()
+        return result
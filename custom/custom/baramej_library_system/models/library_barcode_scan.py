@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime, timezone
+
 from odoo import models, fields, api
 from odoo.exceptions import UserError, ValidationError
 
@@ -26,96 +28,268 @@ class LibraryBarcodeScan(models.TransientModel):
         if not member:
             raise UserError(f'No member found with barcode: {self.member_barcode}')
         
-        # Find book
-        book = self.env['library.book'].search_by_barcode(self.book_barcode)
+        # Find book, either by its title barcode or by a copy barcode
+        book, copy = self._resolve_book_barcode(self.book_barcode)
         if not book:
             raise UserError(f'No book found with barcode: {self.book_barcode}')
         
+        _operation, borrow, message = self._process_item(member, book, self.operation, copy=copy)
+        self.result_message = message
+        
+        return {
+            'name': 'Scan Result',
+            'type': 'ir.actions.act_window',
+            'res_model': 'library.barcode.scan',
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    @api.model
+    def create_and_process(self, scans):
+        """Process scans from the desk scanner without creating wizard records.
+
+        ``scans`` is a list of ``{'member_barcode', 'book_barcode', 'operation',
+        'scan_date'}`` dicts or ``(member_barcode, book_barcode, operation,
+        scan_date)`` tuples, all handled in one transaction; ``scan_date`` is
+        optional and dates the loan or return (today by default). Barcodes and active loans are resolved for
+        the whole batch up front, and each item runs in its own savepoint so
+        a failing scan does not undo the others. Returns one result dict
+        (``success``, ``message``, ``operation``, ``borrow_id``) per scan; a
+        single dict argument gets a single result back.
+        """
+        single = isinstance(scans, dict)
+        items = [self._normalize_scan(scan) for scan in ([scans] if single else scans)]
+        
+        members = self.env['library.member']._resolve_barcodes([item[0] for item in items])
+        books = self.env['library.book']._resolve_barcodes([item[1] for item in items])
+        copies = self.env['library.book.copy']._resolve_barcodes(
+            [item[1] for item in items if item[1] not in books]
+        )
+        books.update({barcode: copy.book_id for barcode, copy in copies.items()})
+        active_borrows = self._get_active_borrows(
+            self.env['library.member'].union(*members.values()),
+            self.env['library.book'].union(*books.values()),
+        )
+        
+        results = []
+        for member_barcode, book_barcode, operation, scan_date in items:
+            member, book = members.get(member_barcode), books.get(book_barcode)
+            copy = copies.get(book_barcode, self.env['library.book.copy'])
+            try:
+                if not member:
+                    raise UserError(f'No member found with barcode: {member_barcode}')
+                if not book:
+                    raise UserError(f'No book found with barcode: {book_barcode}')
+                key = (member.id, book.id)
+                with self.env.cr.savepoint():
+                    operation, borrow, message = self._process_item(
+                        member, book, operation, active_borrow=active_borrows.get(key, False), copy=copy,
+                        scan_date=scan_date,
+                    )
+                if operation == 'borrow':
+                    active_borrows[key] = borrow
+                else:
+                    active_borrows.pop(key, None)
+                results.append({
+                    'success': True,
+                    'message': message,
+                    'operation': operation,
+                    'borrow_id': borrow.id,
+                })
+            except (UserError, ValidationError) as error:
+                self.env['library.borrow'].invalidate_cache()
+                results.append({
+                    'success': False,
+                    'message': str(error.args[0] if error.args else error),
+                    'operation': operation,
+                    'borrow_id': False,
+                })
+        
+        return results[0] if single else results
+
+    @api.model
+    def ingest_scans(self, scans):
+        """Apply scans replayed from a desk scanner queue, each exactly once.
+
+        ``scans`` are dicts with the scanner's ``uuid`` for the scan,
+        ``member_barcode``, ``book_barcode``, ``operation`` and ``scanned_at``
+        (ISO 8601, UTC), in scanning order. New scans are logged in
+        ``library.scan.log`` and applied in order through
+        ``create_and_process``, dated on the local day they were scanned;
+        scans already logged, e.g. a batch sent again
+        after a lost response, get their logged outcome back. Returns one
+        result dict per scan, in the same order, with the ``uuid`` and a
+        ``replayed`` flag added.
+        """
+        ScanLog = self.env['library.scan.log']
+        items = {}
+        for scan in scans:
+            if not scan.get('uuid'):
+                raise UserError('Every queued scan needs a UUID.')
+            items.setdefault(scan['uuid'], {
+                'uuid': scan['uuid'],
+                'member_barcode': scan.get('member_barcode'),
+                'book_barcode': scan.get('book_barcode'),
+                'operation': scan.get('operation') or 'auto',
+                'scanned_at': self._parse_scanned_at(scan.get('scanned_at')),
+            })
+        if not items:
+            return []
+        
+        claimed = ScanLog._claim(list(items.values()))
+        fresh = [item for item in items.values() if item['uuid'] in claimed]
+        results = self.create_and_process([
+            (item['member_barcode'], item['book_barcode'], item['operation'], self._scan_date(item['scanned_at']))
+            for item in fresh
+        ]) if fresh else []
+        outcomes = {item['uuid']: result for item, result in zip(fresh, results)}
+        ScanLog._record_outcomes(outcomes)
+        outcomes.update(ScanLog._get_outcomes(set(items) - claimed))
+        
+        answered = set()
+        replies = []
+        for scan in scans:
+            scan_uuid = scan['uuid']
+            replies.append(dict(
+                outcomes[scan_uuid],
+                uuid=scan_uuid,
+                replayed=scan_uuid not in claimed or scan_uuid in answered,
+            ))
+            answered.add(scan_uuid)
+        return replies
+
+    @api.model
+    def _parse_scanned_at(self, value):
+        """Return a naive UTC datetime from an ISO 8601 scan time, or None."""
+        if not value:
+            return None
+        try:
+            scanned_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (TypeError, ValueError):
+            return None
+        if scanned_at.tzinfo:
+            scanned_at = scanned_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return scanned_at
+
+    @api.model
+    def _scan_date(self, scanned_at):
+        """Return the local date of a scan time, never later than today, or None."""
+        if not scanned_at:
+            return None
+        return min(fields.Date.context_today(self, scanned_at), fields.Date.context_today(self))
+
+    @api.model
+    def _normalize_scan(self, scan):
+        """Return a ``(member_barcode, book_barcode, operation, scan_date)`` tuple."""
+        if isinstance(scan, dict):
+            return (scan.get('member_barcode'), scan.get('book_barcode'), scan.get('operation') or 'auto',
+                    scan.get('scan_date'))
+        member_barcode, book_barcode, *rest = scan
+        operation, scan_date = (list(rest) + [None, None])[:2]
+        return member_barcode, book_barcode, operation or 'auto', scan_date
+
+    @api.model
+    def _resolve_book_barcode(self, barcode):
+        """Return the ``(book, copy)`` a scanned book barcode points to.
+
+        Title barcodes resolve to the book and an empty copy; copy barcodes
+        resolve to the copy and its book.
+        """
+        book = self.env['library.book'].search_by_barcode(barcode)
+        if book:
+            return book, self.env['library.book.copy']
+        copy = self.env['library.book.copy'].search_by_barcode(barcode)
+        return copy.book_id, copy
+
+    @api.model
+    def _get_active_borrows(self, members, books):
+        """Map ``(member_id, book_id)`` to the active loan, in one query."""
+        if not members or not books:
+            return {}
+        borrows = self.env['library.borrow'].search([
+            ('member_id', 'in', members.ids),
+            ('book_id', 'in', books.ids),
+            ('state', 'in', ['borrowed', 'overdue'])
+        ], order='id')
+        return {(borrow.member_id.id, borrow.book_id.id): borrow for borrow in borrows}
+
+    @api.model
+    def _process_item(self, member, book, operation, active_borrow=None, copy=None, scan_date=None):
+        """Borrow or return ``book`` for ``member``.
+
+        ``active_borrow`` is the member's current loan of the book (or False)
+        when the caller already looked it up; it is searched otherwise. A
+        scanned ``copy`` is the physical copy lent out. ``scan_date`` is the
+        borrow or return date, today by default. Returns the
+        operation performed, the loan and a result message, and raises
+        ``UserError`` when the scan cannot be processed.
+        """
+        if active_borrow is None:
+            active_borrow = self._get_active_borrows(member, book).get((member.id, book.id))
+        
         # Auto-detect operation if needed
-        operation = self.operation
         if operation == 'auto':
-            # Check if member has this book borrowed
-            active_borrow = self.env['library.borrow'].search([
-                ('member_id', '=', member.id),
-                ('book_id', '=', book.id),
-                ('state', 'in', ['borrowed', 'overdue'])
-            ], limit=1)
-            
             operation = 'return' if active_borrow else 'borrow'
         
         # Process operation
         if operation == 'borrow':
-            return self._process_borrow(member, book)
+            borrow = self._process_borrow(member, book, copy=copy, borrow_date=scan_date)
+            message = f'✓ Book borrowed successfully!\n\n'
+            message += f'Member: {member.name} ({member.member_id})\n'
+            message += f'Book: {book.name}\n'
+            if borrow.copy_id:
+                message += f'Copy: {borrow.copy_id.barcode}\n'
+            message += f'Due Date: {borrow.due_date}\n'
+            message += f'Reference: {borrow.name}'
         else:
-            return self._process_return(member, book)
+            borrow = self._process_return(member, book, active_borrow, return_date=scan_date)
+            message = f'✓ Book returned successfully!\n\n'
+            message += f'Member: {member.name} ({member.member_id})\n'
+            message += f'Book: {book.name}\n'
+            message += f'Borrowed: {borrow.borrow_date}\n'
+            message += f'Returned: {borrow.return_date}\n'
+            
+            if borrow.overdue_days > 0:
+                message += f'\n⚠ OVERDUE: {borrow.overdue_days} days\n'
+                message += f'Fine: ${borrow.fine_amount:.2f}'
+        
+        return operation, borrow, message
     
-    def _process_borrow(self, member, book):
+    @api.model
+    def _process_borrow(self, member, book, copy=None, borrow_date=None):
         """Create a new borrow record."""
         # Check member can borrow
         can_borrow, error_msg = member.can_borrow_book()
         if not can_borrow:
             raise UserError(error_msg)
         
-        # Check book availability
-        if book.available_copies < 1:
+        # Check book availability; a copy held for the member may be picked up
+        hold = self.env['library.reservation'].search([
+            ('member_id', '=', member.id),
+            ('book_id', '=', book.id),
+            ('status', '=', 'ready')
+        ], limit=1)
+        if copy and copy.status != 'available' and copy != hold.copy_id:
+            raise UserError(f'Copy {copy.barcode} of "{book.name}" is not available')
+        if not copy and not hold and book._get_free_copy_counts()[book.id] < 1:
             raise UserError(f'Book "{book.name}" is not available (0 copies available)')
         
         # Create borrow record
-        borrow = self.env['library.borrow'].create({
+        return self.env['library.borrow'].create({
             'member_id': member.id,
             'book_id': book.id,
+            'copy_id': copy.id if copy else False,
+            'borrow_date': borrow_date or fields.Date.today(),
             'state': 'borrowed',
         })
-        
-        message = f'✓ Book borrowed successfully!\n\n'
-        message += f'Member: {member.name} ({member.member_id})\n'
-        message += f'Book: {book.name}\n'
-        message += f'Due Date: {borrow.due_date}\n'
-        message += f'Reference: {borrow.name}'
-        
-        self.result_message = message
-        
-        return {
-            'name': 'Scan Result',
-            'type': 'ir.actions.act_window',
-            'res_model': 'library.barcode.scan',
-            'res_id': self.id,
-            'view_mode': 'form',
-            'target': 'new',
-        }
     
-    def _process_return(self, member, book):
+    @api.model
+    def _process_return(self, member, book, borrow, return_date=None):
         """Return a borrowed book."""
-        # Find active borrow
-        borrow = self.env['library.borrow'].search([
-            ('member_id', '=', member.id),
-            ('book_id', '=', book.id),
-            ('state', 'in', ['borrowed', 'overdue'])
-        ], limit=1)
-        
         if not borrow:
             raise UserError(f'No active loan found for member "{member.name}" and book "{book.name}"')
         
-        # Mark as returned
-        borrow.action_return()
-        
-        message = f'✓ Book returned successfully!\n\n'
-        message += f'Member: {member.name} ({member.member_id})\n'
-        message += f'Book: {book.name}\n'
-        message += f'Borrowed: {borrow.borrow_date}\n'
-        message += f'Returned: {borrow.return_date}\n'
-        
-        if borrow.overdue_days > 0:
-            message += f'\n⚠ OVERDUE: {borrow.overdue_days} days\n'
-            message += f'Fine: ${borrow.fine_amount:.2f}'
-        
-        self.result_message = message
-        
-        return {
-            'name': 'Scan Result',
-            'type': 'ir.actions.act_window',
-            'res_model': 'library.barcode.scan',
-            'res_id': self.id,
-            'view_mode': 'form',
-            'target': 'new',
-        }
+        # Mark as returned, not before the loan started
+        borrow.action_return(max(return_date, borrow.borrow_date) if return_date else None)
+        return borrow
@@ -1,8 +1,19 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
-from odoo.exceptions import ValidationError
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from markupsafe import escape
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError, ValidationError
 from datetime import timedelta
 
+from .library_calendar import DEFAULT_CALENDAR
+
+_logger = logging.getLogger(__name__)
+
 
 class LibraryBorrow(models.Model):
     """Library borrow/loan with overdue tracking and state management."""
@@ -18,6 +29,7 @@ class LibraryBorrow(models.Model):
         'library.member',
         string='Member',
         required=True,
+        index=True,
         tracking=True,
         ondelete='restrict'
     )
@@ -25,9 +37,19 @@ class LibraryBorrow(models.Model):
         'library.book',
         string='Book',
         required=True,
+        index=True,
         tracking=True,
         ondelete='restrict'
     )
+    copy_id = fields.Many2one(
+        'library.book.copy',
+        string='Copy',
+        index=True,
+        tracking=True,
+        domain="[('book_id', '=', book_id)]",
+        ondelete='restrict',
+        help='Physical copy lent out; picked automatically when left empty'
+    )
     staff_id = fields.Many2one(
         'library.staff',
         string='Handled By',
@@ -40,19 +62,23 @@ class LibraryBorrow(models.Model):
         string='Borrow Date',
         default=fields.Date.today,
         required=True,
+        index=True,
         tracking=True
     )
     due_date = fields.Date(
         string='Due Date',
         required=True,
+        index=True,
         tracking=True,
         help='Date by which the book should be returned'
     )
     return_date = fields.Date(
         string='Actual Return Date',
+        index=True,
         tracking=True,
         help='Actual date when the book was returned'
     )
+    renewal_count = fields.Integer(string='Renewals', default=0, readonly=True, copy=False)
     
     # State management
     state = fields.Selection([
@@ -96,6 +122,10 @@ class LibraryBorrow(models.Model):
         readonly=True
     )
     
+    # Lean loan journal, see _journal_enabled()
+    event_ids = fields.One2many('library.loan.event', 'borrow_id', string='Journal Events')
+    journal_html = fields.Html(string='Journal', compute='_compute_journal_html', sanitize=False)
+    
     # Email tracking
     due_reminder_sent = fields.Boolean(string='Due Reminder Sent', default=False)
     overdue_reminder_sent = fields.Boolean(string='Overdue Reminder Sent', default=False)
@@ -104,67 +134,321 @@ class LibraryBorrow(models.Model):
         ('name_unique', 'UNIQUE(name)', 'The borrow reference must be unique!'),
     ]
 
+    # States in which the borrowed copy is off the shelf
+    _OUT_STATES = ('borrowed', 'overdue')
+
+    # Reasons a loan cannot be renewed, see _renew()
+    _RENEWAL_REFUSALS = {
+        'not_borrowed': 'Only borrowed loans can be renewed.',
+        'overdue': 'Overdue loans must be returned.',
+        'membership': 'The membership is not active.',
+        'limit': 'The renewal limit of the member type is reached.',
+        'hold': 'Other members are waiting for this title.',
+        'not_due': 'The loan is already due later than a renewal would make it.',
+        'changed': 'The loan was changed in the meantime.',
+    }
+
+    # Fields recorded by the lean loan journal instead of mail tracking
+    _JOURNAL_FIELDS = ('member_id', 'book_id', 'staff_id', 'borrow_date', 'due_date', 'return_date', 'state')
+
+    def init(self):
+        """Index open loans separately from the closed history.
+
+        Desk lookups, limit checks and overdue crons only look at open
+        loans, so these partial indexes stay small however much history
+        accumulates.
+        """
+        for name, columns in (('library_borrow_open_member_book_index', 'member_id, book_id'),
+                              ('library_borrow_open_due_date_index', 'due_date')):
+            if not tools.index_exists(self._cr, name):
+                self._cr.execute(
+                    f"CREATE INDEX {name} ON library_borrow ({columns}) WHERE state IN ('borrowed', 'overdue')"
+                )
+
     @api.model
-    def create(self, vals):
-        """Auto-generate sequence and handle book availability."""
-        if vals.get('name', 'New') == 'New':
-            vals['name'] = self.env['ir.sequence'].next_by_code('library.borrow') or 'New'
+    def _journal_enabled(self):
+        """Return whether loan events go to the lean journal instead of the chatter.
+
+        Enabled with the ``baramej_library_system.lean_loan_journal`` system
+        parameter. Tracking, creation logs and action messages are then
+        replaced by one ``library.loan.event`` row per loan and write.
+        Writes made with ``tracking_disable`` are not journaled.
+        """
+        if self.env.context.get('tracking_disable'):
+            return False
+        return self.env['ir.config_parameter'].sudo().get_param(
+            'baramej_library_system.lean_loan_journal') == 'True'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Auto-generate sequence and handle book availability.
+
+        Copy and member counter changes of the whole batch are applied with
+        one statement each. With the ``library_historical_import`` context
+        key, mail tracking and creation logs are skipped.
+        """
+        if self.env.context.get('library_historical_import'):
+            self = self.with_context(tracking_disable=True, mail_create_nolog=True, mail_notrack=True)
+        elif self._journal_enabled():
+            records = self.with_context(
+                tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True,
+            ).create(vals_list)
+            self.env['library.loan.event']._append([
+                (record.id, 'create', False, record.state, False) for record in records
+            ])
+            return records.with_env(self.env)
         
-        # Auto-compute due date if not provided
-        if 'due_date' not in vals and 'member_id' in vals and 'borrow_date' in vals:
-            member = self.env['library.member'].browse(vals['member_id'])
-            borrow_date = fields.Date.from_string(vals['borrow_date'])
-            vals['due_date'] = fields.Date.to_string(borrow_date + timedelta(days=member.max_loan_days))
+        members = {member.id: member for member in self.env['library.member'].browse(
+            {vals['member_id'] for vals in vals_list if vals.get('member_id')}
+        )}
+        books = {book.id: book for book in self.env['library.book'].browse(
+            {vals['book_id'] for vals in vals_list if vals.get('book_id')}
+        )}
+        MemberType = self.env['library.member.type']
+        OpenDay = self.env['library.open.day']
+        for vals in vals_list:
+            if vals.get('name', 'New') == 'New':
+                vals['name'] = self.env['ir.sequence'].next_by_code('library.borrow') or 'New'
+            
+            # Auto-compute due date if not provided, moved to an opening day of the book's branch
+            if 'due_date' not in vals and 'member_id' in vals:
+                vals.setdefault('borrow_date', fields.Date.context_today(self))
+                policy = MemberType._get_policy(members[vals['member_id']].member_type_id.id)
+                borrow_date = fields.Date.to_date(vals['borrow_date'])
+                due_date = borrow_date + timedelta(days=policy.max_loan_days)
+                if vals.get('book_id'):
+                    due_date = OpenDay._next_open_day(OpenDay._calendar_key(books[vals['book_id']]), due_date)
+                vals['due_date'] = fields.Date.to_string(due_date)
         
-        record = super(LibraryBorrow, self).create(vals)
+        records = super(LibraryBorrow, self).create(vals_list)
         
-        # Decrease available copies when borrowed
-        if record.state == 'borrowed' and record.book_id.available_copies > 0:
-            record.book_id.available_copies -= 1
+        # Take a copy off the shelf for loans created as borrowed
+        counter_deltas = defaultdict(lambda: (0, 0, 0))
+        for record in records:
+            self._add_counter_delta(counter_deltas, record.member_id.id, record.state, 1)
+        checked_out = records.filtered(lambda b: b.state in self._OUT_STATES)
+        checked_out._take_copies()
+        self.env['library.member']._adjust_loan_counters(counter_deltas)
+        self.env['library.circulation.bucket']._record_checkouts(checked_out)
         
-        return record
+        return records
+
+    @api.model
+    def _import_historical_loans(self, vals_list, batch_size=1000):
+        """Bulk-create closed (returned or cancelled) loans from a legacy system.
+
+        Historical loans take no copies off the shelf and count against no
+        borrow limit, so they skip limit checks, tracking and creation logs,
+        and are created in batches. Returns the created loans.
+        """
+        active = [vals for vals in vals_list if vals.get('state') not in ('returned', 'cancelled')]
+        if active:
+            raise ValidationError('Only returned or cancelled loans can be imported as history.')
+        Borrow = self.with_context(library_historical_import=True)
+        records = self.browse()
+        for start in range(0, len(vals_list), batch_size):
+            records |= Borrow.create(vals_list[start:start + batch_size])
+        return records
 
     def write(self, vals):
-        """Handle state transitions and book availability."""
+        """Handle state transitions, book availability and member counters.
+
+        The write is applied once to the whole recordset. Transitions are
+        derived from the values held before the write, and the resulting
+        ``available_copies`` and member loan counter changes are applied per
+        book and per member in one statement each. Moving an open loan to
+        another book or copy puts the old copy back and claims the new one.
+        """
+        if self._journal_enabled():
+            records = self.with_context(tracking_disable=True)
+            before = records._journal_snapshot(vals)
+            result = records.write(vals)
+            records._journal_changes(before)
+            return result
+
+        if not {'state', 'member_id', 'book_id', 'copy_id'} & set(vals):
+            return super(LibraryBorrow, self).write(vals)
+
+        old_values = {
+            record.id: (record.member_id.id, record.book_id.id, record.copy_id.id, record.state)
+            for record in self
+        }
+        result = super(LibraryBorrow, self).write(vals)
+
+        counter_deltas = defaultdict(lambda: (0, 0, 0))
+        released = []
+        taken = self.browse()
+        checked_out = self.browse()
+        to_stamp = self.browse()
+        returned = self.browse()
         for record in self:
-            old_state = record.state
-            result = super(LibraryBorrow, record).write(vals)
+            old_member_id, old_book_id, old_copy_id, old_state = old_values[record.id]
             new_state = record.state
-            
-            # Handle book availability on state change
-            if old_state != new_state:
-                if old_state in ('draft', 'cancelled') and new_state == 'borrowed':
-                    # Book is being borrowed
-                    if record.book_id.available_copies > 0:
-                        record.book_id.available_copies -= 1
-                elif old_state == 'borrowed' and new_state in ('returned', 'cancelled'):
-                    # Book is being returned
-                    record.book_id.available_copies += 1
-                    if new_state == 'returned' and not record.return_date:
-                        record.return_date = fields.Date.today()
-        
-        return super(LibraryBorrow, self).write(vals)
+            if (old_member_id, old_state) != (record.member_id.id, new_state):
+                self._add_counter_delta(counter_deltas, old_member_id, old_state, -1)
+                self._add_counter_delta(counter_deltas, record.member_id.id, new_state, 1)
+            # Put back the copy held before and take the one held now
+            was_out, is_out = old_state in self._OUT_STATES, new_state in self._OUT_STATES
+            moved = (old_book_id, old_copy_id) != (record.book_id.id, record.copy_id.id)
+            if was_out and (moved or not is_out):
+                released.append((old_book_id, old_copy_id))
+            if is_out and (moved or not was_out):
+                taken |= record
+            if is_out and not was_out:
+                checked_out |= record
+            if was_out and new_state == 'returned':
+                returned |= record
+                if not record.return_date:
+                    to_stamp |= record
+
+        if to_stamp:
+            super(LibraryBorrow, to_stamp).write({'return_date': fields.Date.today()})
+        self._release_copies(released)
+        taken._take_copies()
+        self.env['library.member']._adjust_loan_counters(counter_deltas)
+        self.env['library.circulation.bucket']._record_checkouts(checked_out)
+        # Freeze fines of returned loans into the member's ledger
+        self.env['library.fine']._accrue_loan_fines(returned)
+        return result
+
+    def unlink(self):
+        """Keep member loan counters in line with deleted loans.
+
+        Loans moved to the archive (``library_archiving`` context) keep
+        counting in the members' total loans.
+        """
+        if self.env.context.get('library_archiving'):
+            return super(LibraryBorrow, self).unlink()
+        counter_deltas = defaultdict(lambda: (0, 0, 0))
+        for record in self:
+            self._add_counter_delta(counter_deltas, record.member_id.id, record.state, -1)
+        result = super(LibraryBorrow, self).unlink()
+        self.env['library.member']._adjust_loan_counters(counter_deltas)
+        return result
+
+    def _take_copies(self):
+        """Take a copy off the shelf for each of these loans.
+
+        Loans of members picking up a hold take the held copy. Otherwise,
+        loans of titles with physical copies claim a ``library.book.copy``
+        and the other titles have their ``available_copies`` counter
+        decremented.
+        """
+        if not self:
+            return
+        loans = self - self.env['library.reservation']._fulfil_holds(self)
+        tracked = self.env['library.book']._get_copy_tracked_ids(loans.book_id.ids)
+        by_copy = loans.filtered(lambda b: b.copy_id or b.book_id.id in tracked)
+        copy_deltas = defaultdict(int)
+        for record in loans - by_copy:
+            copy_deltas[record.book_id.id] -= 1
+        self.env['library.book']._adjust_available_copies(copy_deltas)
+        if by_copy:
+            self.env['library.book.copy']._claim_for_loans(by_copy)
+
+    @api.model
+    def _release_copies(self, holdings):
+        """Put back the copies of ended loans, given as ``(book_id, copy_id)`` pairs.
+
+        Copies of books with a hold queue go to the oldest waiting hold
+        instead of the shelf.
+        """
+        holdings = self.env['library.reservation']._allocate_returned(holdings)
+        copy_deltas = defaultdict(int)
+        for book_id, copy_id in holdings:
+            if not copy_id:
+                copy_deltas[book_id] += 1
+        self.env['library.book.copy']._release([copy_id for _book_id, copy_id in holdings if copy_id])
+        self.env['library.book']._adjust_available_copies(copy_deltas)
+
+    def _journal_snapshot(self, vals):
+        """Return the current values of the journaled fields about to be written."""
+        fnames = [fname for fname in self._JOURNAL_FIELDS if fname in vals]
+        return {record.id: {fname: record[fname] for fname in fnames} for record in self}
+
+    def _journal_changes(self, before):
+        """Append one journal event per loan whose journaled fields changed."""
+        entries = []
+        for record in self:
+            old = before[record.id]
+            changes = []
+            for fname, old_value in old.items():
+                new_value = record[fname]
+                if fname == 'state' or old_value == new_value:
+                    continue
+                field = self._fields[fname]
+                if field.type == 'many2one':
+                    old_value, new_value = old_value.display_name, new_value.display_name
+                changes.append(f'{field.string}: {old_value or "-"} → {new_value or "-"}')
+            state_changed = 'state' in old and old['state'] != record.state
+            if changes or state_changed:
+                entries.append((
+                    record.id, 'write',
+                    old['state'] if state_changed else False,
+                    record.state if state_changed else False,
+                    '; '.join(changes) or False,
+                ))
+        self.env['library.loan.event']._append(entries)
+
+    def _compute_journal_html(self):
+        """Render the journal of the loans on demand, with one query for the recordset."""
+        events_by_loan = {}
+        if self.ids:
+            events = self.env['library.loan.event'].search([('borrow_id', 'in', self.ids)])
+            for event in events:
+                events_by_loan.setdefault(event.borrow_id.id, []).append(event)
+        states = dict(self._fields['state'].selection)
+        for record in self:
+            lines = []
+            for event in events_by_loan.get(record.id, []):
+                if event.event_type == 'create':
+                    text = f'Created as {states.get(event.state_to, event.state_to)}'
+                elif event.state_to:
+                    text = f'{states.get(event.state_from, event.state_from)} → {states.get(event.state_to, event.state_to)}'
+                else:
+                    text = ''
+                if event.note:
+                    text = f'{text}; {event.note}' if text else event.note
+                lines.append(
+                    f'<li><strong>{escape(fields.Datetime.to_string(event.date))}</strong> '
+                    f'{escape(event.user_id.name or "")}: {escape(text)}</li>'
+                )
+            record.journal_html = f'<ul>{"".join(lines)}</ul>' if lines else False
+
+    @api.model
+    def _loan_counter_delta(self, state, sign=1):
+        """Return the ``(active, overdue, total)`` counter contribution of a loan."""
+        return (sign * (state == 'borrowed'), sign * (state == 'overdue'), sign)
+
+    @api.model
+    def _add_counter_delta(self, deltas, member_id, state, sign):
+        delta = self._loan_counter_delta(state, sign)
+        deltas[member_id] = tuple(total + value for total, value in zip(deltas[member_id], delta))
 
     @api.constrains('member_id', 'book_id', 'state')
     def _check_borrow_constraints(self):
-        """Validate borrow limits and book availability."""
-        for record in self:
-            if record.state == 'borrowed':
-                # Check member can borrow
-                can_borrow, error_msg = record.member_id.can_borrow_book()
-                if not can_borrow:
-                    # Allow if this is already an active borrow being updated
-                    active_borrows = self.search_count([
-                        ('member_id', '=', record.member_id.id),
-                        ('state', '=', 'borrowed'),
-                        ('id', '!=', record.id)
-                    ])
-                    if active_borrows >= record.member_id.max_concurrent_loans:
-                        raise ValidationError(error_msg)
-                
-                # Check book availability
-                if record.book_id.available_copies < 1:
-                    raise ValidationError(f'The book "{record.book_id.name}" is not available for borrowing.')
+        """Validate borrow limits.
+
+        Active loan counts are aggregated for all members of the recordset in
+        one grouped query. Book availability is enforced by the atomic copy
+        counter, which refuses to take a copy that is not on the shelf.
+        """
+        active = self.filtered(lambda b: b.state == 'borrowed')
+        if not active:
+            return
+        groups = self.read_group(
+            [('member_id', 'in', active.member_id.ids), ('state', '=', 'borrowed')],
+            ['member_id'],
+            ['member_id']
+        )
+        counts = {group['member_id'][0]: group['member_id_count'] for group in groups}
+        MemberType = self.env['library.member.type']
+        for member in active.member_id:
+            limit = MemberType._get_policy(member.member_type_id.id).max_concurrent_loans
+            if counts.get(member.id, 0) > limit:
+                raise ValidationError(
+                    f'Member {member.name} has reached the maximum of {limit} concurrent loans.'
+                )
 
     @api.constrains('borrow_date', 'due_date', 'return_date')
     def _check_dates(self):
@@ -188,15 +472,24 @@ class LibraryBorrow(models.Model):
 
     @api.depends('due_date', 'return_date', 'state')
     def _compute_overdue_info(self):
-        """Compute overdue status and days."""
+        """Compute overdue status and days.
+
+        Overdue days are the opening days of the book's branch after the
+        due date, read from the open-day index.
+        """
         today = fields.Date.today()
+        OpenDay = self.env['library.open.day']
         for record in self:
-            if record.state in ('borrowed', 'overdue') and record.due_date:
+            if record.state in ('borrowed', 'overdue', 'returned') and record.due_date:
                 effective_date = record.return_date or today
+                overdue_days = 0
                 if effective_date > record.due_date:
+                    overdue_days = OpenDay._open_days_between(
+                        OpenDay._calendar_key(record.book_id), record.due_date, effective_date
+                    )
+                if overdue_days > 0:
                     record.is_overdue = True
-                    delta = effective_date - record.due_date
-                    record.overdue_days = delta.days
+                    record.overdue_days = overdue_days
                 else:
                     record.is_overdue = False
                     record.overdue_days = 0
@@ -207,57 +500,319 @@ class LibraryBorrow(models.Model):
     @api.depends('overdue_days', 'member_type_id')
     def _compute_fine_amount(self):
         """Compute fine amount based on overdue days and member type."""
+        MemberType = self.env['library.member.type']
         for record in self:
             if record.overdue_days > 0 and record.member_type_id:
-                record.fine_amount = record.overdue_days * record.member_type_id.fine_per_day
+                record.fine_amount = record.overdue_days * MemberType._get_policy(record.member_type_id.id).fine_per_day
             else:
                 record.fine_amount = 0.0
 
     def action_confirm(self):
         """Confirm and activate the borrow."""
-        for record in self:
-            if record.state == 'draft':
-                record.state = 'borrowed'
-                record.message_post(body=f'Loan confirmed for book "{record.book_id.name}"')
+        to_confirm = self.filtered(lambda b: b.state == 'draft')
+        to_confirm.write({'state': 'borrowed'})
+        if self._journal_enabled():
+            return
+        for record in to_confirm:
+            record.message_post(body=f'Loan confirmed for book "{record.book_id.name}"')
 
-    def action_return(self):
-        """Mark book as returned."""
-        for record in self:
-            if record.state in ('borrowed', 'overdue'):
-                record.write({
-                    'state': 'returned',
-                    'return_date': fields.Date.today()
-                })
-                record.message_post(body=f'Book "{record.book_id.name}" returned')
+    def action_return(self, return_date=None):
+        """Mark book as returned, today or on ``return_date``."""
+        to_return = self.filtered(lambda b: b.state in ('borrowed', 'overdue'))
+        to_return.write({
+            'state': 'returned',
+            'return_date': return_date or fields.Date.today()
+        })
+        if self._journal_enabled():
+            return
+        for record in to_return:
+            record.message_post(body=f'Book "{record.book_id.name}" returned')
 
     def action_cancel(self):
         """Cancel the borrow."""
-        for record in self:
-            if record.state in ('draft', 'borrowed'):
-                record.state = 'cancelled'
-                record.message_post(body='Loan cancelled')
+        to_cancel = self.filtered(lambda b: b.state in ('draft', 'borrowed'))
+        to_cancel.write({'state': 'cancelled'})
+        if self._journal_enabled():
+            return
+        for record in to_cancel:
+            record.message_post(body='Loan cancelled')
+
+    def action_renew(self):
+        """Renew the loans; nothing is renewed if any of them cannot be."""
+        _renewed, refusals = self._renew()
+        if refusals:
+            raise UserError('\n'.join(
+                f'{self.browse(loan_id).name}: {self._RENEWAL_REFUSALS[reason]}'
+                for loan_id, reason in refusals.items()
+            ))
+        return True
 
     @api.model
-    def _cron_update_overdue_status(self):
-        """Scheduled action to update overdue loans."""
+    def renew_member_loans(self, member_ids):
+        """Renew every borrowed loan of these members, as far as the rules allow.
+
+        Returns ``{'renewed': [loan ids], 'refused': {loan id: reason}}``.
+        """
+        loans = self.search([('member_id', 'in', member_ids), ('state', '=', 'borrowed')])
+        renewed, refusals = loans._renew()
+        return {
+            'renewed': renewed.ids,
+            'refused': {loan_id: self._RENEWAL_REFUSALS[reason] for loan_id, reason in refusals.items()},
+        }
+
+    def _renew(self):
+        """Give these loans a new loan period from today, where the rules allow.
+
+        A loan is renewable while borrowed and not yet due, for a member
+        with an active membership, below the renewal limit of the member
+        type, and for a title nobody is waiting for. Limits come from the
+        member type policy cache and waiting holds from one query; accepted
+        loans are updated with one statement, without the per-record
+        tracking and recomputation of a ``due_date`` write (the new due
+        date is in the future, so overdue days and fines stay at zero).
+        Returns ``(renewed, refusals)``: the renewed loans and
+        ``{loan_id: reason}`` for the others, reasons being keys of
+        ``_RENEWAL_REFUSALS``.
+        """
+        if not self:
+            return self, {}
         today = fields.Date.today()
-        overdue_borrows = self.search([
-            ('state', '=', 'borrowed'),
-            ('due_date', '<', today)
-        ])
-        
-        for borrow in overdue_borrows:
-            borrow.write({'state': 'overdue'})
-            borrow.message_post(
-                body=f'Loan is now overdue by {borrow.overdue_days} days. Fine: {borrow.fine_amount}'
+        MemberType = self.env['library.member.type']
+        OpenDay = self.env['library.open.day']
+        self.flush(['state', 'due_date', 'renewal_count'])
+        self.env['library.reservation'].flush(['status', 'book_id'])
+        self.env.cr.execute(
+            "SELECT DISTINCT book_id FROM library_reservation WHERE status = 'reserved' AND book_id = ANY(%s)",
+            [self.book_id.ids]
+        )
+        held = {row[0] for row in self.env.cr.fetchall()}
+
+        refusals, renewals = {}, {}
+        for loan in self:
+            member = loan.member_id
+            policy = MemberType._get_policy(member.member_type_id.id)
+            due_date = OpenDay._next_open_day(
+                OpenDay._calendar_key(loan.book_id), today + timedelta(days=policy.max_loan_days)
             )
-        
+            if loan.state != 'borrowed':
+                refusals[loan.id] = 'not_borrowed'
+            elif loan.due_date < today:
+                refusals[loan.id] = 'overdue'
+            elif member.membership_status != 'active' or (
+                    member.membership_end_date and member.membership_end_date < today):
+                refusals[loan.id] = 'membership'
+            elif loan.renewal_count >= policy.max_renewals:
+                refusals[loan.id] = 'limit'
+            elif loan.book_id.id in held:
+                refusals[loan.id] = 'hold'
+            elif due_date <= loan.due_date:
+                refusals[loan.id] = 'not_due'
+            else:
+                renewals[loan.id] = (loan.due_date, due_date, loan.renewal_count)
+        if not renewals:
+            return self.browse(), refusals
+
+        # Loans returned or renewed by someone else since they were read are left alone
+        values = ', '.join(['(%s, %s::date, %s)'] * len(renewals))
+        self.env.cr.execute(f"""
+            UPDATE library_borrow b
+               SET due_date = d.due_date,
+                   renewal_count = b.renewal_count + 1,
+                   due_reminder_sent = FALSE,
+                   write_uid = %s,
+                   write_date = now() at time zone 'UTC'
+              FROM (VALUES {values}) AS d(id, due_date, renewal_count)
+             WHERE b.id = d.id AND b.state = 'borrowed' AND b.renewal_count = d.renewal_count
+         RETURNING b.id
+        """, [self.env.uid] + [value for loan_id, (_old, new, count) in sorted(renewals.items())
+                                 for value in (loan_id, new, count)])
+        renewed = self.browse(sorted(row[0] for row in self.env.cr.fetchall()))
+        for loan_id in set(renewals) - set(renewed.ids):
+            refusals[loan_id] = 'changed'
+        renewed.invalidate_cache(
+            ['due_date', 'renewal_count', 'due_reminder_sent', 'write_uid', 'write_date'], renewed.ids
+        )
+
+        if self._journal_enabled():
+            self.env['library.loan.event']._append([
+                (loan.id, 'write', False, False,
+                 f'Renewed: Due Date {renewals[loan.id][0]} → {renewals[loan.id][1]}')
+                for loan in renewed
+            ])
+        else:
+            renewed._message_log_batch(bodies={
+                loan.id: f'Loan renewed until {renewals[loan.id][1]} (renewal {loan.renewal_count}).'
+                for loan in renewed
+            })
+        return renewed, refusals
+
+    @api.model
+    def _cron_update_overdue_status(self, batch_size=None):
+        """Scheduled action to update overdue loans.
+
+        Loans are moved to ``overdue`` in chunks of ``batch_size`` (one write
+        and one bulk chatter log per chunk), committing after each chunk.
+        Processed loans leave the ``borrowed`` state, so the search itself is
+        the checkpoint: a run interrupted by a crash resumes where it stopped.
+        """
+        if batch_size is None:
+            batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                'baramej_library_system.overdue_batch_size', 1000))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        today = fields.Date.today()
+        domain = [('state', '=', 'borrowed'), ('due_date', '<', today)]
+
+        processed = 0
+        started = time.monotonic()
+        while True:
+            chunk = self.search(domain, limit=batch_size, order='id')
+            if not chunk:
+                break
+            chunk.write({'state': 'overdue'})
+            if not self._journal_enabled():
+                chunk._message_log_batch(bodies={
+                    borrow.id: f'Loan is now overdue by {borrow.overdue_days} days. Fine: {borrow.fine_amount}'
+                    for borrow in chunk
+                })
+            processed += len(chunk)
+            if auto_commit:
+                self.env.cr.commit()
+                self.invalidate_cache()
+            elapsed = time.monotonic() - started
+            _logger.info(
+                'Overdue update: %s loans processed (%.1f rows/s)',
+                processed, processed / elapsed if elapsed else processed,
+            )
+
         return True
 
+    @api.model
+    def _cron_archive_history(self, horizon_days=None, batch_size=None):
+        """Scheduled action moving old closed loans to the archive table.
+
+        Returned and cancelled loans that ended more than ``horizon_days``
+        ago are copied to ``library.borrow.archive`` and removed from
+        ``library.borrow`` in chunks of ``batch_size``, committing after each
+        chunk. Their chatter and journal entries are removed with them;
+        ``library.loan.history`` still reports across both tables.
+        Returns the number of loans archived.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        if horizon_days is None:
+            horizon_days = int(get_param('baramej_library_system.archive_horizon_days', 730))
+        if batch_size is None:
+            batch_size = int(get_param('baramej_library_system.archive_batch_size', 5000))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        cutoff = fields.Date.today() - timedelta(days=horizon_days)
+        domain = [
+            ('state', 'in', ('returned', 'cancelled')),
+            '|', ('return_date', '<', cutoff),
+            '&', ('return_date', '=', False), ('borrow_date', '<', cutoff),
+        ]
+
+        archived = 0
+        while True:
+            chunk = self.search(domain, limit=batch_size, order='id')
+            if not chunk:
+                break
+            chunk.flush()
+            self.env.cr.execute("""
+                INSERT INTO library_borrow_archive (
+                    original_id, name, member_id, book_id, copy_id, staff_id, member_type_id,
+                    borrow_date, due_date, return_date, state, overdue_days, fine_amount,
+                    archived_on, create_uid, create_date, write_uid, write_date)
+                SELECT id, name, member_id, book_id, copy_id, staff_id, member_type_id,
+                       borrow_date, due_date, return_date, state, overdue_days, fine_amount,
+                       %(today)s, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                  FROM library_borrow
+                 WHERE id = ANY(%(ids)s)
+            """, {'today': fields.Date.today(), 'uid': self.env.uid, 'ids': chunk.ids})
+            chunk.with_context(library_archiving=True).unlink()
+            archived += len(chunk)
+            if auto_commit:
+                self.env.cr.commit()
+                self.invalidate_cache()
+
+        _logger.info('Loan history archiving: %s loans archived', archived)
+        return archived
+
+    @api.model
+    def _cron_roll_overdue_dates(self, verify=None):
+        """Scheduled action refreshing date-dependent overdue figures.
+
+        ``is_overdue``, ``overdue_days`` and ``fine_amount`` are stored but
+        depend on today's date, so they go stale overnight. This pass updates
+        only the open loans past their due date whose stored figures differ
+        from today's, in a single statement. Overdue days are counted in
+        opening days with two lookups in the open-day index, falling back to
+        calendar days outside its range. Fines are compared too, so loans
+        whose member type or daily rate changed are repriced.
+        """
+        if verify is None:
+            verify = self.env['ir.config_parameter'].sudo().get_param(
+                'baramej_library_system.date_roll_verify') == 'True'
+        today = fields.Date.today()
+        self.flush()
+        self.env['library.book'].flush(['location_id'])
+        self.env['library.member.type'].flush(['fine_per_day'])
+        self.env.cr.execute("""
+            WITH days AS (
+                SELECT b.id, b.member_type_id,
+                       COALESCE(t.ordinal - d.ordinal, %(today)s - b.due_date) AS days
+                  FROM library_borrow b
+                  JOIN library_book k ON k.id = b.book_id
+             LEFT JOIN library_open_day d
+                    ON d.calendar_key = COALESCE(k.location_id, %(default)s) AND d.day = b.due_date
+             LEFT JOIN library_open_day t
+                    ON t.calendar_key = COALESCE(k.location_id, %(default)s) AND t.day = %(today)s
+                 WHERE b.state IN ('borrowed', 'overdue')
+                   AND b.return_date IS NULL
+                   AND b.due_date < %(today)s
+            ), figures AS (
+                SELECT n.id, n.days, n.days * COALESCE(m.fine_per_day, 0) AS fine
+                  FROM days n
+             LEFT JOIN library_member_type m ON m.id = n.member_type_id
+            )
+            UPDATE library_borrow b
+               SET is_overdue = f.days > 0,
+                   overdue_days = f.days,
+                   fine_amount = f.fine
+              FROM figures f
+             WHERE b.id = f.id
+               AND (b.overdue_days, b.is_overdue, b.fine_amount) IS DISTINCT FROM (f.days, f.days > 0, f.fine)
+        """, {'today': today, 'default': DEFAULT_CALENDAR})
+        rolled = self.env.cr.rowcount
+        self.invalidate_cache(fnames=['is_overdue', 'overdue_days', 'fine_amount'])
+        _logger.info('Overdue date roll: %s loans updated', rolled)
+
+        if verify:
+            mismatches = self._verify_overdue_figures()
+            if mismatches:
+                _logger.warning('Overdue date roll: %s loans disagree with a full recompute: %s',
+                                len(mismatches), mismatches[:50])
+        return rolled
+
+    def _verify_overdue_figures(self):
+        """Compare stored overdue figures of open loans with a full recompute.
+
+        The recompute is written back, so a verification run also repairs any
+        drift it finds. Returns the ids of the loans that disagreed.
+        """
+        loans = self.search([('state', 'in', ('borrowed', 'overdue'))])
+        fnames = ['is_overdue', 'overdue_days', 'fine_amount']
+        stored = {row['id']: row for row in loans.read(fnames)}
+        for fname in fnames:
+            self.env.add_to_compute(self._fields[fname], loans)
+        loans.flush(fnames)
+        loans.invalidate_cache(fnames)
+        return [
+            row['id'] for row in loans.read(fnames)
+            if any(row[fname] != stored[row['id']][fname] for fname in fnames)
+        ]
+
     @api.model
     def _cron_send_due_reminders(self):
         """Send reminders for books due soon (2 days before due date)."""
-        from datetime import timedelta
         target_date = fields.Date.today() + timedelta(days=2)
         
         borrows = self.search([
@@ -267,11 +822,11 @@ class LibraryBorrow(models.Model):
         ])
         
         template = self.env.ref('baramej_library_system.mail_template_loan_due_soon', raise_if_not_found=False)
+        digest_template = self.env.ref(
+            'baramej_library_system.mail_template_loan_due_soon_digest', raise_if_not_found=False
+        )
         if template:
-            for borrow in borrows:
-                if borrow.member_id.email:
-                    template.send_mail(borrow.id, force_send=True)
-                    borrow.due_reminder_sent = True
+            borrows._queue_reminders(template, 'due_reminder_sent', digest_template=digest_template)
         
         return True
 
@@ -284,10 +839,77 @@ class LibraryBorrow(models.Model):
         ])
         
         template = self.env.ref('baramej_library_system.mail_template_loan_overdue', raise_if_not_found=False)
+        digest_template = self.env.ref(
+            'baramej_library_system.mail_template_loan_overdue_digest', raise_if_not_found=False
+        )
         if template:
-            for borrow in borrows:
-                if borrow.member_id.email:
-                    template.send_mail(borrow.id, force_send=True)
-                    borrow.overdue_reminder_sent = True
+            borrows._queue_reminders(template, 'overdue_reminder_sent', digest_template=digest_template)
         
-        return True
\ No newline at end of file
+        return True
+
+    def _queue_reminders(self, template, flag_field, digest_template=None, batch_size=None):
+        """Render reminders in batches and queue them for the mail queue.
+
+        Members with several loans get a single digest email rendered from
+        ``digest_template`` (a ``library.member`` template listing the loans
+        given in ``ctx['reminder_loans']``); single loans use ``template``.
+        Each batch of members is rendered with one call per template, queued
+        as ``mail.mail`` records (delivered by the mail queue over a reused
+        SMTP connection), flagged and committed. When a rate limit (mails per
+        minute) is configured, the scheduled send dates are spread to honour it.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        if batch_size is None:
+            batch_size = int(get_param('baramej_library_system.reminder_batch_size', 200))
+        rate_limit = int(get_param('baramej_library_system.reminder_rate_limit', 0))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        loans_by_member = {}
+        for borrow in self.filtered(lambda b: b.member_id.email):
+            loans_by_member.setdefault(borrow.member_id, self.browse())
+            loans_by_member[borrow.member_id] |= borrow
+        members = list(loans_by_member)
+
+        render_fields = ['subject', 'body_html', 'email_from', 'email_to', 'reply_to']
+        now = fields.Datetime.now()
+        queued = 0
+        for start in range(0, len(members), batch_size):
+            batch_members = members[start:start + batch_size]
+            batch = self.browse().union(*(loans_by_member[member] for member in batch_members))
+            digests = {
+                member.id: loans_by_member[member] for member in batch_members
+                if digest_template and len(loans_by_member[member]) > 1
+            }
+            singles = batch.filtered(lambda b: b.member_id.id not in digests)
+            rendered = template.generate_email(singles.ids, render_fields) if singles else {}
+            rendered_digests = digest_template.with_context(reminder_loans=digests).generate_email(
+                list(digests), render_fields
+            ) if digests else {}
+
+            pending = [(template, self._name, loan.id, rendered[loan.id]) for loan in singles]
+            pending += [
+                (digest_template, 'library.member', member_id, rendered_digests[member_id]) for member_id in digests
+            ]
+            mail_values = []
+            for source, model, res_id, generated in pending:
+                values = {fname: generated.get(fname) for fname in render_fields}
+                values.update(
+                    model=model,
+                    res_id=res_id,
+                    auto_delete=source.auto_delete,
+                    mail_server_id=source.mail_server_id.id,
+                )
+                if rate_limit:
+                    values['scheduled_date'] = fields.Datetime.to_string(
+                        now + timedelta(minutes=queued // rate_limit)
+                    )
+                mail_values.append(values)
+                queued += 1
+
+            self.env['mail.mail'].sudo().create(mail_values)
+            batch.write({flag_field: True})
+            if auto_commit:
+                self.env.cr.commit()
+
+        _logger.info('Queued %s reminder emails for %s loans', queued, sum(len(loans) for loans in loans_by_member.values()))
+        return queued
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+from odoo.exceptions import ValidationError
+
+
+class LibraryBookCopy(models.Model):
+    """Physical copy (item) of a library book with its own barcode and status."""
+    _name = 'library.book.copy'
+    _description = 'Library Book Copy'
+    _inherit = ['library.barcode.mixin']
+    _rec_name = 'barcode'
+    _order = 'book_id, id'
+
+    book_id = fields.Many2one(
+        'library.book',
+        string='Book',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    barcode = fields.Char(string='Barcode', required=True, copy=False, help='Barcode of this physical copy')
+    location_id = fields.Many2one('library.location', string='Location')
+    status = fields.Selection([
+        ('available', 'Available'),
+        ('on_loan', 'On Loan'),
+        ('on_hold', 'On Hold'),
+        ('maintenance', 'In Maintenance'),
+        ('lost', 'Lost')
+    ], string='Status', default='available', required=True)
+    borrow_ids = fields.One2many('library.borrow', 'copy_id', string='Borrowings')
+    note = fields.Char(string='Note')
+
+    _sql_constraints = [
+        ('barcode_unique', 'UNIQUE(barcode)', 'The copy barcode must be unique.'),
+    ]
+
+    def init(self):
+        """Index copies by title and status for free-copy lookups."""
+        tools.create_index(self._cr, 'library_book_copy_book_status_index',
+                           self._table, ['book_id', 'status'])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Add copies and refresh the availability of their titles."""
+        records = super(LibraryBookCopy, self).create(vals_list)
+        self.env['library.book']._sync_copy_availability(records.book_id.ids)
+        return records
+
+    def write(self, vals):
+        """Refresh title availability after manual status or title changes."""
+        books = self.book_id
+        result = super(LibraryBookCopy, self).write(vals)
+        if 'status' in vals or 'book_id' in vals:
+            self.env['library.book']._sync_copy_availability((books | self.book_id).ids)
+        return result
+
+    def unlink(self):
+        """Remove copies and refresh the availability of their titles."""
+        books = self.book_id
+        result = super(LibraryBookCopy, self).unlink()
+        self.env['library.book']._sync_copy_availability(books.ids)
+        return result
+
+    @api.model
+    def _claim_for_loans(self, loans):
+        """Take a copy off the shelf for each loan, then recount their titles.
+
+        Loans that name a copy claim that copy; the others claim the first
+        free copy of their title, skipping copies another desk is claiming
+        at the same moment. Raises ``ValidationError`` if no copy is free.
+        """
+        self.flush(['status', 'book_id'])
+        claimed = {}
+        for loan in loans:
+            if loan.copy_id:
+                self.env.cr.execute("""
+                    UPDATE library_book_copy SET status = 'on_loan'
+                     WHERE id = %s AND book_id = %s AND status = 'available'
+                 RETURNING id
+                """, [loan.copy_id.id, loan.book_id.id])
+            else:
+                self.env.cr.execute("""
+                    UPDATE library_book_copy SET status = 'on_loan'
+                     WHERE id = (
+                         SELECT id FROM library_book_copy
+                          WHERE book_id = %s AND status = 'available'
+                       ORDER BY id
+                          LIMIT 1
+                            FOR UPDATE SKIP LOCKED
+                     )
+                 RETURNING id
+                """, [loan.book_id.id])
+            row = self.env.cr.fetchone()
+            if not row:
+                raise ValidationError(f'The book "{loan.book_id.name}" has no copy available for borrowing.')
+            claimed[loan.id] = row[0]
+
+        values = ', '.join(['(%s, %s)'] * len(claimed))
+        self.env.cr.execute(f"""
+            UPDATE library_borrow b SET copy_id = d.copy_id
+              FROM (VALUES {values}) AS d(id, copy_id)
+             WHERE b.id = d.id
+        """, [value for item in claimed.items() for value in item])
+        loans.invalidate_cache(['copy_id'], loans.ids)
+        self.invalidate_cache(['status'], list(claimed.values()))
+        self.env['library.book']._sync_copy_availability(loans.book_id.ids)
+
+    @api.model
+    def _release(self, copy_ids):
+        """Put returned or no longer held copies back on the shelf and recount their titles."""
+        if not copy_ids:
+            return
+        self.flush(['status'])
+        self.env.cr.execute("""
+            UPDATE library_book_copy SET status = 'available'
+             WHERE id = ANY(%s) AND status IN ('on_loan', 'on_hold')
+         RETURNING book_id
+        """, [list(copy_ids)])
+        book_ids = {row[0] for row in self.env.cr.fetchall()}
+        self.invalidate_cache(['status'], list(copy_ids))
+        self.env['library.book']._sync_copy_availability(list(book_ids))
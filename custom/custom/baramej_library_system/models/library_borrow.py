@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
+import logging
+import re
+
+import psycopg2
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+_logger = logging.getLogger(__name__)
+
 
 class LibraryBook(models.Model):
     """Library book with barcode and availability tracking."""
     _name = 'library.book'
     _description = 'Library Book'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['library.barcode.mixin', 'mail.thread', 'mail.activity.mixin']
     _order = 'name'
 
     name = fields.Char(string='Title', required=True, tracking=True)
@@ -18,22 +25,80 @@ class LibraryBook(models.Model):
     publisher_id = fields.Many2one('library.publisher', string='Publisher')
     publication_date = fields.Date(string='Publication Date')
     available_copies = fields.Integer(string='Available Copies', default=1, tracking=True)
-    total_copies = fields.Integer(string='Total Copies', compute='_compute_total_copies', store=True)
+    total_copies = fields.Integer(string='Total Copies', default=1, tracking=True, help='Number of copies the library owns')
     pages = fields.Integer(string='Number of Pages')
     language = fields.Char(string='Language')
     review_ids = fields.One2many('library.review', 'book_id', string='Reviews')
     location_id = fields.Many2one('library.location', string='Location')
     borrow_ids = fields.One2many('library.borrow', 'book_id', string='Borrowings')
+    copy_ids = fields.One2many('library.book.copy', 'book_id', string='Copies')
     
     # Computed availability info
     is_available = fields.Boolean(string='Available', compute='_compute_is_available')
+    copy_count = fields.Integer(string='Physical Copies', compute='_compute_copy_count')
     active_borrow_count = fields.Integer(string='Currently Borrowed', compute='_compute_borrow_stats')
+    
+    # Rolling circulation, maintained by library.circulation.bucket
+    loans_7d = fields.Integer(string='Loans (7 Days)', default=0, readonly=True, copy=False)
+    loans_30d = fields.Integer(string='Loans (30 Days)', default=0, readonly=True, copy=False)
+    loans_365d = fields.Integer(string='Loans (365 Days)', default=0, readonly=True, copy=False)
+    turnover_rate = fields.Float(
+        string='Turnover per Copy',
+        default=0,
+        readonly=True,
+        copy=False,
+        help='Loans of the last 365 days per copy owned'
+    )
+    
+    # Full-text catalog search, see search_catalog()
+    catalog_query = fields.Char(
+        string='Catalog',
+        compute='_compute_catalog_query',
+        search='_search_catalog_query',
+        help='Search title, ISBN, author, publisher and category at once'
+    )
 
     _sql_constraints = [
         ('isbn_unique', 'UNIQUE(isbn)', 'The ISBN must be unique.'),
         ('barcode_unique', 'UNIQUE(barcode)', 'The Barcode must be unique.'),
     ]
 
+    # Fields feeding the catalog search vector, and its text search configuration
+    _SEARCH_VECTOR_FIELDS = ('name', 'isbn', 'author_id', 'publisher_id', 'category_id')
+    _SEARCH_CONFIG = 'simple'
+
+    def init(self):
+        """Set up the catalog search vector column and its indexes.
+
+        ``search_vector`` is maintained in SQL and is not an ORM field. The
+        title trigram index used for fuzzy fallback requires the ``pg_trgm``
+        extension; without it, search works on the vector alone.
+        """
+        cr = self._cr
+        cr.execute('ALTER TABLE library_book ADD COLUMN IF NOT EXISTS search_vector tsvector')
+        cr.execute(
+            'CREATE INDEX IF NOT EXISTS library_book_search_vector_index '
+            'ON library_book USING gin (search_vector)'
+        )
+        if self._ensure_trigram_extension():
+            cr.execute(
+                'CREATE INDEX IF NOT EXISTS library_book_name_trgm_index '
+                'ON library_book USING gin (name gin_trgm_ops)'
+            )
+
+    def _ensure_trigram_extension(self):
+        """Enable ``pg_trgm`` if possible; return whether it is available."""
+        cr = self._cr
+        if self._trigram_available():
+            return True
+        try:
+            with cr.savepoint():
+                cr.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            return True
+        except psycopg2.Error:
+            _logger.warning('pg_trgm is not available; catalog search runs without fuzzy title matching.')
+            return False
+
     @api.constrains('publication_date')
     def _check_publication_date(self):
         """Ensure publication date is not in the future."""
@@ -41,26 +106,288 @@ class LibraryBook(models.Model):
             if record.publication_date and record.publication_date > fields.Date.today():
                 raise ValidationError('Publication date cannot be in the future.')
 
-    @api.depends('available_copies', 'borrow_ids', 'borrow_ids.state')
-    def _compute_total_copies(self):
-        """Compute total copies from available + borrowed."""
+    @api.constrains('available_copies', 'total_copies')
+    def _check_copies(self):
+        """Ensure available copies stay within the owned inventory."""
         for record in self:
-            borrowed_copies = len(record.borrow_ids.filtered(lambda b: b.state == 'borrowed'))
-            record.total_copies = record.available_copies + borrowed_copies
+            if record.available_copies < 0:
+                raise ValidationError('Available copies cannot be negative.')
+            if record.available_copies > record.total_copies:
+                raise ValidationError(f'The book "{record.name}" cannot have more available than total copies.')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Default the owned inventory to the copies put on the shelf."""
+        for vals in vals_list:
+            if 'total_copies' not in vals:
+                vals['total_copies'] = vals.get('available_copies', 1)
+        records = super(LibraryBook, self).create(vals_list)
+        self._update_search_vectors('id', records.ids)
+        return records
+
+    def write(self, vals):
+        """Keep the catalog search vector in line with the searched fields."""
+        result = super(LibraryBook, self).write(vals)
+        if any(fname in vals for fname in self._SEARCH_VECTOR_FIELDS):
+            self._update_search_vectors('id', self.ids)
+        return result
 
-    @api.depends('available_copies')
+    @api.depends('available_copies', 'copy_ids.status')
     def _compute_is_available(self):
         """Check if book is available for borrowing."""
+        free = self._get_free_copy_counts()
         for record in self:
-            record.is_available = record.available_copies > 0
+            record.is_available = free.get(record.id, 0) > 0
+
+    @api.depends('copy_ids')
+    def _compute_copy_count(self):
+        """Count physical copies of the whole recordset in one grouped query."""
+        counts = {}
+        if self.ids:
+            groups = self.env['library.book.copy'].read_group(
+                [('book_id', 'in', self.ids)], ['book_id'], ['book_id']
+            )
+            counts = {group['book_id'][0]: group['book_id_count'] for group in groups}
+        for record in self:
+            record.copy_count = counts.get(record.id, 0)
 
     @api.depends('borrow_ids', 'borrow_ids.state')
     def _compute_borrow_stats(self):
-        """Compute borrow statistics."""
+        """Compute borrow statistics for the whole recordset in one grouped query."""
+        counts = {}
+        if self.ids:
+            groups = self.env['library.borrow'].read_group(
+                [('book_id', 'in', self.ids), ('state', 'in', ('borrowed', 'overdue'))],
+                ['book_id'],
+                ['book_id']
+            )
+            counts = {group['book_id'][0]: group['book_id_count'] for group in groups}
         for record in self:
-            record.active_borrow_count = len(record.borrow_ids.filtered(lambda b: b.state == 'borrowed'))
+            record.active_borrow_count = counts.get(record.id, 0)
+
+    @api.model
+    def _adjust_available_copies(self, deltas):
+        """Atomically apply ``{book_id: delta}`` changes to available copies.
+
+        All books are updated by a single conditional statement that only
+        touches rows whose counter stays non-negative, so concurrent desks
+        never oversell a title and only the affected book rows are locked.
+        Raises ``ValidationError`` when a book has fewer copies than requested.
+        """
+        deltas = {book_id: delta for book_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.flush(['available_copies'])
+        values = ', '.join(['(%s, %s)'] * len(deltas))
+        self.env.cr.execute(f"""
+            UPDATE library_book b
+               SET available_copies = b.available_copies + d.delta
+              FROM (VALUES {values}) AS d(id, delta)
+             WHERE b.id = d.id
+               AND b.available_copies + d.delta >= 0
+         RETURNING b.id
+        """, [value for item in deltas.items() for value in item])
+        updated = {row[0] for row in self.env.cr.fetchall()}
+        books = self.browse(list(deltas))
+        books.invalidate_cache(['available_copies'], books.ids)
+        missing = books.filtered(lambda b: b.id not in updated)
+        if missing:
+            raise ValidationError(f'The book "{missing[0].name}" is not available for borrowing.')
+        books.modified(['available_copies'])
 
     @api.model
-    def search_by_barcode(self, barcode):
-        """Search book by barcode for scanning operations."""
-        return self.search([('barcode', '=', barcode)], limit=1)
\ No newline at end of file
+    def _get_copy_tracked_ids(self, book_ids):
+        """Return the ids among ``book_ids`` whose availability comes from physical copies."""
+        if not book_ids:
+            return set()
+        self.env['library.book.copy'].flush(['book_id'])
+        self.env.cr.execute(
+            'SELECT DISTINCT book_id FROM library_book_copy WHERE book_id = ANY(%s)',
+            [list(book_ids)]
+        )
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _get_free_copy_counts(self):
+        """Return ``{book_id: copies on the shelf}`` for the recordset.
+
+        Titles with physical copies are counted from the indexed copy status,
+        the others read their ``available_copies`` counter.
+        """
+        counts = {record.id: record.available_copies for record in self}
+        if not self.ids:
+            return counts
+        self.env['library.book.copy'].flush(['book_id', 'status'])
+        self.env.cr.execute("""
+            SELECT book_id, count(*) FILTER (WHERE status = 'available')
+              FROM library_book_copy
+             WHERE book_id = ANY(%s)
+          GROUP BY book_id
+        """, [self.ids])
+        counts.update(self.env.cr.fetchall())
+        return counts
+
+    @api.model
+    def _sync_copy_availability(self, book_ids=None):
+        """Refresh ``available_copies`` and ``total_copies`` of titles from their copies.
+
+        The title counters of copy-tracked books are brought up to date
+        here whenever copy statuses change: when copies are added, edited
+        or removed, claimed, released or held, and by a scheduled action.
+        Only the copies of ``book_ids`` are counted when given. Lost copies
+        are not counted as owned. Returns the number of titles updated.
+        """
+        if book_ids is not None and not book_ids:
+            return 0
+        self.env['library.book.copy'].flush(['book_id', 'status'])
+        self.flush(['available_copies', 'total_copies'])
+        where = 'WHERE book_id = ANY(%(book_ids)s)' if book_ids is not None else ''
+        self.env.cr.execute(f"""
+            WITH counts AS (
+                SELECT book_id,
+                       count(*) FILTER (WHERE status = 'available') AS available,
+                       count(*) FILTER (WHERE status != 'lost') AS total
+                  FROM library_book_copy
+                 {where}
+                 GROUP BY book_id
+            )
+            UPDATE library_book b
+               SET available_copies = c.available,
+                   total_copies = c.total
+              FROM counts c
+             WHERE b.id = c.book_id
+               AND (b.available_copies, b.total_copies) IS DISTINCT FROM (c.available, c.total)
+         RETURNING b.id
+        """, {'book_ids': list(book_ids or [])})
+        books = self.browse([row[0] for row in self.env.cr.fetchall()])
+        books.invalidate_cache(['available_copies', 'total_copies'], books.ids)
+        books.modified(['available_copies', 'total_copies'])
+        return len(books)
+
+    @api.model
+    def _cron_sync_copy_availability(self):
+        """Scheduled action refreshing title availability of copy-tracked books."""
+        self._sync_copy_availability()
+        return True
+
+    @api.model
+    def _update_search_vectors(self, column, ids):
+        """Recompute the search vector of the books whose ``column`` is in ``ids``.
+
+        ``column`` is ``id`` or one of the searched many2one columns, so that
+        renaming an author, publisher or category refreshes its books in one
+        statement. Without a column, every book is recomputed.
+        """
+        if not column:
+            where, params = 'TRUE', {}
+        elif ids:
+            where, params = f'b.{column} = ANY(%(ids)s)', {'ids': list(ids)}
+        else:
+            return
+        self.flush(list(self._SEARCH_VECTOR_FIELDS))
+        self.env.cr.execute(f"""
+            UPDATE library_book b
+               SET search_vector =
+                       setweight(to_tsvector(%(config)s, coalesce(b.name, '')), 'A')
+                    || setweight(to_tsvector(%(config)s, coalesce(b.isbn, '')), 'A')
+                    || setweight(to_tsvector(%(config)s, regexp_replace(coalesce(b.isbn, ''), '[^0-9Xx]', '', 'g')), 'A')
+                    || setweight(to_tsvector(%(config)s, coalesce(a.name, '')), 'B')
+                    || setweight(to_tsvector(%(config)s, coalesce(p.name, '')), 'C')
+                    || setweight(to_tsvector(%(config)s, coalesce(c.name, '')), 'C')
+              FROM library_book s
+         LEFT JOIN library_author a ON a.id = s.author_id
+         LEFT JOIN library_publisher p ON p.id = s.publisher_id
+         LEFT JOIN library_category c ON c.id = s.category_id
+             WHERE s.id = b.id AND {where}
+        """, dict(params, config=self._SEARCH_CONFIG))
+
+    @api.model
+    def _rebuild_search_vectors(self):
+        """Recompute the catalog search vector of all books."""
+        self._update_search_vectors(None, None)
+
+    @api.model
+    def _catalog_tsquery(self, query):
+        """Turn free text into a prefix-matching tsquery string, or ''."""
+        isbn = re.sub(r'[^0-9Xx]', '', query or '')
+        if len(isbn) in (10, 13) and re.fullmatch(r'[0-9Xx\-\s]+', query.strip()):
+            return isbn.lower()
+        terms = re.findall(r'\w+', (query or '').lower())
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    @api.model
+    def search_catalog(self, query, limit=20, offset=0):
+        """Ranked search over title, ISBN, author, publisher and category.
+
+        Matches use the full-text index, titles weighing most, then authors,
+        then publishers and categories. When nothing matches and ``pg_trgm``
+        is available, titles similar to the query are returned instead, so
+        typos still find the book. Returns a list of ``{'id', 'name', 'rank'}``
+        dicts, best match first.
+        """
+        self.check_access_rights('read')
+        tsquery = self._catalog_tsquery(query)
+        if not tsquery:
+            return []
+        self.flush(list(self._SEARCH_VECTOR_FIELDS))
+        self.env.cr.execute("""
+            SELECT b.id, b.name, ts_rank_cd(b.search_vector, q) AS rank
+              FROM library_book b, to_tsquery(%(config)s, %(query)s) q
+             WHERE b.search_vector @@ q
+          ORDER BY rank DESC, b.id
+             LIMIT %(limit)s OFFSET %(offset)s
+        """, {'config': self._SEARCH_CONFIG, 'query': tsquery, 'limit': limit, 'offset': offset})
+        rows = self.env.cr.fetchall()
+        if not rows and not offset and self._trigram_available():
+            self.env.cr.execute("""
+                SELECT id, name, similarity(name, %(text)s) AS rank
+                  FROM library_book
+                 WHERE name %% %(text)s
+              ORDER BY rank DESC, id
+                 LIMIT %(limit)s
+            """, {'text': query, 'limit': limit})
+            rows = self.env.cr.fetchall()
+        books = self.browse([row[0] for row in rows])
+        readable = set((books if self.env.su else books._filter_access_rules('read')).ids)
+        return [{'id': book_id, 'name': name, 'rank': rank} for book_id, name, rank in rows if book_id in readable]
+
+    @api.model
+    def _trigram_available(self):
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return bool(self.env.cr.fetchone())
+
+    def _compute_catalog_query(self):
+        for record in self:
+            record.catalog_query = False
+
+    def _search_catalog_query(self, operator, value):
+        """Filter books with the full-text index from the search view."""
+        tsquery = self._catalog_tsquery(value) if operator in ('ilike', '=', 'like') else ''
+        if not tsquery:
+            return [('name', operator, value)]
+        self.flush(list(self._SEARCH_VECTOR_FIELDS))
+        return [('id', 'inselect', (
+            'SELECT id FROM library_book WHERE search_vector @@ to_tsquery(%s, %s)',
+            [self._SEARCH_CONFIG, tsquery],
+        ))]
+
+    @api.model
+    def _name_search(self, name, args=None, operator='ilike', limit=100, name_get_uid=None):
+        """Resolve book dropdowns with the ranked catalog search.
+
+        Ranked matches come first; when they do not fill ``limit``, an
+        ``ilike`` lookup on the title and ISBN completes them, so infix
+        matches such as ISBN fragments or mid-word titles are still found.
+        """
+        if not name or operator != 'ilike':
+            return super(LibraryBook, self)._name_search(name, args, operator, limit, name_get_uid)
+        ranked = [row['id'] for row in self.search_catalog(name, limit=limit and limit * 5 or 100)]
+        allowed = set(self.search([('id', 'in', ranked)] + list(args or [])).ids)
+        book_ids = [book_id for book_id in ranked if book_id in allowed][:limit or None]
+        if limit and len(book_ids) >= limit:
+            return book_ids
+        others = super(LibraryBook, self)._name_search(
+            '', list(args or []) + ['|', ('name', 'ilike', name), ('isbn', 'ilike', name),
+                                    ('id', 'not in', book_ids)],
+            operator, limit and limit - len(book_ids), name_get_uid
+        )
+        return book_ids + list(others)
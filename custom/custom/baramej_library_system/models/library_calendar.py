@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+# Calendar key of books without a location: library-wide closures only
+DEFAULT_CALENDAR = 0
+
+# Opening day fields of library.location, Monday first
+WEEKDAY_FIELDS = ('open_mon', 'open_tue', 'open_wed', 'open_thu', 'open_fri', 'open_sat', 'open_sun')
+
+
+class LibraryClosure(models.Model):
+    """Day or period a branch, or the whole library, is closed."""
+    _name = 'library.closure'
+    _description = 'Library Closure'
+    _order = 'date_from desc'
+
+    name = fields.Char(string='Reason', required=True)
+    location_id = fields.Many2one(
+        'library.location',
+        string='Location',
+        ondelete='cascade',
+        help='Leave empty for a closure of every location'
+    )
+    date_from = fields.Date(string='From', required=True)
+    date_to = fields.Date(string='To', required=True)
+
+    @api.constrains('date_from', 'date_to')
+    def _check_dates(self):
+        """Ensure the closure ends after it starts."""
+        for record in self:
+            if record.date_to < record.date_from:
+                raise ValidationError('A closure cannot end before it starts.')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(LibraryClosure, self).create(vals_list)
+        self.env['library.open.day']._rebuild_open_days()
+        return records
+
+    def write(self, vals):
+        result = super(LibraryClosure, self).write(vals)
+        self.env['library.open.day']._rebuild_open_days()
+        return result
+
+    def unlink(self):
+        result = super(LibraryClosure, self).unlink()
+        self.env['library.open.day']._rebuild_open_days()
+        return result
+
+
+class LibraryOpenDay(models.Model):
+    """Precomputed open-day index of a library calendar.
+
+    One row per calendar and day within the indexed range, with the number
+    of open days up to that day and the next open day. The number of open
+    days between two dates is a difference of two ordinals, and moving a
+    date to an open day a single lookup, in SQL as well as through the
+    per-worker copy loaded by ``_get_calendar``. Dates outside the range
+    fall back to calendar days.
+    """
+    _name = 'library.open.day'
+    _description = 'Library Open Day'
+    _order = 'calendar_key, day'
+    _log_access = False
+
+    calendar_key = fields.Integer(
+        string='Calendar',
+        required=True,
+        readonly=True,
+        help='Location id, or 0 for books without a location'
+    )
+    day = fields.Date(string='Day', required=True, readonly=True)
+    is_open = fields.Boolean(string='Open', readonly=True)
+    ordinal = fields.Integer(string='Open Days So Far', readonly=True)
+    next_open = fields.Date(string='Next Open Day', readonly=True)
+
+    _sql_constraints = [
+        ('calendar_day_unique', 'UNIQUE(calendar_key, day)', 'A calendar has one entry per day.'),
+    ]
+
+    @api.model
+    def _rebuild_open_days(self):
+        """Recompute the index of every calendar over the configured range.
+
+        The range runs from ``calendar_history_days`` before today to
+        ``calendar_future_days`` after it. Run nightly to slide the range,
+        and whenever opening days or closures change.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        today = fields.Date.today()
+        start = today - timedelta(days=int(get_param('baramej_library_system.calendar_history_days', 730)))
+        end = today + timedelta(days=int(get_param('baramej_library_system.calendar_future_days', 365)))
+        self.env['library.location'].flush(list(WEEKDAY_FIELDS))
+        self.env['library.closure'].flush(['location_id', 'date_from', 'date_to'])
+        weekdays = ', '.join(WEEKDAY_FIELDS)
+        self.env.cr.execute('DELETE FROM library_open_day')
+        self.env.cr.execute(f"""
+            WITH calendars AS (
+                SELECT id AS calendar_key, ARRAY[{weekdays}] AS weekdays FROM library_location
+                 UNION ALL
+                SELECT %(default)s, ARRAY[TRUE, TRUE, TRUE, TRUE, TRUE, TRUE, TRUE]
+            ), days AS (
+                SELECT c.calendar_key, d::date AS day,
+                       COALESCE(c.weekdays[EXTRACT(ISODOW FROM d)::integer], FALSE) AND NOT EXISTS (
+                           SELECT 1 FROM library_closure x
+                            WHERE x.date_from <= d::date AND x.date_to >= d::date
+                              AND (x.location_id IS NULL OR x.location_id = c.calendar_key)
+                       ) AS is_open
+                  FROM calendars c
+                 CROSS JOIN generate_series(%(start)s::date, %(end)s::date, interval '1 day') AS d
+            )
+            INSERT INTO library_open_day (calendar_key, day, is_open, ordinal, next_open)
+            SELECT calendar_key, day, is_open,
+                   SUM(is_open::integer) OVER (PARTITION BY calendar_key ORDER BY day),
+                   MIN(day) FILTER (WHERE is_open) OVER (PARTITION BY calendar_key ORDER BY day DESC)
+              FROM days
+        """, {'default': DEFAULT_CALENDAR, 'start': start, 'end': end})
+        rows = self.env.cr.rowcount
+        self.invalidate_cache()
+        self.clear_caches()
+        _logger.info('Library calendars: %s open-day entries indexed from %s to %s', rows, start, end)
+        return rows
+
+    @api.model
+    @tools.ormcache('calendar_key')
+    def _get_calendar(self, calendar_key):
+        """Return ``(start, ordinals, next_open_offsets)`` of a calendar, or None.
+
+        ``ordinals[i]`` is the number of open days up to ``start + i`` days,
+        and ``next_open_offsets[i]`` the offset of the next open day (None
+        when no open day follows within the range).
+        """
+        self.env.cr.execute("""
+            SELECT day, ordinal, next_open - day
+              FROM library_open_day
+             WHERE calendar_key = %s
+          ORDER BY day
+        """, [calendar_key])
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return None
+        return (
+            rows[0][0],
+            tuple(ordinal for _day, ordinal, _offset in rows),
+            tuple(offset for _day, _ordinal, offset in rows),
+        )
+
+    @api.model
+    def _position(self, calendar, day):
+        """Return the index of ``day`` in ``calendar``, or None outside its range."""
+        if not calendar or not day:
+            return None
+        position = (day - calendar[0]).days
+        return position if 0 <= position < len(calendar[1]) else None
+
+    @api.model
+    def _open_days_between(self, calendar_key, date_from, date_to):
+        """Return the number of open days after ``date_from`` up to ``date_to``."""
+        calendar = self._get_calendar(calendar_key)
+        start, end = self._position(calendar, date_from), self._position(calendar, date_to)
+        if start is None or end is None:
+            return (date_to - date_from).days
+        return calendar[1][end] - calendar[1][start]
+
+    @api.model
+    def _next_open_day(self, calendar_key, day):
+        """Return ``day`` if the library is open then, else the next open day."""
+        calendar = self._get_calendar(calendar_key)
+        position = self._position(calendar, day)
+        if position is None or calendar[2][position] is None:
+            return day
+        return day + timedelta(days=calendar[2][position])
+
+    @api.model
+    def _calendar_key(self, book):
+        """Return the calendar key of the branch holding ``book``."""
+        return book.location_id.id or DEFAULT_CALENDAR
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from datetime import date
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# CSV header aliases, mapped to importer keys
+_CSV_COLUMNS = {
+    'title': 'name', 'name': 'name',
+    'isbn': 'isbn',
+    'author': 'author', 'author_id': 'author',
+    'publisher': 'publisher', 'publisher_id': 'publisher',
+    'category': 'category', 'category_id': 'category', 'subject': 'category',
+    'publication_date': 'publication_date', 'date': 'publication_date', 'year': 'publication_date',
+    'pages': 'pages',
+    'language': 'language',
+    'copies': 'copies', 'available_copies': 'copies',
+    'barcode': 'barcode',
+}
+
+_MARC_RECORD_END = b'\x1d'
+_MARC_FIELD_END = b'\x1e'
+_MARC_SUBFIELD = b'\x1f'
+_READ_SIZE = 1 << 20
+
+
+def _iter_marc_records(stream):
+    """Yield raw ISO 2709 records from a binary stream, reading it in blocks."""
+    pending = b''
+    while True:
+        block = stream.read(_READ_SIZE)
+        if not block:
+            break
+        pending += block
+        *records, pending = pending.split(_MARC_RECORD_END)
+        for record in records:
+            if record.strip():
+                yield record
+    if pending.strip():
+        yield pending
+
+
+def _parse_marc_record(raw):
+    """Return ``{tag: [field data]}`` of a raw MARC21 record.
+
+    Control fields hold their text; data fields hold ``{code: [values]}``.
+    """
+    encoding = 'utf-8' if raw[9:10] == b'a' else 'latin-1'
+    base = int(raw[12:17])
+    directory = raw[24:raw.index(_MARC_FIELD_END)]
+    fields_by_tag = {}
+    for offset in range(0, len(directory) - 11, 12):
+        entry = directory[offset:offset + 12]
+        tag, length, start = entry[:3].decode(), int(entry[3:7]), int(entry[7:12])
+        data = raw[base + start:base + start + length].rstrip(_MARC_FIELD_END)
+        if tag < '010':
+            value = data.decode(encoding, 'replace')
+        else:
+            value = {}
+            for subfield in data.split(_MARC_SUBFIELD)[1:]:
+                if subfield:
+                    code = chr(subfield[0])
+                    value.setdefault(code, []).append(subfield[1:].decode(encoding, 'replace'))
+        fields_by_tag.setdefault(tag, []).append(value)
+    return fields_by_tag
+
+
+def _marc_subfield(fields_by_tag, tags, code):
+    for tag in tags:
+        for value in fields_by_tag.get(tag, []):
+            if isinstance(value, dict) and value.get(code):
+                return value[code][0]
+    return ''
+
+
+def _clean(value):
+    """Strip whitespace and trailing ISBD punctuation."""
+    return re.sub(r'[\s/:;,.=]+$', '', (value or '').strip())
+
+
+class LibraryCatalogImport(models.Model):
+    """Streaming bulk import of books from CSV or MARC21 files.
+
+    Files are read from disk in chunks of ``chunk_size`` records. Each chunk
+    is created as one batch with mail tracking disabled and committed
+    together with the job's checkpoint, so a failed or interrupted job
+    resumes after the last committed chunk.
+    """
+    _name = 'library.catalog.import'
+    _description = 'Library Catalog Import'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True, default='Catalog Import')
+    file_format = fields.Selection([
+        ('csv', 'CSV'),
+        ('marc', 'MARC21 (ISO 2709)')
+    ], string='Format', default='csv', required=True)
+    data_file = fields.Binary(string='File', attachment=True)
+    data_filename = fields.Char(string='File Name')
+    source_path = fields.Char(
+        string='Server File',
+        groups='base.group_system',
+        help='Path of a file on the server, read instead of an uploaded file. '
+             'It must be inside the directory set in baramej_library_system.import_directory.'
+    )
+    chunk_size = fields.Integer(string='Chunk Size', default=5000, required=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], string='Status', default='draft', required=True, readonly=True)
+    rows_done = fields.Integer(string='Records Read', readonly=True, help='Checkpoint: records of the file already processed')
+    books_created = fields.Integer(string='Books Created', readonly=True)
+    rows_skipped = fields.Integer(string='Records Skipped', readonly=True)
+    skip_log = fields.Text(string='Skipped Records', readonly=True)
+    error_message = fields.Text(string='Error', readonly=True)
+    started_at = fields.Datetime(string='Started', readonly=True)
+    finished_at = fields.Datetime(string='Finished', readonly=True)
+    books_per_second = fields.Float(string='Books / Second', readonly=True)
+
+    # Skipped records listed in the skip log
+    _SKIP_LOG_LIMIT = 200
+
+    def action_queue(self):
+        """Queue the import for the background job."""
+        for job in self.sudo():
+            if not job.data_file and not job.source_path:
+                raise UserError('Upload a file or enter a server file path first.')
+            if job.source_path:
+                job._check_source_path(job.source_path)
+        self.filtered(lambda j: j.state in ('draft', 'failed')).write({'state': 'queued', 'error_message': False})
+        self.env.ref('baramej_library_system.ir_cron_process_catalog_imports')._trigger()
+
+    def action_reset(self):
+        """Start the import over from the beginning of the file."""
+        self.write({
+            'state': 'draft', 'rows_done': 0, 'books_created': 0, 'rows_skipped': 0,
+            'skip_log': False, 'error_message': False, 'started_at': False,
+            'finished_at': False, 'books_per_second': 0.0,
+        })
+
+    @api.model
+    def _cron_process_imports(self):
+        """Scheduled action running queued imports, resuming interrupted ones."""
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            job._run()
+        return True
+
+    def _run(self):
+        """Import the file from the last checkpoint to the end."""
+        self.ensure_one()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        self.write({'state': 'running', 'started_at': self.started_at or fields.Datetime.now()})
+        if auto_commit:
+            self.env.cr.commit()
+
+        try:
+            maps = self._load_name_maps()
+            started, created = time.monotonic(), 0
+            with self._open_source() as stream:
+                records = itertools.islice(self._iter_records(stream), self.rows_done, None)
+                while True:
+                    chunk = list(itertools.islice(records, self.chunk_size))
+                    if not chunk:
+                        break
+                    count, skipped = self._import_chunk(chunk, maps)
+                    created += count
+                    self.write({
+                        'rows_done': self.rows_done + len(chunk),
+                        'books_created': self.books_created + count,
+                        'rows_skipped': self.rows_skipped + len(skipped),
+                        'skip_log': self._append_skip_log(skipped),
+                    })
+                    if auto_commit:
+                        self.env.cr.commit()
+                        self.env['library.book'].invalidate_cache()
+            elapsed = time.monotonic() - started
+            self.write({
+                'state': 'done',
+                'finished_at': fields.Datetime.now(),
+                'books_per_second': created / elapsed if elapsed else created,
+            })
+            _logger.info('Catalog import %s: %s books created (%.0f books/s)', self.id, created,
+                         self.books_per_second)
+        except Exception as error:
+            if not auto_commit:
+                raise
+            self.env.cr.rollback()
+            self.env.clear()
+            _logger.exception('Catalog import %s failed after %s records', self.id, self.rows_done)
+            self.write({'state': 'failed', 'error_message': str(error)})
+        if auto_commit:
+            self.env.cr.commit()
+
+    def _open_source(self):
+        """Open the import file as a binary stream, without loading it in memory."""
+        source_path = self.sudo().source_path
+        if source_path:
+            return open(self._check_source_path(source_path), 'rb')
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'data_file')
+        ], limit=1)
+        if not attachment:
+            raise UserError('The import file is missing.')
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw)
+
+    @api.model
+    def _check_source_path(self, path):
+        """Return the real path of a server file, refusing files outside the import directory."""
+        directory = self.env['ir.config_parameter'].sudo().get_param('baramej_library_system.import_directory')
+        if not directory:
+            raise UserError('Server files cannot be imported: no import directory is configured.')
+        root = os.path.realpath(directory)
+        real_path = os.path.realpath(path)
+        if os.path.commonpath([root, real_path]) != root:
+            raise UserError(f'Server files can only be imported from {root}.')
+        return real_path
+
+    def _iter_records(self, stream):
+        """Yield one normalized dict per record of the file."""
+        if self.file_format == 'marc':
+            for raw in _iter_marc_records(stream):
+                yield self._marc_to_record(raw)
+        else:
+            reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+            for row in reader:
+                record = {}
+                for column, value in row.items():
+                    key = _CSV_COLUMNS.get((column or '').strip().lower())
+                    if key:
+                        record[key] = (value or '').strip()
+                yield record
+
+    @api.model
+    def _marc_to_record(self, raw):
+        try:
+            marc = _parse_marc_record(raw)
+        except (ValueError, IndexError):
+            return {'error': 'unreadable MARC record'}
+        title = _clean(_marc_subfield(marc, ['245'], 'a'))
+        subtitle = _clean(_marc_subfield(marc, ['245'], 'b'))
+        control = marc.get('008', [''])[0]
+        return {
+            'name': f'{title}: {subtitle}' if subtitle else title,
+            'isbn': _marc_subfield(marc, ['020'], 'a').split(' ')[0],
+            'author': _clean(_marc_subfield(marc, ['100', '110', '700'], 'a')),
+            'publisher': _clean(_marc_subfield(marc, ['264', '260'], 'b')),
+            'category': _clean(_marc_subfield(marc, ['650', '655'], 'a')),
+            'publication_date': _marc_subfield(marc, ['264', '260'], 'c'),
+            'pages': _marc_subfield(marc, ['300'], 'a'),
+            'language': _marc_subfield(marc, ['041'], 'a') or control[35:38].strip(),
+        }
+
+    @api.model
+    def _name_key(self, name):
+        return ' '.join(name.split()).casefold()
+
+    @api.model
+    def _load_name_maps(self):
+        """Return ``{model: {name key: id}}`` for authors, publishers and categories."""
+        maps = {}
+        for model in ('library.author', 'library.publisher', 'library.category'):
+            self.env[model].flush(['name'])
+            self.env.cr.execute(f'SELECT name, id FROM "{self.env[model]._table}" ORDER BY id DESC')
+            maps[model] = {self._name_key(name): record_id for name, record_id in self.env.cr.fetchall() if name}
+        return maps
+
+    @api.model
+    def _resolve_names(self, model, names, maps):
+        """Map names to ids, creating the missing records in one batch."""
+        name_map = maps[model]
+        missing = {}
+        for name in names:
+            key = self._name_key(name)
+            if key and key not in name_map:
+                missing.setdefault(key, ' '.join(name.split()))
+        if missing:
+            records = self.env[model].create([{'name': name} for name in missing.values()])
+            name_map.update(zip(missing, records.ids))
+
+    @api.model
+    def _parse_date(self, value):
+        """Parse an ISO date or a bare publication year; future dates are dropped."""
+        if not value:
+            return False
+        try:
+            parsed = fields.Date.to_date(value[:10])
+        except ValueError:
+            # Filler years such as "0000" or "[19--]" are treated as unknown
+            year = re.search(r'\d{4}', value)
+            parsed = date(int(year.group()), 1, 1) if year and int(year.group()) > 0 else False
+        return parsed if parsed and parsed <= fields.Date.today() else False
+
+    @api.model
+    def _import_chunk(self, records, maps):
+        """Create the books of one chunk. Returns ``(created, [(record, reason)])``."""
+        skipped = []
+        valid = []
+        for record in records:
+            if record.get('error'):
+                skipped.append((record, record['error']))
+            elif not record.get('name'):
+                skipped.append((record, 'no title'))
+            elif not record.get('author'):
+                skipped.append((record, 'no author'))
+            else:
+                valid.append(record)
+
+        # Drop books already in the catalog or repeated in the chunk
+        for key in ('isbn', 'barcode'):
+            values = [record[key] for record in valid if record.get(key)]
+            if not values:
+                continue
+            self.env.cr.execute(f'SELECT {key} FROM library_book WHERE {key} = ANY(%s)', [values])
+            seen = {row[0] for row in self.env.cr.fetchall()}
+            kept = []
+            for record in valid:
+                if record.get(key) and record[key] in seen:
+                    skipped.append((record, f'duplicate {key} {record[key]}'))
+                    continue
+                if record.get(key):
+                    seen.add(record[key])
+                kept.append(record)
+            valid = kept
+
+        for model, key in (('library.author', 'author'), ('library.publisher', 'publisher'),
+                           ('library.category', 'category')):
+            self._resolve_names(model, [record[key] for record in valid if record.get(key)], maps)
+
+        vals_list = []
+        for record in valid:
+            copies = int(record['copies']) if (record.get('copies') or '').isdigit() else 1
+            pages = re.search(r'\d+', record.get('pages') or '')
+            vals_list.append({
+                'name': record['name'],
+                'isbn': record.get('isbn') or False,
+                'barcode': record.get('barcode') or False,
+                'author_id': maps['library.author'][self._name_key(record['author'])],
+                'publisher_id': maps['library.publisher'].get(self._name_key(record.get('publisher') or '')),
+                'category_id': maps['library.category'].get(self._name_key(record.get('category') or '')),
+                'publication_date': self._parse_date(record.get('publication_date')),
+                'pages': int(pages.group()) if pages else 0,
+                'language': record.get('language') or False,
+                'available_copies': copies,
+                'total_copies': copies,
+            })
+        self.env['library.book'].with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True, mail_notrack=True,
+        ).create(vals_list)
+        return len(vals_list), skipped
+
+    def _append_skip_log(self, skipped):
+        lines = (self.skip_log or '').splitlines()
+        for record, reason in skipped[:max(self._SKIP_LOG_LIMIT - len(lines), 0)]:
+            lines.append(f'{record.get("isbn") or record.get("name") or "?"}: {reason}')
+        return '\n'.join(lines) or False
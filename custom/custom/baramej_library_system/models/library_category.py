@@ -7,3 +7,10 @@ class LibraryCategory(models.Model):
     name = fields.Char(string='Category Name', required=True)
     description = fields.Text(string='Description')
     book_ids = fields.One2many('library.book', 'category_id', string='Books')
+
+    def write(self, vals):
+        """Refresh the catalog search vector of the books of renamed categories."""
+        result = super(LibraryCategory, self).write(vals)
+        if 'name' in vals:
+            self.env['library.book']._update_search_vectors('category_id', self.ids)
+        return result
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Rolling circulation windows, in days, and the book column counting each
+CIRCULATION_WINDOWS = (('7', 7, 'loans_7d'), ('30', 30, 'loans_30d'), ('365', 365, 'loans_365d'))
+
+
+class LibraryCirculationBucket(models.Model):
+    """Number of checkouts of a book on one day.
+
+    Buckets are incremented on checkout and feed the rolling circulation
+    counters of the books, the category demand and the top books ranking.
+    Buckets older than the longest window are dropped by the nightly rollup.
+    """
+    _name = 'library.circulation.bucket'
+    _description = 'Library Circulation Bucket'
+    _order = 'date desc, book_id'
+    _log_access = False
+
+    book_id = fields.Many2one('library.book', string='Book', required=True, readonly=True, ondelete='cascade')
+    category_id = fields.Many2one('library.category', string='Category', index=True, readonly=True, ondelete='set null')
+    date = fields.Date(string='Date', required=True, index=True, readonly=True)
+    loan_count = fields.Integer(string='Loans', readonly=True)
+
+    _sql_constraints = [
+        ('book_date_unique', 'UNIQUE(book_id, date)', 'There is one circulation bucket per book and day.'),
+    ]
+
+    @api.model
+    def _record_checkouts(self, loans):
+        """Count these loans in the circulation buckets, book counters and ranking.
+
+        Loans are aggregated per book and day, so a batch costs one upsert
+        of the buckets, one update of the books and one ranking refresh.
+        """
+        today = fields.Date.today()
+        oldest = today - timedelta(days=CIRCULATION_WINDOWS[-1][1])
+        per_day = defaultdict(int)
+        for loan in loans:
+            if loan.borrow_date and oldest < loan.borrow_date <= today:
+                per_day[(loan.book_id.id, loan.book_id.category_id.id, loan.borrow_date)] += 1
+        if not per_day:
+            return
+
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(per_day))
+        self.env.cr.execute(f"""
+            INSERT INTO library_circulation_bucket (book_id, category_id, date, loan_count)
+            VALUES {values}
+            ON CONFLICT (book_id, date)
+            DO UPDATE SET loan_count = library_circulation_bucket.loan_count + EXCLUDED.loan_count
+        """, [value for (book_id, category_id, day), count in sorted(per_day.items())
+              for value in (book_id, category_id or None, day, count)])
+
+        window_deltas = defaultdict(lambda: [0] * len(CIRCULATION_WINDOWS))
+        for (book_id, _category_id, day), count in per_day.items():
+            for position, (_period, days, _column) in enumerate(CIRCULATION_WINDOWS):
+                if day > today - timedelta(days=days):
+                    window_deltas[book_id][position] += count
+        book_ids = sorted(window_deltas)
+        self.env['library.book'].flush(['total_copies'])
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(book_ids))
+        self.env.cr.execute(f"""
+            UPDATE library_book b
+               SET loans_7d = COALESCE(b.loans_7d, 0) + d.n7,
+                   loans_30d = COALESCE(b.loans_30d, 0) + d.n30,
+                   loans_365d = COALESCE(b.loans_365d, 0) + d.n365,
+                   turnover_rate = COALESCE((COALESCE(b.loans_365d, 0) + d.n365)::float / NULLIF(b.total_copies, 0), 0)
+              FROM (VALUES {values}) AS d(book_id, n7, n30, n365)
+             WHERE b.id = d.book_id
+        """, [value for book_id in book_ids for value in (book_id, *window_deltas[book_id])])
+        self.env['library.book'].invalidate_cache(
+            [column for _period, _days, column in CIRCULATION_WINDOWS] + ['turnover_rate'], book_ids
+        )
+        self.env['library.book.ranking']._offer(book_ids)
+
+    @api.model
+    def _cron_rollup_circulation(self):
+        """Scheduled action ageing the rolling counters and rebuilding the ranking.
+
+        Only books with recent buckets or non-zero counters are updated, and
+        only when a counter changed.
+        """
+        today = fields.Date.today()
+        self.env['library.book'].flush(['total_copies'])
+        self.env.cr.execute("""
+            WITH sums AS (
+                SELECT book_id,
+                       SUM(loan_count) FILTER (WHERE date > %(today)s - 7) AS n7,
+                       SUM(loan_count) FILTER (WHERE date > %(today)s - 30) AS n30,
+                       SUM(loan_count) AS n365
+                  FROM library_circulation_bucket
+                 WHERE date > %(today)s - 365 AND date <= %(today)s
+              GROUP BY book_id
+            ), targets AS (
+                SELECT b.id, COALESCE(s.n7, 0) AS n7, COALESCE(s.n30, 0) AS n30, COALESCE(s.n365, 0) AS n365,
+                       COALESCE(COALESCE(s.n365, 0)::float / NULLIF(b.total_copies, 0), 0) AS turnover
+                  FROM library_book b
+             LEFT JOIN sums s ON s.book_id = b.id
+                 WHERE b.loans_365d > 0 OR s.book_id IS NOT NULL
+            )
+            UPDATE library_book b
+               SET loans_7d = t.n7, loans_30d = t.n30, loans_365d = t.n365, turnover_rate = t.turnover
+              FROM targets t
+             WHERE b.id = t.id
+               AND (b.loans_7d, b.loans_30d, b.loans_365d, b.turnover_rate)
+                   IS DISTINCT FROM (t.n7, t.n30, t.n365, t.turnover)
+        """, {'today': today})
+        updated = self.env.cr.rowcount
+        self.env.cr.execute(
+            'DELETE FROM library_circulation_bucket WHERE date <= %s', [today - timedelta(days=365)]
+        )
+        self.env['library.book'].invalidate_cache()
+        self.env['library.book.ranking']._rebuild_ranking()
+        _logger.info('Circulation rollup: %s books updated', updated)
+        return True
+
+    @api.model
+    def _rebuild_circulation(self):
+        """Recompute the buckets of the longest window from the loan history, then roll up."""
+        self.env['library.borrow'].flush()
+        today = fields.Date.today()
+        self.env.cr.execute('DELETE FROM library_circulation_bucket')
+        self.env.cr.execute("""
+            INSERT INTO library_circulation_bucket (book_id, category_id, date, loan_count)
+            SELECT h.book_id, b.category_id, h.borrow_date, COUNT(*)
+              FROM library_loan_history h
+              JOIN library_book b ON b.id = h.book_id
+             WHERE h.borrow_date > %s AND h.borrow_date <= %s
+               AND h.state NOT IN ('draft', 'cancelled')
+          GROUP BY h.book_id, b.category_id, h.borrow_date
+        """, [today - timedelta(days=365), today])
+        self.invalidate_cache()
+        return self._cron_rollup_circulation()
+
+    @api.model
+    def category_demand(self, days=30):
+        """Return ``{category_id: loans}`` over the last ``days`` days, from the buckets."""
+        groups = self.read_group(
+            [('date', '>', fields.Date.today() - timedelta(days=days)), ('category_id', '!=', False)],
+            ['category_id', 'loan_count'],
+            ['category_id']
+        )
+        return {group['category_id'][0]: group['loan_count'] for group in groups}
+
+
+class LibraryBookRanking(models.Model):
+    """Most borrowed books of a circulation window, bounded to the ranking size.
+
+    Each window keeps at most ``baramej_library_system.top_books_size``
+    rows, so reading a ranking costs the size of the ranking, not of the
+    catalog.
+    """
+    _name = 'library.book.ranking'
+    _description = 'Library Top Books'
+    _order = 'period, loan_count desc, book_id'
+    _log_access = False
+
+    period = fields.Selection([
+        ('7', 'Last 7 Days'),
+        ('30', 'Last 30 Days'),
+        ('365', 'Last 365 Days')
+    ], string='Period', required=True, readonly=True)
+    book_id = fields.Many2one('library.book', string='Book', required=True, readonly=True, ondelete='cascade')
+    category_id = fields.Many2one(related='book_id.category_id', string='Category')
+    loan_count = fields.Integer(string='Loans', readonly=True)
+
+    _sql_constraints = [
+        ('period_book_unique', 'UNIQUE(period, book_id)', 'A book is ranked once per period.'),
+    ]
+
+    @api.model
+    def _get_size(self):
+        """Return the number of books kept per ranking."""
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'baramej_library_system.top_books_size', 10))
+
+    @api.model
+    def top_books(self, period='30', limit=None):
+        """Return the ranking rows of ``period``, most borrowed first."""
+        return self.search([('period', '=', period)], limit=limit or self._get_size())
+
+    @api.model
+    def _offer(self, book_ids):
+        """Enter these books in every ranking with their current counters.
+
+        Rows pushed out of the top of a ranking are dropped, so each ranking
+        stays within its size.
+        """
+        self.flush()
+        self.env.cr.execute("""
+            INSERT INTO library_book_ranking (period, book_id, loan_count)
+            SELECT period, book_id, loan_count
+              FROM (
+                  SELECT p.period, b.id AS book_id,
+                         CASE p.period WHEN '7' THEN b.loans_7d WHEN '30' THEN b.loans_30d ELSE b.loans_365d END AS loan_count
+                    FROM library_book b
+                   CROSS JOIN (VALUES ('7'), ('30'), ('365')) AS p(period)
+                   WHERE b.id = ANY(%s)
+              ) offered
+             WHERE loan_count > 0
+          ORDER BY period, book_id
+            ON CONFLICT (period, book_id) DO UPDATE SET loan_count = EXCLUDED.loan_count
+        """, [list(book_ids)])
+        self._trim()
+
+    @api.model
+    def _trim(self):
+        """Drop the rows ranked beyond the ranking size."""
+        self.env.cr.execute("""
+            DELETE FROM library_book_ranking r
+             USING (
+                 SELECT id, row_number() OVER (PARTITION BY period ORDER BY loan_count DESC, book_id) AS position
+                   FROM library_book_ranking
+             ) ranked
+             WHERE r.id = ranked.id AND ranked.position > %s
+        """, [self._get_size()])
+        self.invalidate_cache()
+
+    @api.model
+    def _rebuild_ranking(self):
+        """Recompute every ranking from the book counters."""
+        self.flush()
+        size = self._get_size()
+        self.env.cr.execute('DELETE FROM library_book_ranking')
+        for period, _days, column in CIRCULATION_WINDOWS:
+            self.env.cr.execute(f"""
+                INSERT INTO library_book_ranking (period, book_id, loan_count)
+                SELECT %s, id, {column}
+                  FROM library_book
+                 WHERE {column} > 0
+              ORDER BY {column} DESC, id
+                 LIMIT %s
+            """, [period, size])
+        self.invalidate_cache()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError, ValidationError
+
+
+class LibraryFine(models.Model):
+    """Fine ledger entry (accrual, payment or waiver) on a member account."""
+    _name = 'library.fine'
+    _description = 'Library Fine Entry'
+    _order = 'date desc, id desc'
+
+    member_id = fields.Many2one(
+        'library.member',
+        string='Member',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    borrow_id = fields.Many2one(
+        'library.borrow',
+        string='Loan',
+        index=True,
+        ondelete='set null',
+        help='Loan the fine was accrued for'
+    )
+    entry_type = fields.Selection([
+        ('accrual', 'Accrual'),
+        ('payment', 'Payment'),
+        ('waiver', 'Waiver')
+    ], string='Type', default='payment', required=True)
+    amount = fields.Float(string='Amount', required=True)
+    signed_amount = fields.Float(
+        string='Balance Impact',
+        compute='_compute_signed_amount',
+        store=True,
+        help='Positive for accruals, negative for payments and waivers'
+    )
+    date = fields.Date(string='Date', default=fields.Date.today, required=True)
+    note = fields.Char(string='Note')
+
+    # Ledger entries are append-only for these fields
+    _LOCKED_FIELDS = ('member_id', 'entry_type', 'amount')
+
+    @api.constrains('amount')
+    def _check_amount(self):
+        """Ensure amounts are positive; the entry type carries the sign."""
+        for record in self:
+            if record.amount <= 0:
+                raise ValidationError('Fine entry amounts must be greater than zero.')
+
+    @api.depends('entry_type', 'amount')
+    def _compute_signed_amount(self):
+        """Compute the effect of the entry on the member balance."""
+        for record in self:
+            record.signed_amount = record.amount if record.entry_type == 'accrual' else -record.amount
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Post entries and update member balances incrementally."""
+        records = super(LibraryFine, self).create(vals_list)
+        records._update_member_balances(1)
+        return records
+
+    def write(self, vals):
+        """Refuse changes to posted amounts; corrections are new entries."""
+        if any(fname in vals for fname in self._LOCKED_FIELDS):
+            raise UserError('Posted fine entries cannot be changed. Record a payment or waiver instead.')
+        return super(LibraryFine, self).write(vals)
+
+    def unlink(self):
+        """Remove entries and their effect on member balances."""
+        self._update_member_balances(-1)
+        return super(LibraryFine, self).unlink()
+
+    def _update_member_balances(self, sign):
+        deltas = defaultdict(float)
+        for record in self:
+            deltas[record.member_id.id] += sign * record.signed_amount
+        self.env['library.member']._adjust_fine_balance(deltas)
+
+    @api.model
+    def _accrue_loan_fines(self, borrows):
+        """Post an accrual for each returned loan that ended with a fine."""
+        return self.create([{
+            'member_id': borrow.member_id.id,
+            'borrow_id': borrow.id,
+            'entry_type': 'accrual',
+            'amount': borrow.fine_amount,
+            'date': borrow.return_date or fields.Date.today(),
+            'note': f'Late return of "{borrow.book_id.name}" ({borrow.overdue_days} days)',
+        } for borrow in borrows if borrow.fine_amount > 0])
+
+    @api.model
+    def _get_balances(self, member_ids):
+        """Return ``{member_id: balance}`` for many members with one grouped query."""
+        groups = self.read_group(
+            [('member_id', 'in', list(member_ids))],
+            ['member_id', 'signed_amount:sum'],
+            ['member_id']
+        )
+        return {group['member_id'][0]: group['signed_amount'] for group in groups}
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, tools
+
+
+class LibraryBorrowArchive(models.Model):
+    """Closed loan moved out of ``library.borrow`` by the history archiving job."""
+    _name = 'library.borrow.archive'
+    _description = 'Library Archived Loan'
+    _order = 'borrow_date desc, id desc'
+
+    original_id = fields.Integer(string='Original Loan ID', index=True, readonly=True)
+    name = fields.Char(string='Reference', readonly=True)
+    member_id = fields.Many2one('library.member', string='Member', index=True, readonly=True, ondelete='restrict')
+    book_id = fields.Many2one('library.book', string='Book', index=True, readonly=True, ondelete='restrict')
+    copy_id = fields.Many2one('library.book.copy', string='Copy', readonly=True, ondelete='set null')
+    staff_id = fields.Many2one('library.staff', string='Handled By', readonly=True, ondelete='set null')
+    member_type_id = fields.Many2one('library.member.type', string='Member Type', readonly=True, ondelete='set null')
+    borrow_date = fields.Date(string='Borrow Date', index=True, readonly=True)
+    due_date = fields.Date(string='Due Date', index=True, readonly=True)
+    return_date = fields.Date(string='Actual Return Date', index=True, readonly=True)
+    state = fields.Selection([
+        ('returned', 'Returned'),
+        ('cancelled', 'Cancelled')
+    ], string='Status', readonly=True)
+    overdue_days = fields.Integer(string='Overdue Days', readonly=True)
+    fine_amount = fields.Float(string='Fine Amount', readonly=True)
+    archived_on = fields.Date(string='Archived On', readonly=True)
+
+
+class LibraryLoanHistory(models.Model):
+    """Reporting view over live and archived loans."""
+    _name = 'library.loan.history'
+    _description = 'Library Loan History'
+    _auto = False
+    _order = 'borrow_date desc, id desc'
+
+    borrow_id = fields.Many2one('library.borrow', string='Loan', readonly=True)
+    archive_id = fields.Many2one('library.borrow.archive', string='Archived Loan', readonly=True)
+    name = fields.Char(string='Reference', readonly=True)
+    member_id = fields.Many2one('library.member', string='Member', readonly=True)
+    book_id = fields.Many2one('library.book', string='Book', readonly=True)
+    member_type_id = fields.Many2one('library.member.type', string='Member Type', readonly=True)
+    borrow_date = fields.Date(string='Borrow Date', readonly=True)
+    due_date = fields.Date(string='Due Date', readonly=True)
+    return_date = fields.Date(string='Actual Return Date', readonly=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('borrowed', 'Borrowed'),
+        ('returned', 'Returned'),
+        ('overdue', 'Overdue'),
+        ('cancelled', 'Cancelled')
+    ], string='Status', readonly=True)
+    overdue_days = fields.Integer(string='Overdue Days', readonly=True)
+    fine_amount = fields.Float(string='Fine Amount', readonly=True)
+    is_archived = fields.Boolean(string='Archived', readonly=True)
+
+    def init(self):
+        """Union live loans (positive ids) with archived ones (negative ids)."""
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT b.id, b.id AS borrow_id, NULL::integer AS archive_id, b.name,
+                       b.member_id, b.book_id, b.member_type_id, b.borrow_date, b.due_date,
+                       b.return_date, b.state, b.overdue_days, b.fine_amount, FALSE AS is_archived
+                  FROM library_borrow b
+                 UNION ALL
+                SELECT -a.id, NULL::integer, a.id, a.name,
+                       a.member_id, a.book_id, a.member_type_id, a.borrow_date, a.due_date,
+                       a.return_date, a.state, a.overdue_days, a.fine_amount, TRUE
+                  FROM library_borrow_archive a
+            )
+        """)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+
+class LibraryLoanEvent(models.Model):
+    """Compact, append-only journal entry of a loan (lean loan journal mode)."""
+    _name = 'library.loan.event'
+    _description = 'Library Loan Event'
+    _order = 'borrow_id, id'
+    _log_access = False
+
+    borrow_id = fields.Many2one(
+        'library.borrow',
+        string='Loan',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    date = fields.Datetime(string='Date', default=fields.Datetime.now, required=True)
+    user_id = fields.Many2one('res.users', string='User', ondelete='set null')
+    event_type = fields.Selection([
+        ('create', 'Created'),
+        ('write', 'Updated')
+    ], string='Event', required=True)
+    state_from = fields.Char(string='From Status')
+    state_to = fields.Char(string='To Status')
+    note = fields.Char(string='Changes')
+
+    def write(self, vals):
+        """Refuse changes; the journal is append-only."""
+        raise UserError('Loan journal entries cannot be changed.')
+
+    @api.model
+    def _append(self, entries):
+        """Insert ``(borrow_id, event_type, state_from, state_to, note)`` entries in one statement."""
+        if not entries:
+            return
+        values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(entries))
+        now, uid = fields.Datetime.now(), self.env.uid
+        self.env.cr.execute(
+            f'INSERT INTO library_loan_event (borrow_id, event_type, state_from, state_to, note, date, user_id) '
+            f'VALUES {values}',
+            [None if value is False else value for entry in entries for value in (*entry, now, uid)]
+        )
+        self.env['library.borrow'].invalidate_cache(['event_ids', 'journal_html'], list({entry[0] for entry in entries}))
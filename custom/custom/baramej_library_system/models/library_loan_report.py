@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class LibraryLoanReport(models.Model):
+    """Daily loan, return, overdue and fine aggregates for the dashboard.
+
+    Rows are computed from live and archived loans by the refresh cron, so
+    the dashboard reads a table whose size depends on the number of days
+    and dimensions, not on the number of loans.
+    """
+    _name = 'library.loan.report'
+    _description = 'Library Loan Report'
+    _order = 'date desc'
+
+    date = fields.Date(string='Date', required=True, index=True, readonly=True)
+    member_type_id = fields.Many2one('library.member.type', string='Member Type', readonly=True, ondelete='cascade')
+    category_id = fields.Many2one('library.category', string='Category', readonly=True, ondelete='cascade')
+    location_id = fields.Many2one('library.location', string='Location', readonly=True, ondelete='cascade')
+    loan_count = fields.Integer(string='Loans', readonly=True)
+    return_count = fields.Integer(string='Returns', readonly=True)
+    overdue_count = fields.Integer(string='New Overdue', readonly=True,
+                                   help='Loans that passed their due date unreturned on this day')
+    fine_amount = fields.Float(string='Fines', readonly=True,
+                               help='Fines of the loans returned on this day')
+
+    @api.model
+    def _cron_refresh_report(self, window_days=None):
+        """Scheduled action recomputing the most recent days of the report.
+
+        Days from ``window_days`` ago up to today are recomputed; older days
+        are only recomputed by a full rebuild, or on the first run when the
+        report is empty.
+        """
+        if window_days is None:
+            window_days = int(self.env['ir.config_parameter'].sudo().get_param(
+                'baramej_library_system.report_refresh_days', 3))
+        if not self.search_count([]):
+            return self._rebuild_report()
+        return self._refresh_days(fields.Date.today() - timedelta(days=window_days))
+
+    @api.model
+    def _rebuild_report(self):
+        """Recompute the whole report."""
+        return self._refresh_days(None)
+
+    @api.model
+    def _refresh_days(self, start):
+        """Replace the report rows from ``start`` (all days if None) with fresh aggregates.
+
+        Returns the number of rows written.
+        """
+        self.env['library.borrow'].flush()
+        self.env['library.book'].flush(['category_id', 'location_id'])
+        start = start or fields.Date.to_date('1900-01-01')
+        self.env.cr.execute('DELETE FROM library_loan_report WHERE date >= %s', [start])
+        self.env.cr.execute("""
+            WITH events AS (
+                SELECT h.borrow_date AS day, h.member_type_id, h.book_id,
+                       1 AS loans, 0 AS returns, 0 AS overdue, 0.0 AS fines
+                  FROM library_loan_history h
+                 WHERE h.borrow_date >= %(start)s AND h.state NOT IN ('draft', 'cancelled')
+                 UNION ALL
+                SELECT h.return_date, h.member_type_id, h.book_id, 0, 1, 0, h.fine_amount
+                  FROM library_loan_history h
+                 WHERE h.return_date >= %(start)s AND h.state = 'returned'
+                 UNION ALL
+                SELECT h.due_date + 1, h.member_type_id, h.book_id, 0, 0, 1, 0.0
+                  FROM library_loan_history h
+                 WHERE h.due_date >= %(start)s - 1 AND h.due_date < %(today)s
+                   AND h.state IN ('borrowed', 'overdue', 'returned')
+                   AND (h.return_date IS NULL OR h.return_date > h.due_date)
+            )
+            INSERT INTO library_loan_report (
+                date, member_type_id, category_id, location_id,
+                loan_count, return_count, overdue_count, fine_amount,
+                create_uid, create_date, write_uid, write_date)
+            SELECT e.day, e.member_type_id, b.category_id, b.location_id,
+                   SUM(e.loans), SUM(e.returns), SUM(e.overdue), SUM(e.fines),
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM events e
+              JOIN library_book b ON b.id = e.book_id
+          GROUP BY e.day, e.member_type_id, b.category_id, b.location_id
+        """, {'start': start, 'today': fields.Date.today(), 'uid': self.env.uid})
+        written = self.env.cr.rowcount
+        self.invalidate_cache()
+        _logger.info('Loan report: %s rows refreshed from %s', written, start)
+        return written
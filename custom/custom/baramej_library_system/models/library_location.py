@@ -1,4 +1,6 @@
-from odoo import models, fields
+from odoo import models, fields, api
+
+from .library_calendar import WEEKDAY_FIELDS
 
 class LibraryLocation(models.Model):
     _name = 'library.location'
@@ -7,3 +9,27 @@ class LibraryLocation(models.Model):
     name = fields.Char(string='Location Name', required=True)
     code = fields.Char(string='Location Code', required=True)
     address = fields.Text(string='Address')
+    
+    # Opening days, indexed by library.open.day
+    open_mon = fields.Boolean(string='Monday', default=True)
+    open_tue = fields.Boolean(string='Tuesday', default=True)
+    open_wed = fields.Boolean(string='Wednesday', default=True)
+    open_thu = fields.Boolean(string='Thursday', default=True)
+    open_fri = fields.Boolean(string='Friday', default=True)
+    open_sat = fields.Boolean(string='Saturday', default=True)
+    open_sun = fields.Boolean(string='Sunday', default=True)
+    closure_ids = fields.One2many('library.closure', 'location_id', string='Closures')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Index the calendar of new locations."""
+        records = super(LibraryLocation, self).create(vals_list)
+        self.env['library.open.day']._rebuild_open_days()
+        return records
+
+    def write(self, vals):
+        """Re-index calendars when opening days change."""
+        result = super(LibraryLocation, self).write(vals)
+        if any(fname in vals for fname in WEEKDAY_FIELDS):
+            self.env['library.open.day']._rebuild_open_days()
+        return result
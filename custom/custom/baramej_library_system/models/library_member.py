@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 import re
 
+_logger = logging.getLogger(__name__)
+
 
 class LibraryMember(models.Model):
     """Library member with tier/type for borrowing limits."""
     _name = 'library.member'
     _description = 'Library Member'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['library.barcode.mixin', 'mail.thread', 'mail.activity.mixin']
     _order = 'name'
 
     name = fields.Char(string='Name', required=True, tracking=True)
@@ -46,17 +53,20 @@ class LibraryMember(models.Model):
     borrow_ids = fields.One2many('library.borrow', 'member_id', string='Borrowings')
     active_loan_count = fields.Integer(
         string='Active Loans',
-        compute='_compute_loan_stats',
+        readonly=True,
+        default=0,
         help='Number of currently borrowed books'
     )
     overdue_loan_count = fields.Integer(
         string='Overdue Loans',
-        compute='_compute_loan_stats',
+        readonly=True,
+        default=0,
         help='Number of overdue books'
     )
     total_loans = fields.Integer(
         string='Total Loans',
-        compute='_compute_loan_stats',
+        readonly=True,
+        default=0,
         help='Lifetime loan count'
     )
     total_fines = fields.Float(
@@ -64,6 +74,13 @@ class LibraryMember(models.Model):
         compute='_compute_total_fines',
         help='Total outstanding fines'
     )
+    fine_ids = fields.One2many('library.fine', 'member_id', string='Fine Ledger')
+    fine_balance = fields.Float(
+        string='Fine Balance',
+        readonly=True,
+        default=0.0,
+        help='Accrued fines of returned loans minus payments and waivers'
+    )
     
     # Computed limits from member type
     max_concurrent_loans = fields.Integer(
@@ -82,6 +99,22 @@ class LibraryMember(models.Model):
         ('barcode_unique', 'UNIQUE(barcode)', 'The Barcode must be unique.'),
     ]
 
+    # Loan counters maintained incrementally by library.borrow
+    _LOAN_COUNTER_FIELDS = ['active_loan_count', 'overdue_loan_count', 'total_loans']
+
+    def init(self):
+        """Index the end dates of active memberships.
+
+        The expiry cron finds the memberships that ended with one range scan
+        of this partial index, which only holds active members.
+        """
+        if not tools.index_exists(self._cr, 'library_member_membership_expiry_index'):
+            self._cr.execute("""
+                CREATE INDEX library_member_membership_expiry_index
+                    ON library_member (membership_end_date)
+                 WHERE membership_status = 'active'
+            """)
+
     @api.constrains('email')
     def _check_email_format(self):
         """Validate email format."""
@@ -98,7 +131,11 @@ class LibraryMember(models.Model):
 
     @api.depends('membership_start_date', 'membership_end_date', 'active')
     def _compute_membership_status(self):
-        """Compute membership status based on dates."""
+        """Compute membership status based on dates.
+
+        The status is recomputed when the dates change; memberships ending
+        later are expired by ``_cron_expire_memberships``.
+        """
         today = fields.Date.today()
         for record in self:
             if not record.active:
@@ -108,32 +145,193 @@ class LibraryMember(models.Model):
             else:
                 record.membership_status = 'active'
 
-    @api.depends('borrow_ids', 'borrow_ids.state')
-    def _compute_loan_stats(self):
-        """Compute loan statistics."""
-        for record in self:
-            borrows = record.borrow_ids
-            record.active_loan_count = len(borrows.filtered(lambda b: b.state == 'borrowed'))
-            record.overdue_loan_count = len(borrows.filtered(lambda b: b.state == 'overdue'))
-            record.total_loans = len(borrows)
-
-    @api.depends('borrow_ids', 'borrow_ids.fine_amount', 'borrow_ids.state')
+    @api.depends('fine_balance', 'borrow_ids.fine_amount', 'borrow_ids.state')
     def _compute_total_fines(self):
-        """Compute total outstanding fines."""
+        """Compute total outstanding fines: ledger balance plus running fines of open loans."""
+        running = {}
+        if self.ids:
+            groups = self.env['library.borrow'].read_group(
+                [('member_id', 'in', self.ids), ('state', 'in', ('borrowed', 'overdue'))],
+                ['member_id', 'fine_amount:sum'],
+                ['member_id']
+            )
+            running = {group['member_id'][0]: group['fine_amount'] for group in groups}
         for record in self:
-            overdue_borrows = record.borrow_ids.filtered(lambda b: b.state in ('overdue', 'borrowed'))
-            record.total_fines = sum(overdue_borrows.mapped('fine_amount'))
+            record.total_fines = record.fine_balance + running.get(record.id, 0.0)
 
     def can_borrow_book(self):
         """Check if member can borrow more books."""
         self.ensure_one()
         if self.membership_status != 'active':
             return False, f'Member {self.name} has {self.membership_status} membership.'
-        if self.active_loan_count >= self.max_concurrent_loans:
-            return False, f'Member {self.name} has reached the maximum of {self.max_concurrent_loans} concurrent loans.'
+        if self.membership_end_date and self.membership_end_date < fields.Date.today():
+            return False, f'The membership of {self.name} ended on {self.membership_end_date}.'
+        limit = self.env['library.member.type']._get_policy(self.member_type_id.id).max_concurrent_loans
+        if self.active_loan_count >= limit:
+            return False, f'Member {self.name} has reached the maximum of {limit} concurrent loans.'
         return True, ''
 
+    def action_renew_membership(self):
+        """Extend the memberships by the renewal period.
+
+        Memberships still running are extended from their end date, ended
+        ones from today. Members sharing the same new end date are renewed
+        with one write.
+        """
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'baramej_library_system.membership_renewal_days', 365))
+        today = fields.Date.today()
+        by_end_date = defaultdict(lambda: self.browse())
+        for record in self:
+            start = max(record.membership_end_date or today, today)
+            by_end_date[start + timedelta(days=days)] |= record
+        for end_date, members in by_end_date.items():
+            members.write({'membership_end_date': end_date})
+        return True
+
+    def action_renew_all_loans(self):
+        """Renew every borrowed loan of these members and report the outcome."""
+        result = self.env['library.borrow'].renew_member_loans(self.ids)
+        message = f'{len(result["renewed"])} loan(s) renewed.'
+        if result['refused']:
+            message += f' {len(result["refused"])} loan(s) could not be renewed.'
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': message,
+                'type': 'warning' if result['refused'] else 'success',
+                'sticky': False,
+            },
+        }
+
+    @api.model
+    def _cron_expire_memberships(self, batch_size=None):
+        """Scheduled action expiring the memberships whose end date passed.
+
+        Active members with an end date before today are found through the
+        expiry index and set ``inactive`` in chunks of ``batch_size`` (one
+        write and one bulk chatter log per chunk), committing after each
+        chunk. Expired members leave the ``active`` status, so an interrupted
+        run resumes where it stopped. Returns the number of members expired.
+        """
+        if batch_size is None:
+            batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                'baramej_library_system.membership_expiry_batch_size', 1000))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        domain = [('membership_status', '=', 'active'), ('membership_end_date', '<', fields.Date.today())]
+        Member = self.with_context(tracking_disable=True)
+
+        expired = 0
+        while True:
+            chunk = Member.search(domain, limit=batch_size, order='id')
+            if not chunk:
+                break
+            chunk.write({'membership_status': 'inactive'})
+            chunk._message_log_batch(bodies={
+                member.id: f'Membership expired on {member.membership_end_date}.' for member in chunk
+            })
+            expired += len(chunk)
+            if auto_commit:
+                self.env.cr.commit()
+                self.invalidate_cache()
+
+        _logger.info('Membership expiry: %s members expired', expired)
+        return expired
+
+    @api.model
+    def _adjust_loan_counters(self, deltas):
+        """Apply ``{member_id: (active, overdue, total)}`` counter deltas in one statement."""
+        deltas = {member_id: delta for member_id, delta in deltas.items() if member_id and any(delta)}
+        if not deltas:
+            return
+        self.flush(self._LOAN_COUNTER_FIELDS)
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(deltas))
+        self.env.cr.execute(f"""
+            UPDATE library_member m
+               SET active_loan_count = m.active_loan_count + d.active,
+                   overdue_loan_count = m.overdue_loan_count + d.overdue,
+                   total_loans = m.total_loans + d.total
+              FROM (VALUES {values}) AS d(id, active, overdue, total)
+             WHERE m.id = d.id
+        """, [value for member_id, delta in deltas.items() for value in (member_id, *delta)])
+        members = self.browse(list(deltas))
+        members.invalidate_cache(self._LOAN_COUNTER_FIELDS, members.ids)
+        members.modified(self._LOAN_COUNTER_FIELDS)
+
+    @api.model
+    def _rebuild_loan_counters(self):
+        """Recompute every member's loan counters with one grouped query.
+
+        Repairs counters that drifted (e.g. after direct SQL changes) and
+        initialises them on installation. Archived loans count in the totals.
+        Returns the number of members fixed.
+        """
+        self.env['library.borrow'].flush(['member_id', 'state'])
+        self.flush(self._LOAN_COUNTER_FIELDS)
+        self.env.cr.execute("""
+            WITH loans AS (
+                SELECT member_id, state FROM library_borrow
+                 UNION ALL
+                SELECT member_id, state FROM library_borrow_archive
+            ), stats AS (
+                SELECT member_id,
+                       COUNT(*) FILTER (WHERE state = 'borrowed') AS active,
+                       COUNT(*) FILTER (WHERE state = 'overdue') AS overdue,
+                       COUNT(*) AS total
+                  FROM loans
+              GROUP BY member_id
+            )
+            UPDATE library_member m
+               SET active_loan_count = COALESCE(s.active, 0),
+                   overdue_loan_count = COALESCE(s.overdue, 0),
+                   total_loans = COALESCE(s.total, 0)
+              FROM library_member mm
+         LEFT JOIN stats s ON s.member_id = mm.id
+             WHERE m.id = mm.id
+               AND (m.active_loan_count, m.overdue_loan_count, m.total_loans)
+                   IS DISTINCT FROM (COALESCE(s.active, 0), COALESCE(s.overdue, 0), COALESCE(s.total, 0))
+        """)
+        fixed = self.env.cr.rowcount
+        self.invalidate_cache(self._LOAN_COUNTER_FIELDS)
+        return fixed
+
+    @api.model
+    def _adjust_fine_balance(self, deltas):
+        """Apply ``{member_id: amount}`` balance deltas in one statement."""
+        deltas = {member_id: delta for member_id, delta in deltas.items() if member_id and delta}
+        if not deltas:
+            return
+        self.flush(['fine_balance'])
+        values = ', '.join(['(%s, %s::float8)'] * len(deltas))
+        self.env.cr.execute(f"""
+            UPDATE library_member m
+               SET fine_balance = m.fine_balance + d.amount
+              FROM (VALUES {values}) AS d(id, amount)
+             WHERE m.id = d.id
+        """, [value for item in deltas.items() for value in item])
+        members = self.browse(list(deltas))
+        members.invalidate_cache(['fine_balance'], members.ids)
+        members.modified(['fine_balance'])
+
     @api.model
-    def search_by_barcode(self, barcode):
-        """Search member by barcode for scanning operations."""
-        return self.search([('barcode', '=', barcode)], limit=1)
+    def _rebuild_fine_balances(self):
+        """Recompute every member's fine balance from the ledger in one grouped query."""
+        self.env['library.fine'].flush(['member_id', 'signed_amount'])
+        self.flush(['fine_balance'])
+        self.env.cr.execute("""
+            WITH balances AS (
+                SELECT member_id, SUM(signed_amount) AS balance
+                  FROM library_fine
+              GROUP BY member_id
+            )
+            UPDATE library_member m
+               SET fine_balance = COALESCE(b.balance, 0)
+              FROM library_member mm
+         LEFT JOIN balances b ON b.member_id = mm.id
+             WHERE m.id = mm.id
+               AND m.fine_balance IS DISTINCT FROM COALESCE(b.balance, 0)
+        """)
+        fixed = self.env.cr.rowcount
+        self.invalidate_cache(['fine_balance'])
+        return fixed
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
+from collections import namedtuple
+
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 
+# Borrowing limits of a member type, as served by the policy cache
+MemberPolicy = namedtuple('MemberPolicy', ['max_concurrent_loans', 'max_loan_days', 'fine_per_day', 'max_renewals'])
+
 
 class LibraryMemberType(models.Model):
     """Member type/tier defining borrowing limits and privileges."""
@@ -29,6 +34,11 @@ class LibraryMemberType(models.Model):
         default=0.5,
         help='Daily fine amount for overdue books'
     )
+    max_renewals = fields.Integer(
+        string='Max Renewals',
+        default=2,
+        help='Number of times a loan can be renewed'
+    )
     active = fields.Boolean(string='Active', default=True)
     member_ids = fields.One2many('library.member', 'member_type_id', string='Members')
     member_count = fields.Integer(string='Member Count', compute='_compute_member_count')
@@ -39,7 +49,10 @@ class LibraryMemberType(models.Model):
         ('code_unique', 'UNIQUE(code)', 'The member type code must be unique!'),
     ]
 
-    @api.constrains('max_concurrent_loans', 'max_loan_days')
+    # Fields served by the policy cache, see _get_policy()
+    _POLICY_FIELDS = MemberPolicy._fields
+
+    @api.constrains('max_concurrent_loans', 'max_loan_days', 'max_renewals')
     def _check_positive_values(self):
         """Ensure limits are positive."""
         for record in self:
@@ -47,6 +60,38 @@ class LibraryMemberType(models.Model):
                 raise ValidationError('Maximum concurrent loans must be greater than zero.')
             if record.max_loan_days <= 0:
                 raise ValidationError('Maximum loan days must be greater than zero.')
+            if record.max_renewals < 0:
+                raise ValidationError('Maximum renewals cannot be negative.')
+
+    def write(self, vals):
+        result = super(LibraryMemberType, self).write(vals)
+        if any(fname in vals for fname in self._POLICY_FIELDS):
+            self.clear_caches()
+        return result
+
+    def unlink(self):
+        result = super(LibraryMemberType, self).unlink()
+        self.clear_caches()
+        return result
+
+    @api.model
+    @tools.ormcache('type_id')
+    def _get_policy(self, type_id):
+        """Return the ``MemberPolicy`` of a member type, with zero limits for no type.
+
+        Policies are kept in a registry cache, cleared on every worker when
+        a limit changes, so checkouts, limit checks and fine computations
+        do not read member types.
+        """
+        if not type_id:
+            return MemberPolicy(0, 0, 0.0, 0)
+        self.flush(list(self._POLICY_FIELDS))
+        self.env.cr.execute(
+            f'SELECT {", ".join(self._POLICY_FIELDS)} FROM library_member_type WHERE id = %s',
+            [type_id]
+        )
+        row = self.env.cr.fetchone()
+        return MemberPolicy(*row) if row else MemberPolicy(0, 0, 0.0, 0)
 
     @api.depends('member_ids')
     def _compute_member_count(self):
@@ -7,3 +7,10 @@ class LibraryPublisher(models.Model):
     name = fields.Char(string='Publisher Name', required=True)
     address = fields.Text(string='Address')
     book_ids = fields.One2many('library.book', 'publisher_id', string='Books')
+
+    def write(self, vals):
+        """Refresh the catalog search vector of the books of renamed publishers."""
+        result = super(LibraryPublisher, self).write(vals)
+        if 'name' in vals:
+            self.env['library.book']._update_search_vectors('publisher_id', self.ids)
+        return result
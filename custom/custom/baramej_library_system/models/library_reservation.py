@@ -1,13 +1,249 @@
-from odoo import models, fields
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
 
 class LibraryReservation(models.Model):
+    """Hold on a book, served first come, first served when copies come back."""
     _name = 'library.reservation'
     _description = 'Library Book Reservation'
+    _order = 'id'
 
-    book_id = fields.Many2one('library.book', string='Book', required=True)
-    member_id = fields.Many2one('library.member', string='Member', required=True)
+    book_id = fields.Many2one('library.book', string='Book', required=True, index=True)
+    member_id = fields.Many2one('library.member', string='Member', required=True, index=True)
     reservation_date = fields.Date(string='Reservation Date', default=fields.Date.today)
     status = fields.Selection([
         ('reserved', 'Reserved'),
+        ('ready', 'Ready for Pickup'),
+        ('fulfilled', 'Fulfilled'),
+        ('expired', 'Expired'),
         ('canceled', 'Canceled')
-    ], string='Status', default='reserved')
+    ], string='Status', default='reserved', required=True)
+    copy_id = fields.Many2one('library.book.copy', string='Held Copy', readonly=True)
+    ready_date = fields.Date(string='Ready Since', readonly=True)
+    expiry_date = fields.Date(string='Pickup Before', readonly=True)
+    borrow_id = fields.Many2one('library.borrow', string='Loan', readonly=True, ondelete='set null')
+    queue_position = fields.Integer(string='Position in Queue', compute='_compute_queue_position')
+
+    # Holds still waiting for, or holding, a copy
+    _OPEN_STATUSES = ('reserved', 'ready')
+
+    def init(self):
+        """Index the waiting holds of each book in arrival order.
+
+        The queue head of a title is found with one index lookup, however
+        long the queue is.
+        """
+        if not tools.index_exists(self._cr, 'library_reservation_queue_index'):
+            self._cr.execute("""
+                CREATE INDEX library_reservation_queue_index
+                    ON library_reservation (book_id, id)
+                 WHERE status = 'reserved'
+            """)
+
+    @api.constrains('member_id', 'book_id', 'status')
+    def _check_single_open_hold(self):
+        """Ensure a member holds at most one place in the queue of a book."""
+        open_holds = self.filtered(lambda r: r.status in self._OPEN_STATUSES)
+        if not open_holds:
+            return
+        groups = self.read_group(
+            [('member_id', 'in', open_holds.member_id.ids),
+             ('book_id', 'in', open_holds.book_id.ids),
+             ('status', 'in', self._OPEN_STATUSES)],
+            ['member_id', 'book_id'],
+            ['member_id', 'book_id'],
+            lazy=False
+        )
+        for group in groups:
+            if group['__count'] > 1:
+                raise ValidationError(f'{group["member_id"][1]} already has a hold on "{group["book_id"][1]}".')
+
+    def _compute_queue_position(self):
+        """Rank waiting holds within their book queue, for all books at once."""
+        positions = {}
+        waiting = self.filtered(lambda r: r.status == 'reserved')
+        if waiting.book_id:
+            self.flush(['status', 'book_id'])
+            self.env.cr.execute("""
+                SELECT id, row_number() OVER (PARTITION BY book_id ORDER BY id)
+                  FROM library_reservation
+                 WHERE status = 'reserved' AND book_id = ANY(%s)
+            """, [waiting.book_id.ids])
+            positions = dict(self.env.cr.fetchall())
+        for record in self:
+            record.queue_position = positions.get(record.id, 0)
+
+    def action_cancel(self):
+        """Cancel holds; a copy held for pickup goes to the next hold in line."""
+        ready = self.filtered(lambda r: r.status == 'ready')
+        holdings = [(hold.book_id.id, hold.copy_id.id) for hold in ready]
+        self.filtered(lambda r: r.status in self._OPEN_STATUSES).write({'status': 'canceled'})
+        self.env['library.borrow']._release_copies(holdings)
+
+    @api.model
+    def _allocate_returned(self, holdings):
+        """Hand copies coming back to the head of their book's hold queue.
+
+        ``holdings`` are ``(book_id, copy_id)`` pairs (``copy_id`` is False for
+        books without physical copies). Each allocation takes the oldest
+        waiting hold with one indexed statement, skipping holds another
+        transaction is allocating. Allocated copies stay off the shelf until
+        picked up. Returns the pairs no hold was waiting for.
+        """
+        book_ids = list({book_id for book_id, _copy_id in holdings})
+        if not book_ids:
+            return holdings
+        self.flush(['status', 'book_id'])
+        self.env.cr.execute("""
+            SELECT DISTINCT book_id FROM library_reservation
+             WHERE book_id = ANY(%s) AND status = 'reserved'
+        """, [book_ids])
+        queued = {row[0] for row in self.env.cr.fetchall()}
+        if not queued:
+            return holdings
+
+        today = fields.Date.today()
+        pickup_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'baramej_library_system.hold_pickup_days', 3))
+        leftover, allocated, held_copy_ids = [], [], []
+        for book_id, copy_id in holdings:
+            if book_id in queued:
+                self.env.cr.execute("""
+                    UPDATE library_reservation
+                       SET status = 'ready', copy_id = %s, ready_date = %s, expiry_date = %s
+                     WHERE id = (
+                         SELECT id FROM library_reservation
+                          WHERE book_id = %s AND status = 'reserved'
+                       ORDER BY id
+                          LIMIT 1
+                            FOR UPDATE SKIP LOCKED
+                     )
+                 RETURNING id
+                """, [copy_id or None, today, today + timedelta(days=pickup_days), book_id])
+                row = self.env.cr.fetchone()
+                if row:
+                    allocated.append(row[0])
+                    if copy_id:
+                        held_copy_ids.append(copy_id)
+                    continue
+                queued.discard(book_id)
+            leftover.append((book_id, copy_id))
+
+        if held_copy_ids:
+            self.env['library.book.copy'].flush(['status'])
+            self.env.cr.execute(
+                "UPDATE library_book_copy SET status = 'on_hold' WHERE id = ANY(%s) RETURNING book_id",
+                [held_copy_ids]
+            )
+            held_book_ids = {row[0] for row in self.env.cr.fetchall()}
+            self.env['library.book.copy'].invalidate_cache(['status'], held_copy_ids)
+            self.env['library.book']._sync_copy_availability(list(held_book_ids))
+        holds = self.browse(allocated)
+        holds.invalidate_cache(['status', 'copy_id', 'ready_date', 'expiry_date'], holds.ids)
+        holds._notify_ready()
+        return leftover
+
+    @api.model
+    def _fulfil_holds(self, loans):
+        """Lend the copies held for pickup to the members who placed the holds.
+
+        Returns the loans served from a hold; they take no other copy.
+        """
+        holds = self.search([
+            ('status', '=', 'ready'),
+            ('book_id', 'in', loans.book_id.ids),
+            ('member_id', 'in', loans.member_id.ids)
+        ])
+        if not holds:
+            return loans.browse()
+        holds_by_key = {(hold.member_id.id, hold.book_id.id): hold for hold in holds}
+        served = loans.browse()
+        held_copies = {}
+        for loan in loans:
+            hold = holds_by_key.pop((loan.member_id.id, loan.book_id.id), None)
+            if not hold or (loan.copy_id and loan.copy_id != hold.copy_id):
+                continue
+            hold.write({'status': 'fulfilled', 'borrow_id': loan.id})
+            if hold.copy_id:
+                held_copies[loan.id] = hold.copy_id.id
+            served |= loan
+
+        # Set the copies directly, a copy change through the ORM would claim them again
+        if held_copies:
+            served.flush(['copy_id'])
+            values = ', '.join(['(%s, %s)'] * len(held_copies))
+            self.env.cr.execute(f"""
+                UPDATE library_borrow b SET copy_id = d.copy_id
+                  FROM (VALUES {values}) AS d(id, copy_id)
+                 WHERE b.id = d.id
+            """, [value for item in held_copies.items() for value in item])
+            served.invalidate_cache(['copy_id'], list(held_copies))
+        copies = self.env['library.book.copy'].browse(list(held_copies.values()))
+        if copies:
+            self.env['library.book.copy'].flush(['status'])
+            self.env.cr.execute(
+                "UPDATE library_book_copy SET status = 'on_loan' WHERE id = ANY(%s)", [copies.ids]
+            )
+            copies.invalidate_cache(['status'], copies.ids)
+            self.env['library.book']._sync_copy_availability(copies.book_id.ids)
+        return served
+
+    def _notify_ready(self):
+        """Queue a pickup notification for each hold that became ready.
+
+        All holds are rendered with one template call and queued as
+        ``mail.mail`` records with one create, like the loan reminders.
+        """
+        template = self.env.ref('baramej_library_system.mail_template_hold_ready', raise_if_not_found=False)
+        holds = self.filtered(lambda r: r.member_id.email)
+        if not template or not holds:
+            return
+        render_fields = ['subject', 'body_html', 'email_from', 'email_to', 'reply_to']
+        rendered = template.generate_email(holds.ids, render_fields)
+        self.env['mail.mail'].sudo().create([
+            dict(
+                {fname: rendered[hold.id].get(fname) for fname in render_fields},
+                model=self._name,
+                res_id=hold.id,
+                auto_delete=template.auto_delete,
+                mail_server_id=template.mail_server_id.id,
+            )
+            for hold in holds
+        ])
+
+    @api.model
+    def _cron_expire_holds(self, batch_size=None):
+        """Scheduled action expiring holds not picked up in time.
+
+        Expired holds pass their copy on to the next hold in line, or put it
+        back on the shelf. Holds are processed in chunks of ``batch_size``,
+        committing after each chunk; expired holds leave the ``ready`` status,
+        so an interrupted run resumes where it stopped.
+        """
+        if batch_size is None:
+            batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                'baramej_library_system.hold_expiry_batch_size', 500))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        domain = [('status', '=', 'ready'), ('expiry_date', '<', fields.Date.today())]
+
+        expired = 0
+        while True:
+            chunk = self.search(domain, limit=batch_size, order='id')
+            if not chunk:
+                break
+            holdings = [(hold.book_id.id, hold.copy_id.id) for hold in chunk]
+            chunk.write({'status': 'expired'})
+            self.env['library.borrow']._release_copies(holdings)
+            expired += len(chunk)
+            if auto_commit:
+                self.env.cr.commit()
+                self.invalidate_cache()
+
+        _logger.info('Hold expiry: %s holds expired', expired)
+        return True
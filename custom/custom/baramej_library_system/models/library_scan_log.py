@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class LibraryScanLog(models.Model):
+    """Desk scan received from a scanner queue, with its outcome.
+
+    Scans are keyed by the UUID the scanner gave them, so a batch sent
+    again after a lost response is answered from the log instead of being
+    applied twice.
+    """
+    _name = 'library.scan.log'
+    _description = 'Library Scan Log'
+    _order = 'id desc'
+
+    scan_uuid = fields.Char(string='Scan UUID', required=True, readonly=True)
+    member_barcode = fields.Char(string='Member Barcode', readonly=True)
+    book_barcode = fields.Char(string='Book Barcode', readonly=True)
+    operation = fields.Selection([
+        ('auto', 'Auto Detect'),
+        ('borrow', 'Borrow'),
+        ('return', 'Return')
+    ], string='Requested Operation', readonly=True)
+    scanned_at = fields.Datetime(string='Scanned At', readonly=True, help='Time of the scan on the desk')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], string='Status', default='pending', readonly=True)
+    result_operation = fields.Selection([
+        ('borrow', 'Borrow'),
+        ('return', 'Return')
+    ], string='Operation', readonly=True)
+    borrow_id = fields.Many2one('library.borrow', string='Loan', readonly=True, ondelete='set null')
+    message = fields.Text(string='Result', readonly=True)
+
+    _sql_constraints = [
+        ('scan_uuid_unique', 'UNIQUE(scan_uuid)', 'A scan can only be received once.'),
+    ]
+
+    @api.model
+    def _claim(self, scans):
+        """Register new scans, given as dicts, and return the UUIDs claimed by this call.
+
+        Scans already logged, or being ingested by a concurrent request, are
+        not claimed; the insert waits for a concurrent request to finish.
+        """
+        values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(scans))
+        now, uid = fields.Datetime.now(), self.env.uid
+        self.env.cr.execute(f"""
+            INSERT INTO library_scan_log (
+                scan_uuid, member_barcode, book_barcode, operation, scanned_at, state,
+                create_uid, create_date, write_uid, write_date)
+            VALUES {values}
+            ON CONFLICT (scan_uuid) DO NOTHING
+            RETURNING scan_uuid
+        """, [value for scan in scans for value in (
+            scan['uuid'], scan['member_barcode'], scan['book_barcode'], scan['operation'],
+            scan['scanned_at'], 'pending', uid, now, uid, now,
+        )])
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _record_outcomes(self, outcomes):
+        """Store ``{scan_uuid: result}`` outcomes of claimed scans in one statement."""
+        if not outcomes:
+            return
+        values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(outcomes))
+        self.env.cr.execute(f"""
+            UPDATE library_scan_log l
+               SET state = d.state, result_operation = d.operation, borrow_id = d.borrow_id::integer,
+                   message = d.message
+              FROM (VALUES {values}) AS d(scan_uuid, state, operation, borrow_id, message)
+             WHERE l.scan_uuid = d.scan_uuid
+        """, [value for scan_uuid, result in outcomes.items() for value in (
+            scan_uuid,
+            'done' if result['success'] else 'failed',
+            result['operation'] if result['operation'] in ('borrow', 'return') else None,
+            result['borrow_id'] or None,
+            result['message'],
+        )])
+        self.invalidate_cache()
+
+    @api.model
+    def _get_outcomes(self, scan_uuids):
+        """Return the logged ``{scan_uuid: result}`` outcomes of these scans."""
+        if not scan_uuids:
+            return {}
+        self.env.cr.execute("""
+            SELECT scan_uuid, state, result_operation, borrow_id, message
+              FROM library_scan_log
+             WHERE scan_uuid = ANY(%s)
+        """, [list(scan_uuids)])
+        return {
+            scan_uuid: {
+                'success': state == 'done',
+                'operation': operation or False,
+                'borrow_id': borrow_id or False,
+                'message': message or '',
+            }
+            for scan_uuid, state, operation, borrow_id, message in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _cron_purge_scan_log(self, keep_days=None):
+        """Scheduled action deleting scan log entries older than ``keep_days``.
+
+        Scanners drop scans from their queue once acknowledged, so the log
+        only needs to outlive the retries of a disconnected desk.
+        """
+        if keep_days is None:
+            keep_days = int(self.env['ir.config_parameter'].sudo().get_param(
+                'baramej_library_system.scan_log_days', 30))
+        self.env.cr.execute(
+            'DELETE FROM library_scan_log WHERE create_date < %s',
+            [fields.Datetime.now() - timedelta(days=keep_days)]
+        )
+        purged = self.env.cr.rowcount
+        self.invalidate_cache()
+        _logger.info('Scan log: %s entries purged', purged)
+        return purged
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+DISCREPANCY_KINDS = [
+    ('missing', 'Missing'),
+    ('misplaced', 'Misplaced'),
+    ('on_loan', 'On Loan but Found'),
+    ('found', 'Found (Not Expected)'),
+    ('unknown', 'Unknown Barcode'),
+]
+
+
+class LibraryStocktake(models.Model):
+    """Shelf audit of one location.
+
+    Scanned barcodes are ingested in bulk, counted per barcode, and
+    reconciled against the expected holdings of the location when the
+    session is closed. Copy-tracked titles are checked copy by copy, other
+    titles by comparing the number of scans of their barcode with their
+    ``available_copies`` and the copies held for ready holds. The
+    discrepancies are kept as the session report.
+    """
+    _name = 'library.stocktake'
+    _description = 'Library Stocktake'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True, default='Stocktake')
+    location_id = fields.Many2one('library.location', string='Location', required=True, ondelete='restrict')
+    user_id = fields.Many2one('res.users', string='Responsible', default=lambda self: self.env.user)
+    state = fields.Selection([
+        ('open', 'Scanning'),
+        ('done', 'Reconciled'),
+        ('cancelled', 'Cancelled')
+    ], string='Status', default='open', required=True, readonly=True)
+    started_at = fields.Datetime(string='Started', default=fields.Datetime.now, readonly=True)
+    closed_at = fields.Datetime(string='Closed', readonly=True)
+    barcode_input = fields.Text(
+        string='Scanned Barcodes',
+        help='One barcode per line, or separated by spaces or commas; added to the session by Add Scans'
+    )
+    scan_ids = fields.One2many('library.stocktake.scan', 'stocktake_id', string='Scans')
+    line_ids = fields.One2many('library.stocktake.line', 'stocktake_id', string='Discrepancies')
+    scan_count = fields.Integer(string='Scans', compute='_compute_scan_count')
+    barcode_count = fields.Integer(string='Distinct Barcodes', compute='_compute_scan_count')
+    missing_count = fields.Integer(string='Missing', compute='_compute_discrepancy_counts')
+    misplaced_count = fields.Integer(string='Misplaced', compute='_compute_discrepancy_counts')
+    on_loan_count = fields.Integer(string='On Loan but Found', compute='_compute_discrepancy_counts')
+    found_count = fields.Integer(string='Found', compute='_compute_discrepancy_counts')
+    unknown_count = fields.Integer(string='Unknown', compute='_compute_discrepancy_counts')
+    corrected_book_count = fields.Integer(string='Titles Corrected', readonly=True)
+
+    def init(self):
+        """Allow one open stocktake per location."""
+        if not tools.index_exists(self._cr, 'library_stocktake_open_location_index'):
+            self._cr.execute("""
+                CREATE UNIQUE INDEX library_stocktake_open_location_index
+                    ON library_stocktake (location_id) WHERE state = 'open'
+            """)
+
+    def _compute_scan_count(self):
+        """Sum the scans of the sessions with one grouped query."""
+        counts = {}
+        if self.ids:
+            groups = self.env['library.stocktake.scan'].read_group(
+                [('stocktake_id', 'in', self.ids)], ['stocktake_id', 'scan_count'], ['stocktake_id']
+            )
+            counts = {group['stocktake_id'][0]: group for group in groups}
+        for record in self:
+            group = counts.get(record.id, {})
+            record.scan_count = group.get('scan_count', 0)
+            record.barcode_count = group.get('stocktake_id_count', 0)
+
+    def _compute_discrepancy_counts(self):
+        """Sum the discrepancy quantities of the sessions per kind."""
+        counts = {}
+        if self.ids:
+            groups = self.env['library.stocktake.line'].read_group(
+                [('stocktake_id', 'in', self.ids)], ['stocktake_id', 'kind', 'quantity'],
+                ['stocktake_id', 'kind'], lazy=False
+            )
+            counts = {(group['stocktake_id'][0], group['kind']): group['quantity'] for group in groups}
+        for record in self:
+            for kind, _label in DISCREPANCY_KINDS:
+                record[f'{kind}_count'] = counts.get((record.id, kind), 0)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(LibraryStocktake, self).create(vals_list)
+        for record in records.filtered(lambda r: r.name == 'Stocktake'):
+            record.name = f'Stocktake {record.location_id.code} {fields.Date.today()}'
+        return records
+
+    def action_add_scans(self):
+        """Add the barcodes typed or pasted in the form to the session."""
+        for record in self:
+            record.add_barcodes((record.barcode_input or '').replace(',', ' ').split())
+        self.barcode_input = False
+
+    def add_barcodes(self, barcodes):
+        """Count a batch of scanned barcodes in the session.
+
+        The batch is aggregated and merged into the scan counts by one
+        statement, whatever its size, so scanner clients can send thousands
+        of barcodes per call. Returns the number of scans added.
+        """
+        self.ensure_one()
+        self.check_access_rights('write')
+        if self.state != 'open':
+            raise UserError('Scans can only be added to an open stocktake.')
+        barcodes = [barcode.strip() for barcode in barcodes if barcode and barcode.strip()]
+        if not barcodes:
+            return 0
+        self.env.cr.execute("""
+            INSERT INTO library_stocktake_scan (stocktake_id, barcode, scan_count)
+            SELECT %s, barcode, count(*)
+              FROM unnest(%s::varchar[]) AS s(barcode)
+          GROUP BY barcode
+          ORDER BY barcode
+            ON CONFLICT (stocktake_id, barcode)
+            DO UPDATE SET scan_count = library_stocktake_scan.scan_count + EXCLUDED.scan_count
+        """, [self.id, barcodes])
+        self.env['library.stocktake.scan'].invalidate_cache()
+        self.invalidate_cache(['scan_ids', 'scan_count', 'barcode_count'], self.ids)
+        return len(barcodes)
+
+    def action_cancel(self):
+        """Abandon open sessions, leaving the holdings untouched."""
+        self.filtered(lambda r: r.state == 'open').write({'state': 'cancelled', 'closed_at': fields.Datetime.now()})
+
+    def action_close(self):
+        """Reconcile the sessions and correct the holdings of their locations."""
+        for record in self:
+            if record.state != 'open':
+                raise UserError('Only an open stocktake can be closed.')
+            record._reconcile()
+            record._apply_corrections()
+            record.write({'state': 'done', 'closed_at': fields.Datetime.now()})
+        return True
+
+    def _reconcile(self):
+        """Write the discrepancy report of the session in one statement.
+
+        Copy-tracked titles are compared copy by copy: copies of the location
+        on the shelf or hold shelf and not scanned are missing, scanned copies
+        recorded at another location are misplaced, scanned copies on loan
+        or marked lost are on loan but found, or found. Other titles of the
+        location are compared by count: their available copies and the
+        copies held for ready holds are expected, fewer scans are missing,
+        more are counted against the open loans of the title first, then as
+        found. Barcodes matching neither are unknown.
+        """
+        self.ensure_one()
+        self.env['library.book'].flush(['barcode', 'location_id', 'available_copies', 'total_copies'])
+        self.env['library.book.copy'].flush(['book_id', 'barcode', 'location_id', 'status'])
+        self.env['library.borrow'].flush(['book_id', 'state'])
+        self.env['library.reservation'].flush(['book_id', 'status'])
+        self.env.cr.execute('DELETE FROM library_stocktake_line WHERE stocktake_id = %s', [self.id])
+        self.env.cr.execute("""
+            WITH scans AS (
+                SELECT barcode, scan_count FROM library_stocktake_scan WHERE stocktake_id = %(session)s
+            ), copies AS (
+                SELECT c.id, c.book_id, c.barcode, c.status, COALESCE(c.location_id, b.location_id) AS location_id
+                  FROM library_book_copy c
+                  JOIN library_book b ON b.id = c.book_id
+            ), titles AS (
+                SELECT b.id AS book_id, b.barcode, b.location_id, b.available_copies,
+                       COALESCE(s.scan_count, 0) AS found,
+                       (SELECT count(*) FROM library_borrow l
+                         WHERE l.book_id = b.id AND l.state IN ('borrowed', 'overdue')) AS on_loan,
+                       (SELECT count(*) FROM library_reservation r
+                         WHERE r.book_id = b.id AND r.status = 'ready') AS held
+                  FROM library_book b
+             LEFT JOIN scans s ON s.barcode = b.barcode
+                 WHERE (b.location_id = %(location)s OR s.barcode IS NOT NULL)
+                   AND NOT EXISTS (SELECT 1 FROM library_book_copy c WHERE c.book_id = b.id)
+            ), lines AS (
+                SELECT 'missing' AS kind, c.barcode, c.book_id, c.id AS copy_id, c.location_id, 1 AS quantity
+                  FROM copies c
+                 WHERE c.location_id = %(location)s AND c.status IN ('available', 'on_hold')
+                   AND NOT EXISTS (SELECT 1 FROM scans s WHERE s.barcode = c.barcode)
+                 UNION ALL
+                SELECT CASE c.status WHEN 'on_loan' THEN 'on_loan' WHEN 'lost' THEN 'found' ELSE 'misplaced' END,
+                       c.barcode, c.book_id, c.id, c.location_id, 1
+                  FROM copies c
+                  JOIN scans s ON s.barcode = c.barcode
+                 WHERE c.status IN ('on_loan', 'lost') OR c.location_id IS DISTINCT FROM %(location)s
+                 UNION ALL
+                SELECT 'misplaced', barcode, book_id, NULL, location_id, found
+                  FROM titles
+                 WHERE location_id IS DISTINCT FROM %(location)s
+                 UNION ALL
+                SELECT 'missing', barcode, book_id, NULL, location_id, available_copies + held - found
+                  FROM titles
+                 WHERE location_id = %(location)s AND found < available_copies + held
+                 UNION ALL
+                SELECT 'on_loan', barcode, book_id, NULL, location_id, LEAST(found - available_copies - held, on_loan)
+                  FROM titles
+                 WHERE location_id = %(location)s AND found > available_copies + held AND on_loan > 0
+                 UNION ALL
+                SELECT 'found', barcode, book_id, NULL, location_id, found - available_copies - held - on_loan
+                  FROM titles
+                 WHERE location_id = %(location)s AND found > available_copies + held + on_loan
+                 UNION ALL
+                SELECT 'unknown', s.barcode, b.id, NULL, NULL, s.scan_count
+                  FROM scans s
+             LEFT JOIN library_book b ON b.barcode = s.barcode
+                 WHERE NOT EXISTS (SELECT 1 FROM copies c WHERE c.barcode = s.barcode)
+                   AND NOT EXISTS (SELECT 1 FROM titles t WHERE t.barcode = s.barcode)
+            )
+            INSERT INTO library_stocktake_line (stocktake_id, kind, barcode, book_id, copy_id, location_id, quantity)
+            SELECT %(session)s, kind, barcode, book_id, copy_id, location_id, quantity
+              FROM lines
+          ORDER BY kind, book_id, copy_id
+        """, {'session': self.id, 'location': self.location_id.id})
+        lines = self.env.cr.rowcount
+        self.env['library.stocktake.line'].invalidate_cache()
+        self.invalidate_cache(['line_ids'], self.ids)
+        _logger.info('Stocktake %s: %s discrepancies at location %s', self.id, lines, self.location_id.id)
+        return lines
+
+    def _apply_corrections(self):
+        """Bring the holdings of the location in line with the reconciled session.
+
+        Missing shelf copies are marked lost and lost copies found on the
+        shelf are put back at this location, then the counters of their
+        titles are refreshed from the copies. Titles without copies get
+        their ``available_copies`` set to the copies found, less those held
+        for ready holds, within what the title owns besides its open loans
+        and holds. Loans of copies found on the shelf are left open for the
+        desk to return.
+        """
+        self.ensure_one()
+        self.env.cr.execute("""
+            UPDATE library_book_copy c
+               SET status = CASE c.status WHEN 'available' THEN 'lost' ELSE 'available' END,
+                   location_id = CASE c.status WHEN 'lost' THEN %(location)s ELSE c.location_id END
+              FROM library_stocktake_line l
+             WHERE l.stocktake_id = %(session)s AND l.copy_id = c.id
+               AND ((l.kind = 'missing' AND c.status = 'available') OR (l.kind = 'found' AND c.status = 'lost'))
+         RETURNING c.id, c.book_id
+        """, {'session': self.id, 'location': self.location_id.id})
+        rows = self.env.cr.fetchall()
+        self.env['library.book.copy'].invalidate_cache(['status', 'location_id'], [row[0] for row in rows])
+        copy_book_ids = {row[1] for row in rows}
+        if copy_book_ids:
+            self.env['library.book']._sync_copy_availability(list(copy_book_ids))
+
+        self.env.cr.execute("""
+            WITH titles AS (
+                SELECT b.id, b.total_copies, COALESCE(s.scan_count, 0) AS found,
+                       (SELECT count(*) FROM library_borrow l
+                         WHERE l.book_id = b.id AND l.state IN ('borrowed', 'overdue')) AS on_loan,
+                       (SELECT count(*) FROM library_reservation r
+                         WHERE r.book_id = b.id AND r.status = 'ready') AS held
+                  FROM library_book b
+             LEFT JOIN library_stocktake_scan s ON s.stocktake_id = %(session)s AND s.barcode = b.barcode
+                 WHERE b.location_id = %(location)s
+                   AND NOT EXISTS (SELECT 1 FROM library_book_copy c WHERE c.book_id = b.id)
+            ), counts AS (
+                SELECT id, LEAST(GREATEST(found - held, 0), GREATEST(total_copies - on_loan - held, 0)) AS available
+                  FROM titles
+            )
+            UPDATE library_book b
+               SET available_copies = c.available
+              FROM counts c
+             WHERE b.id = c.id AND b.available_copies IS DISTINCT FROM c.available
+         RETURNING b.id
+        """, {'session': self.id, 'location': self.location_id.id})
+        books = self.env['library.book'].browse([row[0] for row in self.env.cr.fetchall()])
+        books.invalidate_cache(['available_copies'], books.ids)
+        books.modified(['available_copies'])
+        self.corrected_book_count = len(copy_book_ids | set(books.ids))
+
+
+class LibraryStocktakeScan(models.Model):
+    """Number of times a barcode was scanned during a stocktake."""
+    _name = 'library.stocktake.scan'
+    _description = 'Library Stocktake Scan'
+    _order = 'stocktake_id, barcode'
+    _log_access = False
+
+    stocktake_id = fields.Many2one('library.stocktake', string='Stocktake', required=True, readonly=True, ondelete='cascade')
+    barcode = fields.Char(string='Barcode', required=True, readonly=True)
+    scan_count = fields.Integer(string='Scans', readonly=True)
+
+    _sql_constraints = [
+        ('stocktake_barcode_unique', 'UNIQUE(stocktake_id, barcode)', 'A barcode is counted once per stocktake.'),
+    ]
+
+
+class LibraryStocktakeLine(models.Model):
+    """Discrepancy found by a stocktake reconciliation."""
+    _name = 'library.stocktake.line'
+    _description = 'Library Stocktake Discrepancy'
+    _order = 'stocktake_id, kind, book_id, id'
+    _log_access = False
+
+    stocktake_id = fields.Many2one('library.stocktake', string='Stocktake', required=True, index=True, readonly=True,
+                                   ondelete='cascade')
+    kind = fields.Selection(DISCREPANCY_KINDS, string='Discrepancy', required=True, readonly=True)
+    barcode = fields.Char(string='Barcode', readonly=True)
+    book_id = fields.Many2one('library.book', string='Book', readonly=True, ondelete='cascade')
+    copy_id = fields.Many2one('library.book.copy', string='Copy', readonly=True, ondelete='cascade')
+    location_id = fields.Many2one('library.location', string='Recorded Location', readonly=True, ondelete='set null')
+    quantity = fields.Integer(string='Quantity', readonly=True)
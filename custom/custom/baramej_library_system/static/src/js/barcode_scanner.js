@@ -2,10 +2,13 @@
 
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
+import { ScanQueue } from "@baramej_library_system/js/scan_queue";
 
 /**
  * Barcode Scanner Widget
- * Handles keyboard-wedge barcode scanner input for quick checkout/return
+ * Handles keyboard-wedge barcode scanner input for quick checkout/return.
+ * Scans go through a ScanQueue, so the desk keeps scanning while the
+ * server is slow or unreachable.
  */
 
 class BarcodeScanner extends owl.Component {
@@ -17,36 +20,53 @@ class BarcodeScanner extends owl.Component {
             memberBarcode: "",
             bookBarcode: "",
             scanning: false,
+            pendingScans: 0,
+            failedScans: 0,
         });
+        this.scanQueue = new ScanQueue(
+            this.orm,
+            (scan, result) => this.onScanOutcome(scan, result),
+            (batch, error) => this.onBatchFailure(batch, error)
+        );
+        this.state.pendingScans = this.scanQueue.pending.length;
+        this.state.failedScans = this.scanQueue.failed.length;
+        owl.onMounted(() => this.scanQueue.flush());
+        owl.onWillUnmount(() => this.scanQueue.destroy());
     }
 
-    async processBarcodeScan(memberBarcode, bookBarcode) {
-        try {
-            const result = await this.orm.call(
-                "library.barcode.scan",
-                "create_and_process",
-                [{
-                    member_barcode: memberBarcode,
-                    book_barcode: bookBarcode,
-                    operation: "auto",
-                }]
-            );
-
-            if (result.success) {
-                this.notification.add(result.message, {
-                    type: "success",
-                    title: "Scan Successful",
-                });
-            } else {
-                this.notification.add(result.message || "Scan failed", {
-                    type: "danger",
-                    title: "Scan Error",
-                });
-            }
-        } catch (error) {
-            this.notification.add(error.message || "An error occurred", {
+    processBarcodeScan(memberBarcode, bookBarcode) {
+        this.scanQueue.add(memberBarcode, bookBarcode, "auto");
+        this.state.pendingScans = this.scanQueue.pending.length;
+    }
+
+    retryFailedScans() {
+        this.scanQueue.retryFailed();
+        this.state.pendingScans = this.scanQueue.pending.length;
+        this.state.failedScans = 0;
+    }
+
+    onBatchFailure(batch, error) {
+        this.state.pendingScans = this.scanQueue.pending.length;
+        this.state.failedScans = this.scanQueue.failed.length;
+        const reason = (error.data && error.data.message) || error.message || "Server error";
+        this.notification.add(`${batch.length} scan(s) were rejected by the server and set aside: ${reason}`, {
+            type: "danger",
+            title: "Scans Not Processed",
+            sticky: true,
+        });
+    }
+
+    onScanOutcome(scan, result) {
+        this.state.pendingScans = this.scanQueue.pending.length;
+        if (result.success) {
+            this.notification.add(result.message, {
+                type: "success",
+                title: "Scan Successful",
+            });
+        } else {
+            this.notification.add(result.message || "Scan failed", {
                 type: "danger",
-                title: "Error",
+                title: `Scan Error (${scan.member_barcode} / ${scan.book_barcode})`,
             });
         }
     }
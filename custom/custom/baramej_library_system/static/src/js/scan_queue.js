@@ -0,0 +1,154 @@
+/** @odoo-module **/
+
+import { ConnectionLostError } from "@web/core/network/rpc_service";
+
+/**
+ * Scan Queue
+ * Keeps desk scans in local storage and sends them to the server in batches,
+ * so scanning never waits on the network and no scan is lost when it stalls.
+ * Each scan carries a UUID; the server applies a scan once, however often
+ * its batch is sent again.
+ */
+
+const STORAGE_KEY = "baramej_library_system.scan_queue";
+const FAILED_STORAGE_KEY = "baramej_library_system.scan_queue.failed";
+const BATCH_SIZE = 50;
+const MAX_RETRY_DELAY = 30000;
+
+function newScanUuid() {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return "xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx".replace(/[xy]/g, (char) => {
+        const random = (Math.random() * 16) | 0;
+        return (char === "x" ? random : (random & 0x3) | 0x8).toString(16);
+    });
+}
+
+export class ScanQueue {
+    /**
+     * @param {Object} orm ORM service used to send the batches
+     * @param {Function} onOutcome called with each scan and its server result
+     * @param {Function} onFailure called with a batch the server rejected and the error
+     */
+    constructor(orm, onOutcome, onFailure) {
+        this.orm = orm;
+        this.onOutcome = onOutcome;
+        this.onFailure = onFailure;
+        this.sending = false;
+        this.retryDelay = 1000;
+        this.retryTimer = null;
+        this.onOnline = () => this.flush();
+        window.addEventListener("online", this.onOnline);
+    }
+
+    get pending() {
+        try {
+            return JSON.parse(window.localStorage.getItem(STORAGE_KEY)) || [];
+        } catch {
+            return [];
+        }
+    }
+
+    set pending(scans) {
+        window.localStorage.setItem(STORAGE_KEY, JSON.stringify(scans));
+    }
+
+    /**
+     * Scans of batches the server rejected, kept aside for a later retry.
+     */
+    get failed() {
+        try {
+            return JSON.parse(window.localStorage.getItem(FAILED_STORAGE_KEY)) || [];
+        } catch {
+            return [];
+        }
+    }
+
+    set failed(scans) {
+        window.localStorage.setItem(FAILED_STORAGE_KEY, JSON.stringify(scans));
+    }
+
+    /**
+     * Queue a scan and start sending; returns immediately.
+     */
+    add(memberBarcode, bookBarcode, operation = "auto") {
+        const scan = {
+            uuid: newScanUuid(),
+            member_barcode: memberBarcode,
+            book_barcode: bookBarcode,
+            operation,
+            scanned_at: new Date().toISOString(),
+        };
+        this.pending = [...this.pending, scan];
+        this.flush();
+        return scan;
+    }
+
+    /**
+     * Send the oldest queued scans, one batch at a time, until the queue is
+     * empty. A batch that cannot reach the server stays queued and is sent
+     * again later; a batch the server rejects is moved aside and reported,
+     * so it does not hold back the scans queued after it.
+     */
+    async flush() {
+        if (this.sending) {
+            return;
+        }
+        this.sending = true;
+        clearTimeout(this.retryTimer);
+        try {
+            let batch = this.pending.slice(0, BATCH_SIZE);
+            while (batch.length) {
+                let results;
+                try {
+                    results = await this.orm.call("library.barcode.scan", "ingest_scans", [batch]);
+                } catch (error) {
+                    if (error instanceof ConnectionLostError) {
+                        throw error;
+                    }
+                    this.setAside(batch, error);
+                    batch = this.pending.slice(0, BATCH_SIZE);
+                    continue;
+                }
+                const done = new Set(results.map((result) => result.uuid));
+                this.pending = this.pending.filter((scan) => !done.has(scan.uuid));
+                for (const result of results) {
+                    const scan = batch.find((item) => item.uuid === result.uuid);
+                    this.onOutcome(scan, result);
+                }
+                this.retryDelay = 1000;
+                batch = this.pending.slice(0, BATCH_SIZE);
+            }
+        } catch (error) {
+            if (!(error instanceof ConnectionLostError)) {
+                throw error;
+            }
+            this.retryTimer = setTimeout(() => this.flush(), this.retryDelay);
+            this.retryDelay = Math.min(this.retryDelay * 2, MAX_RETRY_DELAY);
+        } finally {
+            this.sending = false;
+        }
+    }
+
+    setAside(batch, error) {
+        const rejected = new Set(batch.map((scan) => scan.uuid));
+        this.pending = this.pending.filter((scan) => !rejected.has(scan.uuid));
+        this.failed = [...this.failed, ...batch];
+        this.onFailure(batch, error);
+    }
+
+    /**
+     * Queue the scans set aside again, e.g. once the server error is fixed.
+     */
+    retryFailed() {
+        this.pending = [...this.pending, ...this.failed];
+        this.failed = [];
+        this.flush();
+    }
+
+    destroy() {
+        clearTimeout(this.retryTimer);
+        window.removeEventListener("online", this.onOnline);
+    }
+}
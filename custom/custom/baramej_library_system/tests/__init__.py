@@ -1,5 +1,23 @@
 # -*- coding: utf-8 -*-
 from . import test_borrow_limits
+from . import test_member_policy
 from . import test_overdue_cron
+from . import test_membership_expiry
 from . import test_email_reminders
 from . import test_barcode_flow
+from . import test_scan_ingest
+from . import test_stocktake
+from . import test_book_copies
+from . import test_hold_queue
+from . import test_catalog_search
+from . import test_catalog_import
+from . import test_loan_journal
+from . import test_loan_renewal
+from . import test_library_calendar
+from . import test_loan_archive
+from . import test_loan_report
+from . import test_circulation
+from . import test_benchmark_loan_write
+from . import test_benchmark_catalog_search
+from . import test_benchmark_catalog_import
+from . import test_copy_counter_stress
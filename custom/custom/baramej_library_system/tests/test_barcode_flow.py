@@ -234,3 +234,90 @@ class TestBarcodeFlow(TransactionCase):
                 'barcode': 'BOOK001',  # Duplicate
                 'available_copies': 1,
             })
+
+    def test_barcode_lookup_cache_counters(self):
+        """Test that repeated scans are served from the barcode cache."""
+        Book = self.env['library.book']
+        Book.search_by_barcode('BOOK001')
+        before = Book.get_barcode_cache_stats()
+        
+        for _index in range(5):
+            self.assertEqual(Book.search_by_barcode('BOOK001'), self.book)
+        
+        after = Book.get_barcode_cache_stats()
+        self.assertEqual(after['lookups'] - before['lookups'], 5)
+        self.assertEqual(after['misses'], before['misses'])
+
+    def test_barcode_lookup_cache_invalidation(self):
+        """Test that changing a barcode invalidates cached lookups."""
+        Book = self.env['library.book']
+        self.assertEqual(Book.search_by_barcode('BOOK001'), self.book)
+        
+        self.book.barcode = 'BOOK001-NEW'
+        self.assertFalse(Book.search_by_barcode('BOOK001'))
+        self.assertEqual(Book.search_by_barcode('BOOK001-NEW'), self.book)
+        
+        # Archived members no longer resolve
+        self.member.active = False
+        self.assertFalse(self.env['library.member'].search_by_barcode('MEM001'))
+
+    def test_barcode_cache_kept_on_other_writes(self):
+        """Test that writes leaving barcodes untouched keep cached lookups."""
+        Book = self.env['library.book']
+        Book.search_by_barcode('BOOK001')
+        before = Book.get_barcode_cache_stats()
+        
+        self.book.write({'name': 'Renamed Book', 'available_copies': 1})
+        self.book.write({'barcode': 'BOOK001'})
+        self.assertEqual(Book.search_by_barcode('BOOK001'), self.book)
+        
+        after = Book.get_barcode_cache_stats()
+        self.assertEqual(after['misses'], before['misses'])
+
+    def test_bulk_barcode_resolution(self):
+        """Test that many barcodes are resolved at once."""
+        book2 = self.env['library.book'].create({
+            'name': 'Test Book 2',
+            'isbn': 'TEST-ISBN-002',
+            'barcode': 'BOOK002',
+            'available_copies': 1,
+        })
+        
+        resolved = self.env['library.book']._resolve_barcodes(['BOOK001', 'BOOK002', 'UNKNOWN'])
+        
+        self.assertEqual(resolved, {'BOOK001': self.book, 'BOOK002': book2})
+
+    def test_batch_scan_endpoint(self):
+        """Test that a batch of scans is processed in one call with per-item results."""
+        book2 = self.env['library.book'].create({
+            'name': 'Test Book 2',
+            'isbn': 'TEST-ISBN-002',
+            'barcode': 'BOOK002',
+            'available_copies': 1,
+        })
+        scans_before = self.env['library.barcode.scan'].search_count([])
+        
+        results = self.env['library.barcode.scan'].create_and_process([
+            {'member_barcode': 'MEM001', 'book_barcode': 'BOOK001', 'operation': 'auto'},
+            ('MEM001', 'BOOK002', 'borrow'),
+            ('MEM001', 'INVALID', 'auto'),
+            ('MEM001', 'BOOK001', 'auto'),
+        ])
+        
+        self.assertEqual([result['success'] for result in results], [True, True, False, True])
+        self.assertEqual([result['operation'] for result in results[:2]], ['borrow', 'borrow'])
+        self.assertEqual(results[3]['operation'], 'return')
+        self.assertEqual(self.env['library.borrow'].browse(results[0]['borrow_id']).state, 'returned')
+        self.assertEqual(self.env['library.borrow'].browse(results[1]['borrow_id']).state, 'borrowed')
+        self.assertEqual(self.env['library.barcode.scan'].search_count([]), scans_before)
+
+    def test_batch_scan_single_dict(self):
+        """Test that a single scan dict returns a single result."""
+        result = self.env['library.barcode.scan'].create_and_process({
+            'member_barcode': 'MEM001',
+            'book_barcode': 'BOOK001',
+            'operation': 'auto',
+        })
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['operation'], 'borrow')
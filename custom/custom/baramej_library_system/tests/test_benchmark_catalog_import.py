@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import base64
+import logging
+
+from odoo.tests.common import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('-standard', 'library_benchmark')
+class TestBenchmarkCatalogImport(TransactionCase):
+    """Measure the catalog importer's throughput on a synthetic CSV file.
+
+    Not part of the standard run; execute with
+    ``--test-tags /baramej_library_system:TestBenchmarkCatalogImport``.
+    """
+
+    BOOKS = 10000
+    AUTHORS = 500
+    TARGET_BOOKS_PER_SECOND = 10000
+
+    def test_csv_import_throughput(self):
+        """Import ``BOOKS`` rows in one job and log the books created per second."""
+        lines = ['title,isbn,author,publisher,category,year,copies']
+        lines += [
+            f'Bench Import {n},BENCH-IMP-{n},Bench Author {n % self.AUTHORS},Bench Press {n % 50},'
+            f'Bench Subject {n % 20},{1900 + n % 120},{1 + n % 3}'
+            for n in range(self.BOOKS)
+        ]
+        job = self.env['library.catalog.import'].create({
+            'name': 'Benchmark Import',
+            'data_file': base64.b64encode('\n'.join(lines).encode()),
+            'chunk_size': 5000,
+        })
+        job._run()
+        
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.books_created, self.BOOKS)
+        _logger.info('Catalog import benchmark: %s books at %.0f books/s (target %s books/s)',
+                     job.books_created, job.books_per_second, self.TARGET_BOOKS_PER_SECOND)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from odoo.tests.common import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('-standard', 'library_benchmark')
+class TestBenchmarkCatalogSearch(TransactionCase):
+    """Benchmark the catalog search index against ``ilike`` over a synthetic catalog.
+
+    Books are generated in SQL inside the test transaction on the local
+    PostgreSQL server. Not part of the standard run; execute with
+    ``--test-tags /baramej_library_system:TestBenchmarkCatalogSearch``.
+    """
+
+    BOOKS = 1000000
+    AUTHORS = 50000
+    QUERIES = ['tolstoy', 'war peace', 'history rome', 'garden']
+
+    def setUp(self):
+        super(TestBenchmarkCatalogSearch, self).setUp()
+        cr = self.env.cr
+        started = time.perf_counter()
+        cr.execute("""
+            INSERT INTO library_author (name)
+            SELECT 'Author ' || md5(n::text) || CASE WHEN n %% 1000 = 0 THEN ' Tolstoy' ELSE '' END
+              FROM generate_series(1, %s) n
+         RETURNING id
+        """, [self.AUTHORS])
+        author_ids = [row[0] for row in cr.fetchall()]
+        cr.execute("""
+            INSERT INTO library_book (name, isbn, author_id, available_copies, total_copies)
+            SELECT (ARRAY['War', 'Peace', 'History', 'Rome', 'Garden', 'Secret', 'River', 'Night'])[1 + n %% 8]
+                   || ' ' || md5(n::text)
+                   || ' ' || (ARRAY['of', 'and', 'in'])[1 + n %% 3]
+                   || ' ' || (ARRAY['Peace', 'Rome', 'Empire', 'Time', 'Stars'])[1 + n %% 5],
+                   'BENCH-' || n,
+                   (%s::int[])[1 + n %% %s],
+                   1, 1
+              FROM generate_series(1, %s) n
+        """, [author_ids, len(author_ids), self.BOOKS])
+        self.env['library.book']._rebuild_search_vectors()
+        cr.execute('ANALYZE library_book')
+        _logger.info('Catalog benchmark: %s books generated and indexed in %.1fs',
+                     self.BOOKS, time.perf_counter() - started)
+
+    def _measure(self, label, search):
+        timings = {}
+        for query in self.QUERIES:
+            started = time.perf_counter()
+            search(query)
+            timings[query] = time.perf_counter() - started
+        _logger.info('%s: %s', label, ', '.join(f'{query!r} {elapsed * 1000:.1f}ms' for query, elapsed in timings.items()))
+        return sum(timings.values())
+
+    def test_catalog_search_vs_ilike(self):
+        """Compare ranked full-text search with the ORM ilike it replaces."""
+        Book = self.env['library.book']
+
+        def ilike(query):
+            return Book.search([
+                '|', '|', ('name', 'ilike', query), ('isbn', 'ilike', query), ('author_id.name', 'ilike', query)
+            ], limit=20)
+
+        before = self._measure('ORM ilike (before)', ilike)
+        after = self._measure('Catalog search (after)', lambda query: Book.search_catalog(query, limit=20))
+        self.assertTrue(Book.search_catalog('tolstoy', limit=20))
+        self.assertLess(after, before)
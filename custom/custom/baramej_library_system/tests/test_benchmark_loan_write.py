@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from odoo import fields
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.baramej_library_system.models.library_book import LibraryBorrow
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('-standard', 'library_benchmark')
+class TestBenchmarkLoanWrite(TransactionCase):
+    """Benchmark the bulk loan write against the per-record write it replaced.
+
+    ``LOANS`` loans are returned through each path. Not part of the standard run; execute with
+    ``--test-tags /baramej_library_system:TestBenchmarkLoanWrite``.
+    """
+
+    LOANS = 10000
+    MEMBERS = 100
+    BOOKS = 100
+
+    def setUp(self):
+        super(TestBenchmarkLoanWrite, self).setUp()
+
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Benchmark',
+            'code': 'BENCH',
+            'max_concurrent_loans': 2 * self.LOANS,
+            'max_loan_days': 14,
+        })
+        author = self.env['library.author'].create({'name': 'Benchmark Author'})
+        members = self.env['library.member'].create([{
+            'name': f'Benchmark Member {index}',
+            'member_id': f'BENCH{index:05d}',
+            'member_type_id': self.member_type.id,
+        } for index in range(self.MEMBERS)])
+        books = self.env['library.book'].create([{
+            'name': f'Benchmark Book {index}',
+            'author_id': author.id,
+            'isbn': f'BENCH-ISBN-{index:05d}',
+            'available_copies': 2 * self.LOANS,
+        } for index in range(self.BOOKS)])
+
+        self.loans = self.env['library.borrow'].create([{
+            'member_id': members[index % self.MEMBERS].id,
+            'book_id': books[index % self.BOOKS].id,
+            'state': 'borrowed',
+        } for index in range(2 * self.LOANS)])
+        self.loans.flush()
+
+    def _measure(self, label, operation):
+        """Run ``operation`` and log its wall time and query count."""
+        self.env['library.borrow'].invalidate_cache()
+        queries_before = self.cr.sql_log_count
+        started = time.perf_counter()
+        operation()
+        self.env['library.borrow'].flush()
+        elapsed = time.perf_counter() - started
+        queries = self.cr.sql_log_count - queries_before
+        _logger.info('%s: %s loans in %.2fs, %s queries', label, self.LOANS, elapsed, queries)
+        return elapsed, queries
+
+    @staticmethod
+    def _legacy_write(loans, vals):
+        """The write path before the rework: one ORM write and book update per loan, then a second write."""
+        for record in loans:
+            old_state = record.state
+            super(LibraryBorrow, record).write(vals)
+            new_state = record.state
+            if old_state != new_state:
+                if old_state in ('draft', 'cancelled') and new_state == 'borrowed':
+                    if record.book_id.available_copies > 0:
+                        record.book_id.available_copies -= 1
+                elif old_state == 'borrowed' and new_state in ('returned', 'cancelled'):
+                    record.book_id.available_copies += 1
+                    if new_state == 'returned' and not record.return_date:
+                        record.return_date = fields.Date.today()
+        return super(LibraryBorrow, loans).write(vals)
+
+    def test_bulk_return_vs_per_record(self):
+        """Return N loans through the legacy 2N+1 path and N through the bulk write."""
+        legacy, bulk = self.loans[:self.LOANS], self.loans[self.LOANS:]
+        vals = {'state': 'returned'}
+
+        before = self._measure('Legacy per-record write (before)', lambda: self._legacy_write(legacy, vals))
+        after = self._measure('Bulk write (after)', lambda: bulk.write(vals))
+        _logger.info('Loan write benchmark: %.1fx faster, %.1fx fewer queries',
+                     before[0] / after[0], before[1] / after[1])
+
+        self.assertEqual(set(self.loans.mapped('state')), {'returned'})
+        self.assertGreaterEqual(before[1], 10 * after[1])
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import ValidationError
+
+
+class TestBookCopies(TransactionCase):
+    """Test physical copies, copy claims on checkout and copy barcode scans."""
+
+    def setUp(self):
+        super(TestBookCopies, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Copy Student',
+            'code': 'COPY_STU',
+            'max_concurrent_loans': 5,
+            'max_loan_days': 14,
+            'fine_per_day': 0.50,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Copy Member',
+            'member_id': 'COPY001',
+            'barcode': 'CMEM001',
+            'email': 'copy@example.com',
+            'member_type_id': self.member_type.id,
+        })
+        self.other_member = self.env['library.member'].create({
+            'name': 'Other Copy Member',
+            'member_id': 'COPY002',
+            'barcode': 'CMEM002',
+            'member_type_id': self.member_type.id,
+        })
+        self.author = self.env['library.author'].create({'name': 'Copy Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Copy Book',
+            'author_id': self.author.id,
+            'isbn': 'COPY-ISBN-001',
+            'barcode': 'CBOOK001',
+        })
+        self.copies = self.env['library.book.copy'].create([
+            {'book_id': self.book.id, 'barcode': 'CBOOK001-1'},
+            {'book_id': self.book.id, 'barcode': 'CBOOK001-2'},
+        ])
+
+    def _borrow(self, member, **values):
+        return self.env['library.borrow'].create(dict({
+            'member_id': member.id,
+            'book_id': self.book.id,
+            'borrow_date': '2026-01-01',
+            'state': 'borrowed',
+        }, **values))
+
+    def test_copies_drive_title_availability(self):
+        """Adding copies refreshes the title counters from their status."""
+        self.assertEqual(self.book.available_copies, 2)
+        self.assertEqual(self.book.total_copies, 2)
+        self.assertEqual(self.book.copy_count, 2)
+        
+        self.copies[1].status = 'lost'
+        self.assertEqual(self.book.available_copies, 1)
+        self.assertEqual(self.book.total_copies, 1)
+
+    def test_checkout_claims_free_copy(self):
+        """A loan without a copy claims the first free copy of its title."""
+        borrow = self._borrow(self.member)
+        self.assertEqual(borrow.copy_id, self.copies[0])
+        self.assertEqual(self.copies[0].status, 'on_loan')
+        
+        self.assertEqual(self.book.available_copies, 1)
+        
+        second = self._borrow(self.other_member)
+        self.assertEqual(second.copy_id, self.copies[1])
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertFalse(self.book.is_available)
+        
+        with self.assertRaises(ValidationError):
+            self._borrow(self.member)
+
+    def test_checkout_of_named_copy(self):
+        """A loan naming a copy claims that copy, and only while it is free."""
+        borrow = self._borrow(self.member, copy_id=self.copies[1].id)
+        self.assertEqual(borrow.copy_id, self.copies[1])
+        self.assertEqual(self.copies[1].status, 'on_loan')
+        self.assertEqual(self.copies[0].status, 'available')
+        
+        with self.assertRaises(ValidationError):
+            self._borrow(self.other_member, copy_id=self.copies[1].id)
+
+    def test_copy_swap_on_open_loan(self):
+        """Changing the copy of an open loan releases the old copy and claims the new one."""
+        borrow = self._borrow(self.member)
+        borrow.copy_id = self.copies[1]
+        self.assertEqual(self.copies[0].status, 'available')
+        self.assertEqual(self.copies[1].status, 'on_loan')
+        self.assertEqual(self.book.available_copies, 1)
+        
+        other = self._borrow(self.other_member)
+        self.assertEqual(other.copy_id, self.copies[0])
+        with self.assertRaises(ValidationError):
+            borrow.copy_id = self.copies[0]
+
+    def test_return_releases_copy(self):
+        """Returning a loan puts its copy back on the shelf."""
+        borrow = self._borrow(self.member)
+        borrow.action_return()
+        self.assertEqual(borrow.copy_id, self.copies[0])
+        self.assertEqual(self.copies[0].status, 'available')
+        self.assertEqual(self.book.available_copies, 2)
+
+    def test_scan_copy_barcode(self):
+        """Scanning a copy barcode lends and returns that copy."""
+        scan = self.env['library.barcode.scan']
+        result = scan.create_and_process({'member_barcode': 'CMEM001', 'book_barcode': 'CBOOK001-2'})
+        self.assertTrue(result['success'])
+        borrow = self.env['library.borrow'].browse(result['borrow_id'])
+        self.assertEqual(borrow.copy_id, self.copies[1])
+        
+        result = scan.create_and_process({'member_barcode': 'CMEM001', 'book_barcode': 'CBOOK001-2'})
+        self.assertEqual(result['operation'], 'return')
+        self.assertEqual(self.copies[1].status, 'available')
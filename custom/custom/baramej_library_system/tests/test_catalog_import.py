@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import base64
+import os
+import tempfile
+
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+
+def _marc_record(tags):
+    """Build an ISO 2709 record from ``[(tag, data)]`` with ``$`` as subfield marker."""
+    directory, body = b'', b''
+    for tag, data in tags:
+        field = data.replace('$', '\x1f').encode() + b'\x1e'
+        directory += f'{tag}{len(field):04d}{len(body):05d}'.encode()
+        body += field
+    base = 24 + len(directory) + 1
+    leader = f'{base + len(body) + 1:05d}nam a22{base:05d}   4500'.encode()
+    return leader + directory + b'\x1e' + body + b'\x1d'
+
+
+class TestCatalogImport(TransactionCase):
+    """Test the streaming CSV and MARC21 catalog importer."""
+
+    def setUp(self):
+        super(TestCatalogImport, self).setUp()
+        self.author = self.env['library.author'].create({'name': 'Existing Author'})
+        self.env['library.book'].create({
+            'name': 'Already Here',
+            'author_id': self.author.id,
+            'isbn': 'IMP-ISBN-000',
+        })
+
+    def _job(self, content, file_format='csv', chunk_size=2):
+        return self.env['library.catalog.import'].create({
+            'name': 'Test Import',
+            'file_format': file_format,
+            'data_file': base64.b64encode(content),
+            'data_filename': f'catalog.{file_format}',
+            'chunk_size': chunk_size,
+        })
+
+    def test_csv_import_deduplicates(self):
+        """Books are created in chunks, names are matched and duplicates skipped."""
+        job = self._job(
+            b'title,isbn,author,publisher,category,year,copies\n'
+            b'First Book,IMP-ISBN-001,existing  author,Imp Press,History,1999,2\n'
+            b'Second Book,IMP-ISBN-002,New Author,imp press,history,2001,1\n'
+            b'Duplicate,IMP-ISBN-000,New Author,,,,\n'
+            b'No Author,IMP-ISBN-003,,,,,\n'
+            b'Third Book,IMP-ISBN-004,New Author,,,,\n'
+        )
+        job._run()
+        
+        self.assertEqual(job.state, 'done')
+        self.assertEqual((job.rows_done, job.books_created, job.rows_skipped), (5, 3, 2))
+        books = self.env['library.book'].search([('isbn', 'in', ['IMP-ISBN-001', 'IMP-ISBN-002', 'IMP-ISBN-004'])])
+        self.assertEqual(len(books), 3)
+        self.assertEqual(books.filtered(lambda b: b.isbn == 'IMP-ISBN-001').author_id, self.author)
+        self.assertEqual(len(books.author_id), 2)
+        self.assertEqual(len(books.publisher_id), 1)
+        self.assertEqual(len(books.category_id), 1)
+        self.assertEqual(books.filtered(lambda b: b.isbn == 'IMP-ISBN-001').total_copies, 2)
+        self.assertIn('duplicate isbn IMP-ISBN-000', job.skip_log)
+
+    def test_resume_from_checkpoint(self):
+        """A job resumes after the records it already processed."""
+        job = self._job(
+            b'title,isbn,author\n'
+            b'Resume One,IMP-ISBN-101,Resume Author\n'
+            b'Resume Two,IMP-ISBN-102,Resume Author\n'
+        )
+        job.write({'rows_done': 1, 'state': 'running'})
+        job._run()
+        
+        self.assertEqual(job.rows_done, 2)
+        self.assertEqual(job.books_created, 1)
+        self.assertFalse(self.env['library.book'].search([('isbn', '=', 'IMP-ISBN-101')]))
+        self.assertTrue(self.env['library.book'].search([('isbn', '=', 'IMP-ISBN-102')]))
+
+    def test_marc_import(self):
+        """MARC21 records are mapped to books."""
+        content = _marc_record([
+            ('001', 'rec1'),
+            ('020', '  $a9780140449136 (pbk.)'),
+            ('100', '1 $aDostoyevsky, Fyodor,'),
+            ('245', '10$aCrime and punishment /$cFyodor Dostoyevsky.'),
+            ('264', ' 1$aLondon :$bPenguin,$c2003.'),
+            ('300', '  $a671 p. ;'),
+            ('650', ' 0$aPsychological fiction.'),
+        ]) + _marc_record([('245', '10$aNo author record')])
+        job = self._job(content, file_format='marc')
+        job._run()
+        
+        self.assertEqual((job.books_created, job.rows_skipped), (1, 1))
+        book = self.env['library.book'].search([('isbn', '=', '9780140449136')])
+        self.assertEqual(book.name, 'Crime and punishment')
+        self.assertEqual(book.author_id.name, 'Dostoyevsky, Fyodor')
+        self.assertEqual(book.publisher_id.name, 'Penguin')
+        self.assertEqual(book.category_id.name, 'Psychological fiction')
+        self.assertEqual(book.publication_date.year, 2003)
+        self.assertEqual(book.pages, 671)
+
+    def test_filler_years_are_dropped(self):
+        """Unknown years such as MARC "0000" filler leave the date empty."""
+        Import = self.env['library.catalog.import']
+        self.assertEqual(Import._parse_date('c1999.').year, 1999)
+        self.assertFalse(Import._parse_date('0000'))
+        self.assertFalse(Import._parse_date('[0000?]'))
+        self.assertFalse(Import._parse_date('[19--]'))
+
+    def test_server_file_restricted_to_import_directory(self):
+        """Server files are only read from the configured import directory."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.csv')
+            with open(path, 'wb') as handle:
+                handle.write(b'title,isbn,author\nServer Book,IMP-ISBN-201,Server Author\n')
+            job = self.env['library.catalog.import'].create({'name': 'Server Import', 'source_path': path})
+            with self.assertRaises(UserError):
+                job.action_queue()
+            
+            params = self.env['ir.config_parameter'].sudo()
+            params.set_param('baramej_library_system.import_directory', directory)
+            job.source_path = os.path.join(directory, '..', os.path.basename(directory), '..', 'passwd')
+            with self.assertRaises(UserError):
+                job._run()
+            
+            job.source_path = path
+            job._run()
+            self.assertEqual(job.books_created, 1)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+
+class TestCatalogSearch(TransactionCase):
+    """Test the full-text catalog search and its maintenance on write."""
+
+    def setUp(self):
+        super(TestCatalogSearch, self).setUp()
+        
+        self.author = self.env['library.author'].create({'name': 'Ursula Leguin'})
+        self.publisher = self.env['library.publisher'].create({'name': 'Ace Books'})
+        self.category = self.env['library.category'].create({'name': 'Speculative Fiction'})
+        self.book = self.env['library.book'].create({
+            'name': 'The Left Hand of Darkness',
+            'author_id': self.author.id,
+            'publisher_id': self.publisher.id,
+            'category_id': self.category.id,
+            'isbn': '978-0-441-47812-5',
+        })
+        self.other = self.env['library.book'].create({
+            'name': 'Darkness at Noon',
+            'author_id': self.env['library.author'].create({'name': 'Arthur Koestler'}).id,
+            'isbn': '978-0-099-42449-1',
+        })
+
+    def _ids(self, query):
+        return [row['id'] for row in self.env['library.book'].search_catalog(query)]
+
+    def test_search_all_catalog_fields(self):
+        """Title, author, publisher, category and ISBN all match."""
+        self.assertEqual(self._ids('left hand'), [self.book.id])
+        self.assertEqual(self._ids('leguin'), [self.book.id])
+        self.assertEqual(self._ids('ace books'), [self.book.id])
+        self.assertEqual(self._ids('speculative'), [self.book.id])
+        self.assertEqual(self._ids('9780441478125'), [self.book.id])
+        self.assertEqual(self._ids('978-0-441-47812-5'), [self.book.id])
+
+    def test_prefix_and_ranking(self):
+        """Prefixes match, and results come best match first."""
+        results = self.env['library.book'].search_catalog('dark')
+        self.assertEqual({row['id'] for row in results}, {self.book.id, self.other.id})
+        ranks = [row['rank'] for row in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_vector_follows_writes(self):
+        """Renaming a book or its author updates the index."""
+        self.book.name = 'The Dispossessed'
+        self.assertEqual(self._ids('dispossessed'), [self.book.id])
+        self.assertNotIn(self.book.id, self._ids('left hand'))
+        
+        self.author.name = 'Ursula K. Le Guin'
+        self.assertEqual(self._ids('guin'), [self.book.id])
+
+    def test_search_view_and_name_search(self):
+        """The catalog field and book dropdowns use the index."""
+        books = self.env['library.book'].search([('catalog_query', 'ilike', 'koestler')])
+        self.assertEqual(books, self.other)
+        names = self.env['library.book'].name_search('leguin')
+        self.assertEqual([book_id for book_id, _name in names], [self.book.id])
+
+    def test_name_search_falls_back_to_infix_matches(self):
+        """Dropdowns still find mid-word titles and ISBN fragments after the ranked matches."""
+        Book = self.env['library.book']
+        self.assertEqual([book_id for book_id, _name in Book.name_search('kness at')], [self.other.id])
+        self.assertEqual([book_id for book_id, _name in Book.name_search('47812')], [self.book.id])
+        names = Book.name_search('darkness')
+        self.assertEqual({book_id for book_id, _name in names}, {self.book.id, self.other.id})
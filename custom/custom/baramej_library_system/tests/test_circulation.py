@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestCirculation(TransactionCase):
+    """Test the rolling circulation counters and the top books ranking."""
+
+    def setUp(self):
+        super(TestCirculation, self).setUp()
+        
+        self.env['ir.config_parameter'].sudo().set_param('baramej_library_system.top_books_size', 2)
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Circulation Student',
+            'code': 'CIRC_STU',
+            'max_concurrent_loans': 20,
+            'max_loan_days': 14,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Circulation Member',
+            'member_id': 'CIRC001',
+            'member_type_id': self.member_type.id,
+        })
+        self.category = self.env['library.category'].create({'name': 'Circulation Category'})
+        self.author = self.env['library.author'].create({'name': 'Circulation Author'})
+        self.books = self.env['library.book'].create([{
+            'name': f'Circulation Book {index}',
+            'author_id': self.author.id,
+            'isbn': f'CIRC-ISBN-{index:03d}',
+            'category_id': self.category.id,
+            'available_copies': 5,
+        } for index in range(3)])
+        self.today = fields.Date.today()
+
+    def _checkout(self, book, days_ago=0, count=1):
+        return self.env['library.borrow'].create([{
+            'member_id': self.member.id,
+            'book_id': book.id,
+            'borrow_date': self.today - timedelta(days=days_ago),
+            'state': 'borrowed',
+        } for _index in range(count)])
+
+    def test_checkout_updates_counters(self):
+        """Each checkout counts in the windows its borrow date falls in."""
+        book = self.books[0]
+        self._checkout(book, days_ago=0, count=2)
+        self._checkout(book, days_ago=20)
+        
+        self.assertEqual((book.loans_7d, book.loans_30d, book.loans_365d), (2, 3, 3))
+        self.assertEqual(book.turnover_rate, 3 / 5)
+        demand = self.env['library.circulation.bucket'].category_demand(30)
+        self.assertEqual(demand[self.category.id], 3)
+
+    def test_ranking_is_bounded(self):
+        """The ranking keeps only the most borrowed books, in order."""
+        self._checkout(self.books[0], count=1)
+        self._checkout(self.books[1], count=3)
+        self._checkout(self.books[2], count=2)
+        
+        top = self.env['library.book.ranking'].top_books('7')
+        self.assertEqual(top.book_id, self.books[1] | self.books[2])
+        self.assertEqual(top.mapped('loan_count'), [3, 2])
+        self.assertEqual(self.env['library.book.ranking'].search_count([('period', '=', '7')]), 2)
+
+    def test_rollup_ages_counters(self):
+        """The nightly rollup moves loans out of the windows they left."""
+        book = self.books[0]
+        self._checkout(book, days_ago=3)
+        self.env.cr.execute(
+            'UPDATE library_circulation_bucket SET date = date - 10 WHERE book_id = %s', [book.id]
+        )
+        
+        self.env['library.circulation.bucket']._cron_rollup_circulation()
+        
+        self.assertEqual((book.loans_7d, book.loans_30d, book.loans_365d), (0, 1, 1))
+        self.assertFalse(self.env['library.book.ranking'].search([('period', '=', '7'), ('book_id', '=', book.id)]))
+
+    def test_rebuild_from_history(self):
+        """Rebuilding counts the loans already in the history."""
+        book = self.books[0]
+        self._checkout(book, days_ago=40, count=2)
+        self.env.cr.execute('DELETE FROM library_circulation_bucket')
+        
+        self.env['library.circulation.bucket']._rebuild_circulation()
+        
+        self.assertEqual((book.loans_30d, book.loans_365d), (0, 2))
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo import api, fields, SUPERUSER_ID
+from odoo.exceptions import ValidationError
+from odoo.sql_db import db_connect
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('-standard', 'library_stress')
+class TestCopyCounterStress(TransactionCase):
+    """Hammer one popular title from many desks at once.
+
+    Each desk runs in its own thread and database transaction and commits,
+    so this test is not part of the standard run; execute it with
+    ``--test-tags /baramej_library_system:TestCopyCounterStress``.
+    """
+
+    COPIES = 5
+    DESKS = 20
+    # Each round of conflicts lets at least one desk commit, so every desk
+    # settles within DESKS attempts
+    MAX_RETRIES = 2 * DESKS
+
+    def setUp(self):
+        super(TestCopyCounterStress, self).setUp()
+        self.connection = db_connect(self.env.cr.dbname)
+
+        with self.connection.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            author = env['library.author'].create({'name': 'Stress Author'})
+            book = env['library.book'].create({
+                'name': 'Stress Book',
+                'author_id': author.id,
+                'isbn': 'STRESS-ISBN-001',
+                'available_copies': self.COPIES,
+            })
+            member_type = env['library.member.type'].create({
+                'name': 'Stress Student',
+                'code': 'STRESS_STU',
+                'max_concurrent_loans': 1,
+                'max_loan_days': 14,
+            })
+            members = env['library.member'].create([{
+                'name': f'Stress Member {index}',
+                'member_id': f'STRESS{index:03d}',
+                'member_type_id': member_type.id,
+            } for index in range(self.DESKS)])
+            cr.commit()
+            self.author_id, self.book_id = author.id, book.id
+            self.member_type_id, self.member_ids = member_type.id, members.ids
+
+    def tearDown(self):
+        with self.connection.cursor() as cr:
+            cr.execute('SELECT id FROM library_borrow WHERE book_id = %s', [self.book_id])
+            loan_ids = [row[0] for row in cr.fetchall()]
+            for model, ids in (('library.borrow', loan_ids), ('library.member', self.member_ids)):
+                cr.execute('DELETE FROM mail_message WHERE model = %s AND res_id = ANY(%s)', [model, ids])
+                cr.execute('DELETE FROM mail_followers WHERE res_model = %s AND res_id = ANY(%s)', [model, ids])
+            cr.execute('DELETE FROM library_borrow WHERE id = ANY(%s)', [loan_ids])
+            cr.execute('DELETE FROM library_member WHERE id = ANY(%s)', [self.member_ids])
+            cr.execute('DELETE FROM library_member_type WHERE id = %s', [self.member_type_id])
+            cr.execute('DELETE FROM library_book WHERE id = %s', [self.book_id])
+            cr.execute('DELETE FROM library_author WHERE id = %s', [self.author_id])
+            cr.commit()
+        super(TestCopyCounterStress, self).tearDown()
+
+    def _desk(self, member_id, outcomes):
+        """Lend the title to one member, retrying serialization failures."""
+        with self.connection.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            for _attempt in range(self.MAX_RETRIES):
+                try:
+                    env['library.borrow'].create({
+                        'member_id': member_id,
+                        'book_id': self.book_id,
+                        'borrow_date': fields.Date.today(),
+                        'state': 'borrowed',
+                    })
+                    cr.commit()
+                    outcomes.append('checked_out')
+                    return
+                except TransactionRollbackError:
+                    cr.rollback()
+                    env.clear()
+                except ValidationError:
+                    cr.rollback()
+                    outcomes.append('sold_out')
+                    return
+            outcomes.append('gave_up')
+
+    def test_popular_title_never_oversold(self):
+        """Concurrent checkouts of one title lend every copy and never more."""
+        outcomes = []
+        desks = [threading.Thread(target=self._desk, args=(member_id, outcomes)) for member_id in self.member_ids]
+        for desk in desks:
+            desk.start()
+        for desk in desks:
+            desk.join()
+
+        with self.connection.cursor() as cr:
+            cr.execute('SELECT available_copies FROM library_book WHERE id = %s', [self.book_id])
+            available = cr.fetchone()[0]
+            cr.execute("""
+                SELECT COUNT(*) FROM library_borrow
+                 WHERE book_id = %s AND state IN ('borrowed', 'overdue')
+            """, [self.book_id])
+            open_loans = cr.fetchone()[0]
+
+        # Every desk settles: it lends a copy, or is refused once none is left
+        self.assertEqual(len(outcomes), self.DESKS)
+        self.assertNotIn('gave_up', outcomes)
+        self.assertEqual(outcomes.count('checked_out'), self.COPIES)
+        self.assertEqual(outcomes.count('sold_out'), self.DESKS - self.COPIES)
+        self.assertEqual(available, 0)
+        self.assertEqual(open_loans, self.COPIES)
+        self.assertEqual(available + open_loans, self.COPIES)
@@ -29,8 +29,10 @@ class TestEmailReminders(TransactionCase):
         })
         
         # Create book
+        self.author = self.env['library.author'].create({'name': 'Test Author'})
         self.book = self.env['library.book'].create({
             'name': 'Test Book',
+            'author_id': self.author.id,
             'isbn': 'TEST-ISBN-001',
             'available_copies': 1,
         })
@@ -161,6 +163,7 @@ class TestEmailReminders(TransactionCase):
         # Create multiple overdue borrows
         book2 = self.env['library.book'].create({
             'name': 'Test Book 2',
+            'author_id': self.author.id,
             'isbn': 'TEST-ISBN-002',
             'available_copies': 1,
         })
@@ -185,3 +188,94 @@ class TestEmailReminders(TransactionCase):
         
         expected_total = (5 * 0.50) + (3 * 0.50)
         self.assertEqual(self.member.total_fines, expected_total)
+
+    def test_reminders_queued_not_sent(self):
+        """Test that reminders are queued in the mail queue instead of force-sent."""
+        due_date = fields.Date.today() + timedelta(days=2)
+        borrow = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': fields.Date.today() - timedelta(days=12),
+            'due_date': due_date,
+            'state': 'borrowed',
+        })
+        
+        self.env['library.borrow']._cron_send_due_reminders()
+        
+        mail = self.env['mail.mail'].search([
+            ('model', '=', 'library.borrow'),
+            ('res_id', '=', borrow.id),
+        ])
+        self.assertEqual(len(mail), 1)
+        self.assertEqual(mail.state, 'outgoing')
+        self.assertEqual(mail.email_to, 'test@example.com')
+
+    def test_reminders_digest_per_member(self):
+        """Test that several loans of one member are collapsed into one digest email."""
+        book2 = self.env['library.book'].create({
+            'name': 'Test Book 2',
+            'author_id': self.author.id,
+            'isbn': 'TEST-ISBN-002',
+            'available_copies': 1,
+        })
+        
+        past_due_date = fields.Date.today() - timedelta(days=3)
+        borrows = self.env['library.borrow']
+        for book in (self.book, book2):
+            borrows |= self.env['library.borrow'].create({
+                'member_id': self.member.id,
+                'book_id': book.id,
+                'borrow_date': fields.Date.today() - timedelta(days=18),
+                'due_date': past_due_date,
+                'state': 'overdue',
+            })
+        
+        self.env['library.borrow']._cron_send_overdue_reminders()
+        
+        digest = self.env['mail.mail'].search([
+            ('model', '=', 'library.member'),
+            ('res_id', '=', self.member.id),
+        ])
+        self.assertEqual(len(digest), 1)
+        self.assertIn('2 of your library books', digest.subject)
+        self.assertEqual(digest.body_html.count('Dear Test Member'), 1)
+        for borrow in borrows:
+            self.assertIn(borrow.name, digest.body_html)
+        self.assertFalse(self.env['mail.mail'].search([
+            ('model', '=', 'library.borrow'),
+            ('res_id', 'in', borrows.ids),
+        ]))
+        self.assertTrue(all(borrows.mapped('overdue_reminder_sent')))
+
+    def test_fines_survive_return(self):
+        """Test that a late return accrues the fine into the member ledger."""
+        borrow = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': fields.Date.today() - timedelta(days=20),
+            'due_date': fields.Date.today() - timedelta(days=4),
+            'state': 'overdue',
+        })
+        self.assertEqual(self.member.total_fines, 4 * 0.50)
+        
+        borrow.action_return()
+        
+        self.assertEqual(self.member.fine_balance, 4 * 0.50)
+        self.assertEqual(self.member.total_fines, 4 * 0.50)
+        accrual = self.member.fine_ids
+        self.assertEqual(len(accrual), 1)
+        self.assertEqual((accrual.entry_type, accrual.borrow_id), ('accrual', borrow))
+
+    def test_fine_payment_and_balances(self):
+        """Test that payments and waivers reduce the stored balance."""
+        Fine = self.env['library.fine']
+        Fine.create({'member_id': self.member.id, 'entry_type': 'accrual', 'amount': 5.0})
+        Fine.create({'member_id': self.member.id, 'entry_type': 'payment', 'amount': 3.0})
+        waiver = Fine.create({'member_id': self.member.id, 'entry_type': 'waiver', 'amount': 1.0})
+        
+        self.assertEqual(self.member.fine_balance, 1.0)
+        self.assertEqual(Fine._get_balances(self.member.ids), {self.member.id: 1.0})
+        
+        waiver.unlink()
+        self.assertEqual(self.member.fine_balance, 2.0)
+        self.assertEqual(self.env['library.member']._rebuild_fine_balances(), 0)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import ValidationError
+from odoo import fields
+
+
+class TestHoldQueue(TransactionCase):
+    """Test FIFO hold allocation on return, pickup and hold expiry."""
+
+    def setUp(self):
+        super(TestHoldQueue, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Hold Student',
+            'code': 'HOLD_STU',
+            'max_concurrent_loans': 3,
+            'max_loan_days': 14,
+            'fine_per_day': 0.50,
+        })
+        self.borrower, self.first, self.second = self.env['library.member'].create([{
+            'name': f'Hold Member {index}',
+            'member_id': f'HOLD00{index}',
+            'member_type_id': self.member_type.id,
+        } for index in range(3)])
+        self.author = self.env['library.author'].create({'name': 'Hold Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Course Textbook',
+            'author_id': self.author.id,
+            'isbn': 'HOLD-ISBN-001',
+            'available_copies': 1,
+        })
+        self.loan = self._borrow(self.borrower)
+        self.holds = self.env['library.reservation'].create([
+            {'book_id': self.book.id, 'member_id': self.first.id},
+            {'book_id': self.book.id, 'member_id': self.second.id},
+        ])
+
+    def _borrow(self, member):
+        return self.env['library.borrow'].create({
+            'member_id': member.id,
+            'book_id': self.book.id,
+            'borrow_date': fields.Date.today(),
+            'state': 'borrowed',
+        })
+
+    def test_return_allocates_queue_head(self):
+        """A returned copy is held for the oldest hold, not put on the shelf."""
+        self.assertEqual(self.holds.mapped('queue_position'), [1, 2])
+        
+        self.loan.action_return()
+        self.assertEqual(self.holds.mapped('status'), ['ready', 'reserved'])
+        self.assertTrue(self.holds[0].expiry_date)
+        self.assertEqual(self.book.available_copies, 0)
+        self.holds.invalidate_cache(['queue_position'])
+        self.assertEqual(self.holds[1].queue_position, 1)
+
+    def test_pickup_fulfils_hold(self):
+        """Only the member the copy is held for can borrow it."""
+        self.loan.action_return()
+        with self.assertRaises(ValidationError):
+            self._borrow(self.second)
+        
+        loan = self._borrow(self.first)
+        self.assertEqual(self.holds[0].status, 'fulfilled')
+        self.assertEqual(self.holds[0].borrow_id, loan)
+        self.assertEqual(self.book.available_copies, 0)
+
+    def test_expired_hold_passes_copy_on(self):
+        """Uncollected holds expire and the copy goes to the next in line."""
+        self.loan.action_return()
+        self.env.cr.execute(
+            'UPDATE library_reservation SET expiry_date = %s WHERE id = %s',
+            [fields.Date.today() - timedelta(days=1), self.holds[0].id]
+        )
+        self.holds.invalidate_cache()
+        
+        self.env['library.reservation']._cron_expire_holds(batch_size=1)
+        self.assertEqual(self.holds.mapped('status'), ['expired', 'ready'])
+        
+        self.holds[1].action_cancel()
+        self.assertEqual(self.holds[1].status, 'canceled')
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_copy_held_for_pickup(self):
+        """A returned physical copy is held and lent to the hold owner."""
+        book = self.env['library.book'].create({
+            'name': 'Tracked Textbook',
+            'author_id': self.author.id,
+            'isbn': 'HOLD-ISBN-002',
+        })
+        copy = self.env['library.book.copy'].create({'book_id': book.id, 'barcode': 'HOLD-COPY-1'})
+        loan = self.env['library.borrow'].create({
+            'member_id': self.borrower.id,
+            'book_id': book.id,
+            'borrow_date': fields.Date.today(),
+            'state': 'borrowed',
+        })
+        hold = self.env['library.reservation'].create({'book_id': book.id, 'member_id': self.first.id})
+        
+        loan.action_return()
+        self.assertEqual(hold.status, 'ready')
+        self.assertEqual(hold.copy_id, copy)
+        self.assertEqual(copy.status, 'on_hold')
+        
+        pickup = self.env['library.borrow'].create({
+            'member_id': self.first.id,
+            'book_id': book.id,
+            'borrow_date': fields.Date.today(),
+            'state': 'borrowed',
+        })
+        self.assertEqual(pickup.copy_id, copy)
+        self.assertEqual(copy.status, 'on_loan')
+
+    def test_single_open_hold_per_member(self):
+        """A member cannot queue twice for the same book."""
+        with self.assertRaises(ValidationError):
+            self.env['library.reservation'].create({'book_id': self.book.id, 'member_id': self.first.id})
+
+    def test_ready_notifications_queued_in_bulk(self):
+        """A bulk return queues one pickup email per hold made ready."""
+        (self.first | self.second).write({'email': 'holds@example.com'})
+        other_book = self.env['library.book'].create({
+            'name': 'Second Textbook',
+            'author_id': self.author.id,
+            'isbn': 'HOLD-ISBN-003',
+            'available_copies': 1,
+        })
+        other_loan = self.env['library.borrow'].create({
+            'member_id': self.borrower.id,
+            'book_id': other_book.id,
+            'borrow_date': fields.Date.today(),
+            'state': 'borrowed',
+        })
+        other_hold = self.env['library.reservation'].create({'book_id': other_book.id, 'member_id': self.second.id})
+        
+        (self.loan | other_loan).action_return()
+        ready = self.holds[0] | other_hold
+        self.assertEqual(ready.mapped('status'), ['ready', 'ready'])
+        mails = self.env['mail.mail'].search([('model', '=', 'library.reservation'), ('res_id', 'in', ready.ids)])
+        self.assertEqual(len(mails), 2)
+        self.assertEqual(set(mails.mapped('email_to')), {'holds@example.com'})
+        self.assertIn('ready for pickup', mails[0].subject)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestLibraryCalendar(TransactionCase):
+    """Test due dates and overdue days on the opening days of a branch."""
+
+    def setUp(self):
+        super(TestLibraryCalendar, self).setUp()
+        
+        self.today = fields.Date.today()
+        self.location = self.env['library.location'].create({
+            'name': 'Calendar Branch',
+            'code': 'CAL',
+            'open_sun': False,
+        })
+        self.closure = self.env['library.closure'].create({
+            'name': 'Calendar Holiday',
+            'location_id': self.location.id,
+            'date_from': self.today - timedelta(days=3),
+            'date_to': self.today - timedelta(days=2),
+        })
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Calendar Student',
+            'code': 'CAL_STU',
+            'max_concurrent_loans': 5,
+            'max_loan_days': 14,
+            'fine_per_day': 1.0,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Calendar Member',
+            'member_id': 'CAL001',
+            'member_type_id': self.member_type.id,
+        })
+        self.author = self.env['library.author'].create({'name': 'Calendar Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Calendar Book',
+            'author_id': self.author.id,
+            'isbn': 'CAL-ISBN-001',
+            'location_id': self.location.id,
+            'available_copies': 5,
+        })
+
+    def _is_open(self, day):
+        return day.weekday() != 6 and not (self.closure.date_from <= day <= self.closure.date_to)
+
+    def test_due_date_skips_closed_days(self):
+        """A due date falling on a closed day moves to the next opening day."""
+        sunday = self.today + timedelta(days=(6 - self.today.weekday()) % 7)
+        loan = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': sunday - timedelta(days=14),
+            'state': 'borrowed',
+        })
+        
+        self.assertEqual(loan.due_date, sunday + timedelta(days=1))
+
+    def test_overdue_counts_opening_days(self):
+        """Overdue days and fines only count the days the branch was open."""
+        due_date = self.today - timedelta(days=14)
+        expected = sum(self._is_open(due_date + timedelta(days=offset)) for offset in range(1, 15))
+        loan = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': due_date - timedelta(days=14),
+            'due_date': due_date,
+            'state': 'borrowed',
+        })
+        
+        self.assertEqual(loan.overdue_days, expected)
+        self.assertEqual(loan.fine_amount, float(expected))
+        
+        # The date roll computes the same figures in SQL
+        loan.flush()
+        self.env.cr.execute('UPDATE library_borrow SET overdue_days = 0 WHERE id = %s', [loan.id])
+        loan.invalidate_cache()
+        self.env['library.borrow']._cron_roll_overdue_dates(verify=False)
+        self.assertEqual(loan.overdue_days, expected)
+        self.assertEqual(loan.fine_amount, float(expected))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestLoanArchive(TransactionCase):
+    """Test moving closed loans to the archive and reporting across both."""
+
+    def setUp(self):
+        super(TestLoanArchive, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Archive Student',
+            'code': 'ARCHIVE_STU',
+            'max_concurrent_loans': 5,
+            'max_loan_days': 14,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Archive Member',
+            'member_id': 'ARCHIVE001',
+            'member_type_id': self.member_type.id,
+        })
+        self.author = self.env['library.author'].create({'name': 'Archive Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Archive Book',
+            'author_id': self.author.id,
+            'isbn': 'ARCHIVE-ISBN-001',
+            'available_copies': 5,
+        })
+        today = fields.Date.today()
+        self.old_loan, self.recent_loan, self.open_loan = self.env['library.borrow'].create([{
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': borrow_date,
+            'return_date': return_date,
+            'state': state,
+        } for borrow_date, return_date, state in (
+            (today - timedelta(days=1000), today - timedelta(days=990), 'returned'),
+            (today - timedelta(days=30), today - timedelta(days=20), 'returned'),
+            (today - timedelta(days=1000), False, 'borrowed'),
+        )])
+
+    def test_archive_old_closed_loans(self):
+        """Only closed loans past the horizon move, and totals keep counting them."""
+        old_id = self.old_loan.id
+        archived = self.env['library.borrow']._cron_archive_history(horizon_days=365, batch_size=1)
+        
+        self.assertEqual(archived, 1)
+        self.assertFalse(self.env['library.borrow'].browse(old_id).exists())
+        self.assertTrue(self.recent_loan.exists())
+        self.assertTrue(self.open_loan.exists())
+        archive = self.env['library.borrow.archive'].search([('original_id', '=', old_id)])
+        self.assertEqual(archive.state, 'returned')
+        self.assertEqual(archive.member_id, self.member)
+        self.assertEqual(self.member.total_loans, 3)
+        
+        self.env['library.member']._rebuild_loan_counters()
+        self.member.invalidate_cache()
+        self.assertEqual(self.member.total_loans, 3)
+
+    def test_history_spans_live_and_archive(self):
+        """The history view reports live and archived loans together."""
+        self.env['library.borrow']._cron_archive_history(horizon_days=365)
+        history = self.env['library.loan.history'].search([('member_id', '=', self.member.id)])
+        
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history.filtered('is_archived').archive_id.original_id, self.old_loan.id)
+        self.assertEqual(history.filtered(lambda h: not h.is_archived).borrow_id, self.recent_loan | self.open_loan)
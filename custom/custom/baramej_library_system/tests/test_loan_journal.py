@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestLoanJournal(TransactionCase):
+    """Test the lean loan journal that replaces tracking and chatter posts."""
+
+    def setUp(self):
+        super(TestLoanJournal, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Journal Student',
+            'code': 'JOURNAL_STU',
+            'max_concurrent_loans': 5,
+            'max_loan_days': 14,
+            'fine_per_day': 0.50,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Journal Member',
+            'member_id': 'JOURNAL001',
+            'member_type_id': self.member_type.id,
+        })
+        self.author = self.env['library.author'].create({'name': 'Journal Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Journal Book',
+            'author_id': self.author.id,
+            'isbn': 'JOURNAL-ISBN-001',
+            'available_copies': 5,
+        })
+
+    def _set_lean(self, enabled):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'baramej_library_system.lean_loan_journal', 'True' if enabled else 'False')
+
+    def _index_count(self, model):
+        self.env.cr.execute(
+            'SELECT count(*) FROM pg_index WHERE indrelid = %s::regclass', [self.env[model]._table]
+        )
+        return self.env.cr.fetchone()[0]
+
+    def _checkout_and_return(self):
+        """Run a checkout and return.
+
+        Returns the loan, the mail/journal rows written and their physical
+        writes: each row once, plus once per index of its table.
+        """
+        counts = {}
+        for model in ('mail.message', 'mail.tracking.value', 'mail.followers', 'library.loan.event'):
+            counts[model] = self.env[model].sudo().search_count([])
+        loan = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': fields.Date.today(),
+        })
+        loan.action_confirm()
+        loan.action_return()
+        rows = {model: self.env[model].sudo().search_count([]) - count for model, count in counts.items()}
+        writes = sum(count * (1 + self._index_count(model)) for model, count in rows.items())
+        return loan, sum(rows.values()), writes
+
+    def test_lean_journal_replaces_chatter(self):
+        """In lean mode a loan writes journal events and no chatter messages."""
+        self._set_lean(True)
+        loan, _rows, _writes = self._checkout_and_return()
+        
+        self.assertFalse(loan.message_ids)
+        self.assertEqual(loan.event_ids.mapped('event_type'), ['create', 'write', 'write'])
+        self.assertEqual(loan.event_ids.mapped('state_to'), ['draft', 'borrowed', 'returned'])
+        self.assertIn('Return Date', loan.event_ids[-1].note)
+        self.assertIn('Borrowed → Returned', loan.journal_html)
+
+    def test_write_amplification(self):
+        """The lean journal cuts the writes of a loan by an order of magnitude."""
+        self._set_lean(False)
+        _loan, chatter_rows, chatter_writes = self._checkout_and_return()
+        self._set_lean(True)
+        _loan, journal_rows, journal_writes = self._checkout_and_return()
+        
+        self.assertEqual(journal_rows, 3)
+        self.assertGreaterEqual(chatter_rows, 3 * journal_rows)
+        self.assertGreaterEqual(chatter_writes, 10 * journal_writes)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import UserError
+from odoo import fields
+
+
+class TestLoanRenewal(TransactionCase):
+    """Test loan renewals and the bulk renewal of a member's loans."""
+
+    def setUp(self):
+        super(TestLoanRenewal, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Renewal Student',
+            'code': 'RENEW_STU',
+            'max_concurrent_loans': 100,
+            'max_loan_days': 14,
+            'max_renewals': 1,
+        })
+        self.member, self.other_member = self.env['library.member'].create([{
+            'name': f'Renewal Member {index}',
+            'member_id': f'RENEW00{index}',
+            'member_type_id': self.member_type.id,
+        } for index in range(2)])
+        self.author = self.env['library.author'].create({'name': 'Renewal Author'})
+        self.books = self.env['library.book'].create([{
+            'name': f'Renewal Book {index}',
+            'author_id': self.author.id,
+            'isbn': f'RENEW-ISBN-{index:03d}',
+            'available_copies': 100,
+        } for index in range(3)])
+        self.today = fields.Date.today()
+
+    def _borrow(self, count, days_ago=10, book=None):
+        return self.env['library.borrow'].create([{
+            'member_id': self.member.id,
+            'book_id': (book or self.books[index % len(self.books)]).id,
+            'borrow_date': self.today - timedelta(days=days_ago),
+            'state': 'borrowed',
+        } for index in range(count)])
+
+    def test_renew_extends_due_date_up_to_limit(self):
+        """A renewal starts a new loan period; the member type caps renewals."""
+        loan = self._borrow(1)
+        
+        loan.action_renew()
+        
+        self.assertEqual(loan.due_date, self.today + timedelta(days=14))
+        self.assertEqual(loan.renewal_count, 1)
+        with self.assertRaises(UserError):
+            loan.action_renew()
+
+    def test_renewal_refusals(self):
+        """Held titles and overdue loans are not renewed."""
+        held_loan = self._borrow(1, book=self.books[0])
+        overdue_loan = self._borrow(1, days_ago=20, book=self.books[1])
+        self.env['library.reservation'].create({
+            'book_id': self.books[0].id,
+            'member_id': self.other_member.id,
+        })
+        
+        result = self.env['library.borrow'].renew_member_loans(self.member.ids)
+        
+        self.assertEqual(result['renewed'], [])
+        self.assertEqual(set(result['refused']), {held_loan.id, overdue_loan.id})
+        self.assertEqual(held_loan.renewal_count, 0)
+
+    def test_bulk_renewal_query_count(self):
+        """Renewing many loans costs the same number of queries as renewing a few."""
+        self.env['ir.config_parameter'].sudo().set_param('baramej_library_system.lean_loan_journal', 'True')
+        few, many = self._borrow(5), self._borrow(50)
+        Borrow = self.env['library.borrow']
+        
+        def count_queries(loans):
+            loans.flush()
+            Borrow.invalidate_cache()
+            before = self.cr.sql_log_count
+            renewed, _refusals = Borrow.browse(loans.ids)._renew()
+            self.assertEqual(len(renewed), len(loans))
+            return self.cr.sql_log_count - before
+        
+        self.assertEqual(count_queries(few), count_queries(many))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestLoanReport(TransactionCase):
+    """Test the daily loan report behind the dashboard."""
+
+    def setUp(self):
+        super(TestLoanReport, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Report Student',
+            'code': 'REPORT_STU',
+            'max_concurrent_loans': 5,
+            'max_loan_days': 14,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Report Member',
+            'member_id': 'REPORT001',
+            'member_type_id': self.member_type.id,
+        })
+        self.category = self.env['library.category'].create({'name': 'Report Category'})
+        self.author = self.env['library.author'].create({'name': 'Report Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Report Book',
+            'author_id': self.author.id,
+            'isbn': 'REPORT-ISBN-001',
+            'category_id': self.category.id,
+            'available_copies': 5,
+        })
+        self.today = fields.Date.today()
+        self.late_loan, self.open_loan = self.env['library.borrow'].create([{
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': self.today - timedelta(days=10),
+            'due_date': due_date,
+            'return_date': return_date,
+            'state': state,
+        } for due_date, return_date, state in (
+            (self.today - timedelta(days=5), self.today - timedelta(days=2), 'returned'),
+            (self.today + timedelta(days=5), False, 'borrowed'),
+        )])
+
+    def _row(self, day):
+        return self.env['library.loan.report'].search([
+            ('date', '=', day),
+            ('category_id', '=', self.category.id),
+            ('member_type_id', '=', self.member_type.id),
+        ])
+
+    def test_rebuild_aggregates_per_day(self):
+        """Loans, new overdues, returns and fines land on their own day."""
+        self.env['library.loan.report']._rebuild_report()
+        
+        loans = self._row(self.today - timedelta(days=10))
+        self.assertEqual(loans.loan_count, 2)
+        self.assertEqual(loans.return_count, 0)
+        overdue = self._row(self.today - timedelta(days=4))
+        self.assertEqual(overdue.overdue_count, 1)
+        returns = self._row(self.today - timedelta(days=2))
+        self.assertEqual(returns.return_count, 1)
+        self.assertEqual(returns.fine_amount, self.late_loan.fine_amount)
+
+    def test_incremental_refresh_keeps_older_days(self):
+        """A refresh only rewrites the days of its window."""
+        report = self.env['library.loan.report']
+        report._rebuild_report()
+        older = report.search([('date', '<', self.today - timedelta(days=1))])
+        
+        self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': self.today,
+            'state': 'borrowed',
+        })
+        report._cron_refresh_report(window_days=1)
+        
+        self.assertEqual(self._row(self.today).loan_count, 1)
+        self.assertEqual(report.search([('date', '<', self.today - timedelta(days=1))]), older)
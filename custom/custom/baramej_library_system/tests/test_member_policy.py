@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import re
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestMemberPolicy(TransactionCase):
+    """Test the member type policy cache."""
+
+    def setUp(self):
+        super(TestMemberPolicy, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Policy Student',
+            'code': 'POLICY_STU',
+            'max_concurrent_loans': 2,
+            'max_loan_days': 14,
+            'fine_per_day': 0.5,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Policy Member',
+            'member_id': 'POLICY001',
+            'member_type_id': self.member_type.id,
+        })
+        self.author = self.env['library.author'].create({'name': 'Policy Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Policy Book',
+            'author_id': self.author.id,
+            'isbn': 'POLICY-ISBN-001',
+            'available_copies': 5,
+        })
+
+    def test_policy_is_cached(self):
+        """A second lookup of the same member type issues no query."""
+        MemberType = self.env['library.member.type']
+        MemberType._get_policy(self.member_type.id)
+        queries_before = self.cr.sql_log_count
+        
+        policy = MemberType._get_policy(self.member_type.id)
+        
+        self.assertEqual(self.cr.sql_log_count, queries_before)
+        self.assertEqual(policy, (2, 14, 0.5, 2))
+
+    def _checkout_queries(self):
+        """Check out the policy book and return the SQL statements issued."""
+        with patch.object(self.env.cr, 'execute', wraps=self.env.cr.execute) as execute:
+            loan = self.env['library.borrow'].create({
+                'member_id': self.member.id,
+                'book_id': self.book.id,
+                'borrow_date': fields.Date.today(),
+                'state': 'borrowed',
+            })
+            loan.flush()
+        return [str(call.args[0]) for call in execute.call_args_list]
+
+    def test_warm_checkout_skips_member_types(self):
+        """Once the policy is cached, a checkout no longer reads member types."""
+        reads_types = re.compile(r'\blibrary_member_type\b')
+        self.env['library.member.type'].clear_caches()
+        self.member.invalidate_cache()
+        
+        cold = self._checkout_queries()
+        warm = self._checkout_queries()
+        
+        self.assertTrue(any(reads_types.search(query) for query in cold))
+        self.assertFalse([query for query in warm if reads_types.search(query)])
+
+    def test_policy_follows_limit_changes(self):
+        """Changing a limit clears the cache for due dates and fines."""
+        self.env['library.member.type']._get_policy(self.member_type.id)
+        self.member_type.write({'max_loan_days': 21, 'fine_per_day': 1.0})
+        
+        today = fields.Date.today()
+        loan = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': today - timedelta(days=25),
+            'state': 'borrowed',
+        })
+        
+        self.assertEqual(loan.due_date, today - timedelta(days=4))
+        self.assertEqual(loan.fine_amount, 4.0)
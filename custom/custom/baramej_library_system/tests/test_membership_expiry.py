@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestMembershipExpiry(TransactionCase):
+    """Test the scheduled membership expiry and renewals."""
+
+    def setUp(self):
+        super(TestMembershipExpiry, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Expiry Student',
+            'code': 'EXPIRY_STU',
+            'max_concurrent_loans': 3,
+            'max_loan_days': 14,
+        })
+        self.today = fields.Date.today()
+        self.ending, self.ended, self.running = self.env['library.member'].create([{
+            'name': f'Expiry Member {index}',
+            'member_id': f'EXPIRY00{index}',
+            'member_type_id': self.member_type.id,
+            'membership_start_date': self.today - timedelta(days=400),
+            'membership_end_date': end_date,
+        } for index, end_date in enumerate((
+            self.today + timedelta(days=1),
+            self.today + timedelta(days=2),
+            self.today + timedelta(days=30),
+        ))])
+        # Let two memberships end without editing the members
+        self.env['library.member'].flush()
+        self.env.cr.execute(
+            'UPDATE library_member SET membership_end_date = membership_end_date - 5 WHERE id IN %s',
+            [(self.ending.id, self.ended.id)]
+        )
+        self.env['library.member'].invalidate_cache(['membership_end_date'])
+
+    def test_cron_expires_ended_memberships(self):
+        """Only memberships whose end date passed are expired, in chunks."""
+        self.assertFalse(self.ended.can_borrow_book()[0])
+        
+        expired = self.env['library.member']._cron_expire_memberships(batch_size=1)
+        
+        self.assertEqual(expired, 2)
+        self.assertEqual(self.ending.membership_status, 'inactive')
+        self.assertEqual(self.ended.membership_status, 'inactive')
+        self.assertEqual(self.running.membership_status, 'active')
+        self.assertEqual(self.env['library.member']._cron_expire_memberships(), 0)
+
+    def test_renewal_reactivates(self):
+        """Renewing extends ended memberships from today, running ones from their end date."""
+        self.env['library.member']._cron_expire_memberships()
+        
+        (self.ended | self.running).action_renew_membership()
+        
+        self.assertEqual(self.ended.membership_end_date, self.today + timedelta(days=365))
+        self.assertEqual(self.ended.membership_status, 'active')
+        self.assertEqual(self.running.membership_end_date, self.today + timedelta(days=395))
+        self.assertTrue(self.ended.can_borrow_book()[0])
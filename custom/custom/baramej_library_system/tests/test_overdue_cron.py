@@ -28,8 +28,10 @@ class TestOverdueCron(TransactionCase):
         })
         
         # Create book
+        self.author = self.env['library.author'].create({'name': 'Test Author'})
         self.book = self.env['library.book'].create({
             'name': 'Test Book',
+            'author_id': self.author.id,
             'isbn': 'TEST-ISBN-001',
             'available_copies': 1,
         })
@@ -155,3 +157,68 @@ class TestOverdueCron(TransactionCase):
         # Both should be overdue
         self.assertEqual(borrow1.state, 'overdue')
         self.assertEqual(borrow2.state, 'overdue')
+
+    def test_cron_chunked_update(self):
+        """Test that the cron processes every chunk and logs each transition."""
+        past_due_date = fields.Date.today() - timedelta(days=4)
+        borrows = self.env['library.borrow']
+        for index in range(3):
+            book = self.env['library.book'].create({
+                'name': f'Chunk Book {index}',
+                'author_id': self.author.id,
+                'isbn': f'TEST-ISBN-CHUNK-{index}',
+                'available_copies': 1,
+            })
+            borrows |= self.env['library.borrow'].create({
+                'member_id': self.member.id,
+                'book_id': book.id,
+                'borrow_date': fields.Date.today() - timedelta(days=18),
+                'due_date': past_due_date,
+                'state': 'borrowed',
+            })
+        
+        # Run cron with a chunk smaller than the backlog
+        self.env['library.borrow']._cron_update_overdue_status(batch_size=2)
+        
+        self.assertEqual(set(borrows.mapped('state')), {'overdue'})
+        for borrow in borrows:
+            self.assertTrue(any(
+                'Loan is now overdue by 4 days' in (message.body or '')
+                for message in borrow.message_ids
+            ))
+
+    def test_date_roll_refreshes_stale_figures(self):
+        """Test that the date roll refreshes stored overdue figures."""
+        past_due_date = fields.Date.today() - timedelta(days=6)
+        borrow = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': self.book.id,
+            'borrow_date': fields.Date.today() - timedelta(days=20),
+            'due_date': past_due_date,
+            'state': 'overdue',
+        })
+
+        # Simulate figures computed on an earlier day
+        borrow.flush()
+        self.env.cr.execute(
+            "UPDATE library_borrow SET is_overdue = FALSE, overdue_days = 0, fine_amount = 0 WHERE id = %s",
+            [borrow.id]
+        )
+        borrow.invalidate_cache()
+        self.assertEqual(borrow.overdue_days, 0)
+
+        rolled = self.env['library.borrow']._cron_roll_overdue_dates(verify=False)
+
+        self.assertEqual(rolled, 1)
+        self.assertTrue(borrow.is_overdue)
+        self.assertEqual(borrow.overdue_days, 6)
+        self.assertEqual(borrow.fine_amount, 6 * self.member_type.fine_per_day)
+
+        # A second roll on the same day has nothing to do
+        self.assertEqual(self.env['library.borrow']._cron_roll_overdue_dates(verify=False), 0)
+        self.assertEqual(self.env['library.borrow']._verify_overdue_figures(), [])
+
+        # A new daily rate reprices loans whose day count did not change
+        self.member_type.fine_per_day = 1.0
+        self.assertEqual(self.env['library.borrow']._cron_roll_overdue_dates(verify=False), 1)
+        self.assertEqual(borrow.fine_amount, 6.0)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+from odoo import fields
+
+
+class TestScanIngest(TransactionCase):
+    """Test the idempotent ingestion of queued desk scans."""
+
+    def setUp(self):
+        super(TestScanIngest, self).setUp()
+        
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Queue Student',
+            'code': 'QUEUE_STU',
+            'max_concurrent_loans': 3,
+            'max_loan_days': 14,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Queue Member',
+            'member_id': 'QUEUE001',
+            'barcode': 'QMEM001',
+            'member_type_id': self.member_type.id,
+        })
+        self.author = self.env['library.author'].create({'name': 'Queue Author'})
+        self.book = self.env['library.book'].create({
+            'name': 'Queue Book',
+            'author_id': self.author.id,
+            'isbn': 'QUEUE-ISBN-001',
+            'barcode': 'QBOOK001',
+            'available_copies': 1,
+        })
+
+    def _scan(self, scan_uuid, book_barcode='QBOOK001'):
+        return {
+            'uuid': scan_uuid,
+            'member_barcode': 'QMEM001',
+            'book_barcode': book_barcode,
+            'operation': 'auto',
+            'scanned_at': '2026-01-05T09:30:00.000Z',
+        }
+
+    def test_scans_applied_in_order(self):
+        """A borrow then a return of the same book are applied in scanning order."""
+        Scan = self.env['library.barcode.scan']
+        results = Scan.ingest_scans([self._scan('uuid-1'), self._scan('uuid-2'), self._scan('uuid-3', 'NOBOOK')])
+        
+        self.assertEqual([result['uuid'] for result in results], ['uuid-1', 'uuid-2', 'uuid-3'])
+        self.assertEqual([result['operation'] for result in results][:2], ['borrow', 'return'])
+        self.assertEqual([result['success'] for result in results], [True, True, False])
+        self.assertFalse(any(result['replayed'] for result in results))
+        log = self.env['library.scan.log'].search([('scan_uuid', '=', 'uuid-3')])
+        self.assertEqual(log.state, 'failed')
+        self.assertEqual(fields.Datetime.to_string(log.scanned_at), '2026-01-05 09:30:00')
+
+    def test_replayed_batch_is_not_applied_twice(self):
+        """Sending a batch again returns the logged outcomes without a second loan."""
+        Scan = self.env['library.barcode.scan']
+        first = Scan.ingest_scans([self._scan('uuid-10')])
+        again = Scan.ingest_scans([self._scan('uuid-10'), self._scan('uuid-10')])
+        
+        self.assertTrue(first[0]['success'])
+        self.assertEqual([result['replayed'] for result in again], [True, True])
+        self.assertEqual(again[0]['borrow_id'], first[0]['borrow_id'])
+        self.assertEqual(self.env['library.borrow'].search_count([('book_id', '=', self.book.id)]), 1)
+
+    def test_scans_dated_when_scanned(self):
+        """Queued scans borrow and return on the day they were scanned, not the day they arrive."""
+        Scan = self.env['library.barcode.scan']
+        borrowed = dict(self._scan('uuid-20'), scanned_at='2026-01-05T09:30:00Z')
+        returned = dict(self._scan('uuid-21'), scanned_at='2026-01-06T17:45:00Z')
+        results = Scan.ingest_scans([borrowed, returned])
+        
+        borrow = self.env['library.borrow'].browse(results[0]['borrow_id'])
+        self.assertEqual(fields.Date.to_string(borrow.borrow_date), '2026-01-05')
+        self.assertEqual(fields.Date.to_string(borrow.return_date), '2026-01-06')
+        self.assertEqual(borrow.overdue_days, 0)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from psycopg2 import IntegrityError
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import UserError
+from odoo.tools import mute_logger
+
+
+class TestStocktake(TransactionCase):
+    """Test bulk scan ingestion and stocktake reconciliation."""
+
+    def setUp(self):
+        super(TestStocktake, self).setUp()
+
+        self.shelf = self.env['library.location'].create({'name': 'Audit Shelf', 'code': 'AUD'})
+        self.other_shelf = self.env['library.location'].create({'name': 'Other Shelf', 'code': 'OTH'})
+        self.member_type = self.env['library.member.type'].create({
+            'name': 'Audit Student',
+            'code': 'AUD_STU',
+            'max_concurrent_loans': 5,
+            'max_loan_days': 14,
+            'fine_per_day': 0.50,
+        })
+        self.member = self.env['library.member'].create({
+            'name': 'Audit Member',
+            'member_id': 'AUD001',
+            'member_type_id': self.member_type.id,
+        })
+        self.author = self.env['library.author'].create({'name': 'Audit Author'})
+        self.tracked = self.env['library.book'].create({
+            'name': 'Audit Copies',
+            'author_id': self.author.id,
+            'barcode': 'AUDCOPY',
+            'location_id': self.shelf.id,
+        })
+        self.copies = self.env['library.book.copy'].create([
+            {'book_id': self.tracked.id, 'barcode': f'AUDCOPY-{index}'} for index in range(1, 6)
+        ])
+        self.copies[2].location_id = self.other_shelf
+        self.copies[3].status = 'lost'
+        self.titles = self.env['library.book'].create([{
+            'name': 'Audit Title Short',
+            'author_id': self.author.id,
+            'barcode': 'AUDTITLE1',
+            'location_id': self.shelf.id,
+            'available_copies': 3,
+        }, {
+            'name': 'Audit Title Loaned',
+            'author_id': self.author.id,
+            'barcode': 'AUDTITLE2',
+            'location_id': self.shelf.id,
+            'available_copies': 2,
+        }])
+        for book, copy in ((self.tracked, self.copies[4]), (self.titles[1], False)):
+            self.env['library.borrow'].create({
+                'member_id': self.member.id,
+                'book_id': book.id,
+                'copy_id': copy and copy.id,
+                'borrow_date': fields.Date.today(),
+                'state': 'borrowed',
+            })
+        self.stocktake = self.env['library.stocktake'].create({'location_id': self.shelf.id})
+
+    def _lines(self, kind):
+        return self.stocktake.line_ids.filtered(lambda l: l.kind == kind)
+
+    def test_scans_are_counted_per_barcode(self):
+        """Repeated barcodes across batches add up in one row each."""
+        self.assertEqual(self.stocktake.add_barcodes(['AUDTITLE1', 'AUDTITLE1', ' ', 'AUDCOPY-1']), 3)
+        self.stocktake.barcode_input = 'AUDTITLE1, AUDCOPY-2\nAUDCOPY-2'
+        self.stocktake.action_add_scans()
+
+        counts = {scan.barcode: scan.scan_count for scan in self.stocktake.scan_ids}
+        self.assertEqual(counts, {'AUDTITLE1': 3, 'AUDCOPY-1': 1, 'AUDCOPY-2': 2})
+        self.assertEqual(self.stocktake.scan_count, 6)
+        self.assertEqual(self.stocktake.barcode_count, 3)
+        self.assertFalse(self.stocktake.barcode_input)
+
+    def test_close_reports_and_corrects_discrepancies(self):
+        """Closing lists each discrepancy kind and corrects the holdings."""
+        self.stocktake.add_barcodes([
+            'AUDCOPY-1', 'AUDCOPY-3', 'AUDCOPY-4', 'AUDCOPY-5',
+            'AUDTITLE1', 'AUDTITLE1',
+            'AUDTITLE2', 'AUDTITLE2',
+            'NO-SUCH-BARCODE',
+        ])
+        self.stocktake.action_close()
+
+        self.assertEqual(self.stocktake.state, 'done')
+        self.assertEqual(self._lines('missing').mapped('copy_id'), self.copies[1])
+        self.assertEqual(self._lines('misplaced').copy_id, self.copies[2])
+        self.assertEqual(self._lines('found').copy_id, self.copies[3])
+        on_loan = self._lines('on_loan')
+        self.assertEqual(on_loan.filtered('copy_id').copy_id, self.copies[4])
+        self.assertEqual(on_loan.filtered(lambda l: l.book_id == self.titles[1]).quantity, 1)
+        self.assertEqual(self._lines('unknown').barcode, 'NO-SUCH-BARCODE')
+        short = self._lines('missing').filtered(lambda l: l.book_id == self.titles[0])
+        self.assertEqual(short.quantity, 1)
+        self.assertEqual(self.stocktake.missing_count, 2)
+
+        # Missing copies are lost, lost copies found are back on this shelf
+        self.assertEqual(self.copies[1].status, 'lost')
+        self.assertEqual(self.copies[3].status, 'available')
+        self.assertEqual(self.copies[3].location_id, self.shelf)
+        self.assertEqual(self.copies[4].status, 'on_loan')
+        self.assertEqual(self.tracked.available_copies, 3)
+        # Titles without copies hold what was found, besides their loans
+        self.assertEqual(self.titles[0].available_copies, 2)
+        self.assertEqual(self.titles[1].available_copies, 1)
+
+    def test_held_copies_stay_off_the_shelf(self):
+        """Copies of titles without copies held for pickup are not made available again."""
+        title = self.env['library.book'].create({
+            'name': 'Audit Title Held',
+            'author_id': self.author.id,
+            'barcode': 'AUDTITLE3',
+            'location_id': self.shelf.id,
+            'available_copies': 2,
+        })
+        holder = self.env['library.member'].create({
+            'name': 'Audit Holder',
+            'member_id': 'AUD002',
+            'member_type_id': self.member_type.id,
+        })
+        loan = self.env['library.borrow'].create({
+            'member_id': self.member.id,
+            'book_id': title.id,
+            'borrow_date': fields.Date.today(),
+            'state': 'borrowed',
+        })
+        hold = self.env['library.reservation'].create({'book_id': title.id, 'member_id': holder.id})
+        loan.action_return()
+        self.assertEqual(hold.status, 'ready')
+        self.assertEqual(title.available_copies, 1)
+
+        # One copy on the shelf and the held copy on the hold shelf
+        self.stocktake.add_barcodes(['AUDTITLE3', 'AUDTITLE3'])
+        self.stocktake.action_close()
+
+        self.assertFalse(self.stocktake.line_ids.filtered(lambda l: l.book_id == title))
+        self.assertEqual(title.available_copies, 1)
+
+    def test_session_rules(self):
+        """A location has one open session, and closed sessions take no scans."""
+        with mute_logger('odoo.sql_db'), self.assertRaises(IntegrityError), self.cr.savepoint():
+            self.env['library.stocktake'].create({'location_id': self.shelf.id})
+
+        self.stocktake.action_close()
+        with self.assertRaises(UserError):
+            self.stocktake.add_barcodes(['AUDCOPY-1'])
+        with self.assertRaises(UserError):
+            self.stocktake.action_close()